@@ -1,12 +1,15 @@
 """多智能体旅行规划系统"""
 
 import json
+import time
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from typing import Dict, Any, List
+import hashlib
+import threading
+from typing import Dict, Any, List, Callable, Optional, Tuple
 from hello_agents import SimpleAgent
-from hello_agents.tools import MCPTool
 from ..services.llm_service import get_llm
+from ..services.amap_service import get_amap_mcp_tool
+from ..services.geocode_store import KIND_ADDRESS, KIND_NAME, get_geocode_store, haversine, normalize_address, normalize_city
 from ..models.schemas import (
     TripRequest,
     TripPlan,
@@ -16,8 +19,31 @@ from ..models.schemas import (
     WeatherInfo,
     Location,
     Hotel,
+    Budget,
 )
 from ..config import get_settings
+from ..utils.executor import run_blocking, get_shared_executor
+from ..utils.plan_scheduler import PRIORITY_ANONYMOUS, get_plan_scheduler
+from ..utils.cache import TTLCache
+from ..utils.single_flight import SingleFlight
+from ..utils.checkpoint import StageCheckpoint, StageMetrics
+from ..utils.deadline import Deadline, StageTimeoutError, call_with_deadline, get_abandoned_stats, wait_for
+from ..utils.json_stream import IncrementalArrayParser
+from ..utils.amap_parser import (
+    AmapToolError, get_tool_error, parse_location, parse_pois, parse_weather_forecasts, parse_weather_markdown
+)
+from ..utils.prompt_compactor import compact_stage_outputs
+from ..utils.json_repair import loads_tolerant
+
+# 信息查询阶段超时后代替结果写入规划提示词的说明
+STAGE_TIMEOUT_NOTES = {
+    "attractions": "（景点查询超时，请根据城市和偏好推荐知名景点）",
+    "weather": "（天气查询超时，暂无天气数据）",
+    "hotels": "（酒店查询超时，请根据住宿偏好推荐酒店）",
+}
+
+# 用于修正坐标的地址规范化后的最短长度(更短的通常只是区县名称)
+_MIN_ADDRESS_LENGTH = 4
 
 # ============ Agent提示词 ============
 
@@ -174,25 +200,39 @@ class MultiAgentTripPlanner:
             self.settings = get_settings()
             self.llm = get_llm()
 
-            # 添加缓存机制
+            # 添加缓存机制(TTL过期 + LRU淘汰)
             self._cache = (
                 {
-                    "weather": {},  # 城市 -> 天气信息
-                    "hotels": {},  # 城市+类型 -> 酒店信息
+                    "attractions": self._create_cache("attractions"),  # 城市+偏好 -> 景点信息
+                    "weather": self._create_cache("weather"),  # 城市 -> 天气信息
+                    "hotels": self._create_cache("hotels"),  # 城市+类型 -> 酒店信息
                 }
                 if self.settings.perf_enable_cache
                 else None
             )
 
-            # 创建共享的MCP工具(只创建一次，所有Agent共享)
-            self.amap_tool = MCPTool(
-                name="amap",
-                description="高德地图服务",
-                server_command=["uvx", "amap-mcp-server"],
-                env={"AMAP_MAPS_API_KEY": self.settings.amap_api_key},
-                auto_expand=True,
+            # 整体行程缓存: 相同请求直接返回已生成的计划
+            self._plan_cache = (
+                TTLCache(
+                    name="plans",
+                    ttl=self.settings.perf_plan_cache_ttl,
+                    max_size=self.settings.perf_plan_cache_max_size
+                )
+                if self.settings.perf_enable_cache and self.settings.perf_plan_cache_ttl > 0
+                else None
             )
 
+            # 请求合并: 相同键的并发查询只执行一次
+            self._single_flight = {
+                stage: SingleFlight(stage) for stage in ("attractions", "weather", "hotels")
+            }
+
+            # 各阶段执行与重试统计
+            self._stage_metrics = StageMetrics()
+
+            # 共享的地图工具(进程内单例，所有Agent和AmapService共享同一个MCP连接池或HTTP连接池)
+            self.amap_tool = get_amap_mcp_tool()
+
             # 创建景点搜索Agent
             self.attraction_agent = SimpleAgent(
                 name="景点搜索专家",
@@ -232,6 +272,87 @@ class MultiAgentTripPlanner:
             traceback.print_exc()
             raise
     
+    def _create_cache(self, name: str) -> TTLCache:
+        """创建阶段结果缓存"""
+        return TTLCache(
+            name=name,
+            ttl=self.settings.perf_cache_ttl,
+            max_size=self.settings.perf_cache_max_size
+        )
+
+    @staticmethod
+    def _normalize_cache_key(*parts: str) -> str:
+        """规范化缓存键(去除首尾及多余空白、忽略大小写)"""
+        return "|".join(" ".join((part or "").split()).lower() for part in parts)
+
+    @staticmethod
+    def _fingerprint_request(request: TripRequest) -> str:
+        """
+        计算旅行请求的规范化指纹
+
+        字符串去除多余空白并忽略大小写,偏好标签去重并排序,
+        内容相同的请求得到相同的指纹。
+        """
+        def normalize(value: str) -> str:
+            return " ".join((value or "").split()).lower()
+
+        # 所有偏好标签并行搜索,顺序不影响结果
+        preferences = sorted({normalize(p) for p in request.preferences if normalize(p)})
+
+        canonical = {
+            "city": normalize(request.city),
+            "start_date": request.start_date.strip(),
+            "end_date": request.end_date.strip(),
+            "travel_days": request.travel_days,
+            "transportation": normalize(request.transportation),
+            "accommodation": normalize(request.accommodation),
+            "preferences": preferences,
+            "free_text_input": normalize(request.free_text_input),
+        }
+        payload = json.dumps(canonical, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取各阶段缓存的统计信息"""
+        stats = {}
+        if self._cache:
+            stats.update({name: cache.stats() for name, cache in self._cache.items()})
+        if self._plan_cache is not None:
+            stats["plans"] = self._plan_cache.stats()
+        return stats
+
+    def get_single_flight_stats(self) -> Dict[str, Any]:
+        """获取各阶段请求合并的统计信息"""
+        return {name: flight.stats() for name, flight in self._single_flight.items()}
+
+    def get_stage_stats(self) -> Dict[str, Any]:
+        """获取各阶段执行与重试的统计信息"""
+        return self._stage_metrics.stats()
+
+    def _shared_executor(self, name: str):
+        """
+        获取规划内部使用的共享线程池
+
+        - stages: 景点/天气/酒店查询
+        - fanout: 多偏好景点搜索(由 stages 中的景点阶段提交)
+        - windows: 分段规划的窗口
+        - planner: 带截止时间的规划LLM调用(由规划线程或窗口提交)
+
+        线程池之间只有单向提交,避免线程池占满时互相等待。
+        """
+        plans = self.settings.perf_max_concurrent_plans
+        sizes = {
+            "stages": plans * self.settings.perf_max_workers,
+            "fanout": plans * self.settings.perf_attraction_fanout_workers,
+            "windows": plans * self.settings.perf_max_workers,
+            "planner": plans * self.settings.perf_max_workers,
+        }
+        return get_shared_executor(name, sizes[name])
+
+    def _count_rate_limit_retry(self, stage: str) -> Callable[[int, Exception, float], None]:
+        """创建阶段内部速率限制重试的计数回调"""
+        return lambda attempt, error, delay: self._stage_metrics.record(stage, "rate_limit_retries")
+
     def plan_trip(self, request: TripRequest, stream_id: str = None) -> TripPlan:
         """
         使用多智能体协作生成旅行计划（优化版：并行执行 + 重试机制）
@@ -244,45 +365,107 @@ class MultiAgentTripPlanner:
             旅行计划
         """
         from ..utils.retry_handler import retry_on_rate_limit
-        import time
+
+        # 相同请求直接返回缓存的计划
+        plan_key = self._fingerprint_request(request)
+        cached_plan = self.get_cached_plan(request, stream_id)
+        if cached_plan is not None:
+            return cached_plan
         
+        # 阶段检查点: 重试时已完成的阶段直接复用结果,从失败的阶段继续
+        checkpoint = StageCheckpoint(self._stage_metrics)
+
+        def on_retry(attempt: int, error: Exception, delay: float):
+            self._log(stream_id, f"🔁 第{attempt}次重试将从未完成的阶段继续（已完成的阶段不再重新执行）")
+
         # 包装带重试的执行函数
-        @retry_on_rate_limit(max_retries=3, initial_delay=2.0, backoff_factor=2.0)
+        @retry_on_rate_limit(max_retries=3, initial_delay=2.0, backoff_factor=2.0, on_retry=on_retry, name="plan_trip")
         def execute_with_retry():
             self._log(stream_id, f"{'='*60}")
             self._log(stream_id, f"🚀 开始多智能体协作规划旅行...")
             self._log(stream_id, f"目的地: {request.city} | 日期: {request.start_date} 至 {request.end_date} | 天数: {request.travel_days}天")
             self._log(stream_id, f"{'='*60}")
 
-            # 并行执行步骤1-3: 景点、天气、酒店查询
+            # 并行执行步骤1-3: 景点、天气、酒店查询(共享 perf_agent_timeout 截止时间)
             self._log(stream_id, "⚡ 并行查询景点、天气、酒店信息...")
+            timed_out: List[str] = []
+
+            # 并行执行（使用缓存优化，阶段任务在进程内共享的线程池中执行）
+            executor = self._shared_executor("stages")
+            self._log(stream_id, f"🔍 开始搜索{request.city}的景点...")
+            stage_futures = {
+                "attractions": executor.submit(
+                    checkpoint.run, "attractions",
+                    lambda: self._search_attractions_with_retry(request, stream_id)
+                ),
+                "weather": executor.submit(
+                    checkpoint.run, "weather",
+                    lambda: self._get_weather_with_retry(request.city, stream_id)
+                ),
+                "hotels": executor.submit(
+                    checkpoint.run, "hotels",
+                    lambda: self._get_hotels_with_retry(request.city, request.accommodation, stream_id)
+                ),
+            }
+
+            # 获取结果(超时的阶段降级为说明文字,不阻塞规划)
+            stage_deadline = Deadline(self.settings.perf_agent_timeout)
+            stage_results = {}
+            for stage, future in stage_futures.items():
+                try:
+                    stage_results[stage] = wait_for(future, stage_deadline, stage)
+                except StageTimeoutError as e:
+                    timed_out.append(stage)
+                    stage_results[stage] = STAGE_TIMEOUT_NOTES[stage]
+                    self._log(stream_id, f"⏱️ {e}，跳过该阶段继续规划")
+
+            attraction_response = stage_results["attractions"]
+            weather_response = stage_results["weather"]
+            hotel_response = stage_results["hotels"]
 
-            with ThreadPoolExecutor(
-                max_workers=self.settings.perf_max_workers
-            ) as executor:
-                # 构建查询
-                attraction_query = self._build_attraction_query(request)
-                
-                # 并行执行（使用缓存优化）
-                self._log(stream_id, f"🔍 开始搜索{request.city}的景点...")
-                attraction_future = executor.submit(self._search_attractions_with_retry, request, stream_id)
-                weather_future = executor.submit(self._get_weather_with_retry, request.city, stream_id)
-                hotel_future = executor.submit(self._get_hotels_with_retry, request.city, request.accommodation, stream_id)
-                
-                # 获取结果
-                attraction_response = attraction_future.result()
-                weather_response = weather_future.result()
-                hotel_response = hotel_future.result()
-            
             self._log(stream_id, "✅ 信息查询完成")
+            self._remember_locations(request.city, attraction_response, hotel_response)
 
             # 步骤4: 行程规划Agent整合信息生成计划
             self._log(stream_id, "📋 生成行程计划...")
-            planner_query = self._build_planner_query(request, attraction_response, weather_response, hotel_response)
-            planner_response = self.planner_agent.run(planner_query)
+            planner_deadline = Deadline(self.settings.perf_planner_timeout)
+            windows = self._split_day_windows(request)
+            if len(windows) > 1:
+                trip_plan = self._plan_in_windows(
+                    request, windows, attraction_response, weather_response, hotel_response,
+                    checkpoint, planner_deadline, timed_out, stream_id
+                )
+            else:
+                planner_query = self._build_planner_query(
+                    request, attraction_response, weather_response, hotel_response, stream_id
+                )
+                try:
+                    planner_response = checkpoint.run(
+                        "planner", lambda: self._run_planner(planner_query, stream_id, planner_deadline)
+                    )
+                    trip_plan = self._parse_with_recovery(
+                        planner_query, planner_response, request, stream_id, planner_deadline
+                    )
+                except StageTimeoutError as e:
+                    timed_out.append("planner")
+                    self._log(stream_id, f"⏱️ {e}")
+                    trip_plan = None
+
+            # 解析失败的备用计划不写入缓存
+            if trip_plan is None:
+                print(f"   将使用备用方案生成计划")
+                fallback_plan = self._create_fallback_plan(request)
+                fallback_plan.timed_out_stages = timed_out
+                return fallback_plan
+
+            self._check_locations(trip_plan, request.city, stream_id)
 
-            # 解析最终计划
-            trip_plan = self._parse_response(planner_response, request)
+            # 有阶段超时的降级结果不写入缓存
+            trip_plan.timed_out_stages = timed_out
+            if timed_out:
+                self._log(stream_id, f"⚠️ 以下阶段超时，计划基于部分信息生成: {', '.join(timed_out)}")
+            elif self._plan_cache is not None:
+                self._plan_cache.set(plan_key, trip_plan.model_copy(deep=True))
 
             self._log(stream_id, f"✅ 旅行计划生成完成!")
 
@@ -302,11 +485,62 @@ class MultiAgentTripPlanner:
             traceback.print_exc()
             return self._create_fallback_plan(request)
     
+    def get_cached_plan(self, request: TripRequest, stream_id: str = None) -> Optional[TripPlan]:
+        """
+        查找相同请求缓存的旅行计划(不排队,毫秒级返回)
+
+        Args:
+            request: 旅行请求
+            stream_id: 日志流ID（可选，命中时发送日志）
+
+        Returns:
+            计划副本,未命中或未启用行程缓存时返回None
+        """
+        if self._plan_cache is None:
+            return None
+        cached_plan = self._plan_cache.get(self._fingerprint_request(request))
+        if cached_plan is None:
+            return None
+        self._log(stream_id, f"⚡ 命中行程缓存: {request.city} {request.travel_days}天行程直接返回")
+        return cached_plan.model_copy(deep=True)
+
+    async def plan_trip_async(
+        self,
+        request: TripRequest,
+        stream_id: str = None,
+        priority: int = PRIORITY_ANONYMOUS
+    ) -> TripPlan:
+        """
+        异步生成旅行计划
+
+        命中行程缓存时直接返回,不进入队列;未命中时提交到规划调度器排队执行,不会阻塞事件循环。
+
+        Args:
+            request: 旅行请求
+            stream_id: 日志流ID（可选）
+            priority: 调度优先级
+
+        Returns:
+            旅行计划
+
+        Raises:
+            SchedulerFullError: 规划队列已满
+        """
+        cached_plan = self.get_cached_plan(request, stream_id)
+        if cached_plan is not None:
+            return cached_plan
+
+        job = get_plan_scheduler().submit(self.plan_trip, request, stream_id, priority=priority)
+        return await asyncio.wrap_future(job.future)
+
     def _search_attractions_with_retry(self, request: TripRequest, stream_id: str = None) -> str:
         """搜索景点（带重试）"""
         from ..utils.retry_handler import retry_on_rate_limit
         
-        @retry_on_rate_limit(max_retries=2, initial_delay=1.0)
+        @retry_on_rate_limit(
+            max_retries=2, initial_delay=1.0, name="attractions",
+            on_retry=self._count_rate_limit_retry("attractions")
+        )
         def execute():
             return self._search_attractions_with_log(request, stream_id)
         
@@ -316,7 +550,10 @@ class MultiAgentTripPlanner:
         """获取天气（带重试）"""
         from ..utils.retry_handler import retry_on_rate_limit
         
-        @retry_on_rate_limit(max_retries=2, initial_delay=1.0)
+        @retry_on_rate_limit(
+            max_retries=2, initial_delay=1.0, name="weather",
+            on_retry=self._count_rate_limit_retry("weather")
+        )
         def execute():
             return self._get_weather_cached(city, stream_id)
         
@@ -326,205 +563,607 @@ class MultiAgentTripPlanner:
         """获取酒店（带重试）"""
         from ..utils.retry_handler import retry_on_rate_limit
         
-        @retry_on_rate_limit(max_retries=2, initial_delay=1.0)
+        @retry_on_rate_limit(
+            max_retries=2, initial_delay=1.0, name="hotels",
+            on_retry=self._count_rate_limit_retry("hotels")
+        )
         def execute():
             return self._get_hotels_cached(city, accommodation, stream_id)
         
         return execute()
     
     def _search_attractions_with_log(self, request: TripRequest, stream_id: str = None) -> str:
-        """搜索景点并记录详细日志"""
-        attraction_query = self._build_attraction_query(request)
+        """
+        按所有偏好标签并行搜索景点并合并结果
+
+        每个(城市, 偏好)的结果单独缓存和合并请求,不同偏好组合之间可以复用。
+        """
+        keywords_list = self._get_attraction_keywords(request)
+
+        def search(keywords: str) -> str:
+            return self._load_stage(
+                "attractions",
+                self._normalize_cache_key(request.city, keywords),
+                lambda: self._fetch_attractions(request.city, keywords, stream_id),
+                stream_id
+            )
+
+        if len(keywords_list) == 1:
+            return search(keywords_list[0])
+
+        results = list(self._shared_executor("fanout").map(search, keywords_list))
+
+        return self._merge_attraction_results(keywords_list, results, stream_id)
+
+    def _merge_attraction_results(self, keywords_list: List[str], results: List[str], stream_id: str = None) -> str:
+        """
+        合并多个偏好的景点搜索结果
+
+        可解析的POI按ID(或名称+地址)去重,按偏好轮流取用并限制总数,
+        输出为 {"pois": [...]} JSON;无法解析的结果按偏好分段保留原文。
+        """
+        parsed = [parse_pois(result) for result in results]
+        limit = self.settings.perf_attraction_pool_size
+
+        merged: List[Dict[str, Any]] = []
+        seen = set()
+        round_index = 0
+        while len(merged) < limit and any(round_index < len(pois) for pois in parsed):
+            for keywords, pois in zip(keywords_list, parsed):
+                if round_index >= len(pois) or len(merged) >= limit:
+                    continue
+                poi = pois[round_index]
+                key = poi["id"] or self._normalize_cache_key(poi["name"], poi["address"])
+                if key in seen:
+                    continue
+                seen.add(key)
+                merged.append({**poi, "preference": keywords})
+            round_index += 1
+
+        total = sum(len(pois) for pois in parsed)
+        self._log(stream_id, f"🔀 合并{len(keywords_list)}个偏好的景点: {total} 个结果，去重后保留 {len(merged)} 个")
+
+        sections = []
+        if merged:
+            sections.append(json.dumps({"pois": merged}, ensure_ascii=False))
+        for keywords, pois, result in zip(keywords_list, parsed, results):
+            if not pois and result:
+                sections.append(f"【{keywords}】\n{result}")
+        return "\n\n".join(sections)
+
+    def _fetch_attractions(self, city: str, keywords: str, stream_id: str = None) -> str:
+        """调用景点搜索Agent(或直接调用地图工具)"""
         self._log(stream_id, f"🔧 使用工具: amap_maps_text_search")
-        self._log(stream_id, f"📍 搜索关键词: {request.preferences[0] if request.preferences else '景点'}")
+        self._log(stream_id, f"📍 搜索关键词: {keywords}")
         
-        result = self.attraction_agent.run(attraction_query)
+        if self.settings.perf_direct_tool_calls:
+            result = self._call_amap_tool("maps_text_search", {"keywords": keywords, "city": city})
+        else:
+            attraction_query = self._build_attraction_query(city, keywords)
+            result = self.attraction_agent.run(attraction_query)
         
         # 解析并显示景点列表
         try:
-            import re
-            
             self._log(stream_id, f"✅ 找到景点信息")
-            
-            # 解析格式化文本中的景点信息
-            # 格式: 1. **西安城市运动公园**
-            #       - 地址：未央路168号(行政中心地铁站B5口旁)
-            
-            # 提取所有景点
-            pattern = r'\d+\.\s*\*\*([^*]+)\*\*\s*-\s*地址[：:]\s*([^\n]+)'
-            matches = re.findall(pattern, result)
-            
-            if matches:
-                # 只显示前5个
-                for i, (name, address) in enumerate(matches[:5]):
-                    name = name.strip()
-                    address = address.strip()
-                    self._log(stream_id, f"  📌 {name}")
-                    if address:
-                        # 限制地址长度
-                        if len(address) > 50:
-                            address = address[:50] + "..."
-                        self._log(stream_id, f"     📍 {address}")
-                
-                total = len(matches)
-                self._log(stream_id, f"✅ 共找到 {total} 个景点")
-            else:
-                self._log(stream_id, f"✅ 景点搜索完成")
-                
+            self._log_poi_list(stream_id, result, "📌", "景点")
         except Exception as e:
             self._log(stream_id, f"⚠️ 解析景点信息时出错: {str(e)}")
-        
+
+        return result
+
+    def _call_amap_tool(self, tool_name: str, arguments: Dict[str, Any]) -> str:
+        """
+        直接调用高德地图工具(不经过LLM,MCP或HTTP后端由 amap_backend 决定)
+
+        Args:
+            tool_name: 工具名称
+            arguments: 工具参数
+
+        Returns:
+            工具结果
+
+        Raises:
+            AmapToolError: 工具返回错误时
+        """
+        result = self.amap_tool.run({
+            "action": "call_tool",
+            "tool_name": tool_name,
+            "arguments": arguments
+        })
+
+        error = get_tool_error(result)
+        if error:
+            raise AmapToolError(f"{tool_name} 调用失败: {error}")
         return result
+
+    def _log_poi_list(self, stream_id: str, result: str, icon: str, label: str):
+        """解析并显示POI列表(只显示前5个)"""
+        # 支持两种格式:
+        # 1. 工具返回的JSON: {"pois": [{"name": ..., "address": ...}]}
+        # 2. Agent格式化文本: 1. **西安城市运动公园**
+        #                     - 地址：未央路168号(行政中心地铁站B5口旁)
+        pois = parse_pois(result)
+
+        if not pois:
+            self._log(stream_id, f"✅ {label}搜索完成")
+            return
+
+        for poi in pois[:5]:
+            self._log(stream_id, f"  {icon} {poi['name']}")
+            address = poi["address"]
+            if address:
+                # 限制地址长度
+                if len(address) > 50:
+                    address = address[:50] + "..."
+                self._log(stream_id, f"     📍 {address}")
+
+        self._log(stream_id, f"✅ 共找到 {len(pois)} 个{label}")
     
+    @staticmethod
+    def _remember_locations(city: str, *results: str):
+        """把景点、酒店查询结果中带坐标的POI(名称和地址)写入地理编码库"""
+        store = get_geocode_store()
+        if store is None:
+            return
+
+        pois = []
+        for result in results:
+            for poi in parse_pois(result):
+                location = parse_location(poi["location"])
+                if location is not None:
+                    pois.append((poi["name"], poi["address"], location[0], location[1]))
+        store.put_pois(pois, city)
+
+    def _check_locations(self, trip_plan: TripPlan, city: str, stream_id: str = None):
+        """
+        用地理编码库校验行程中LLM给出的坐标(不请求上游)
+
+        - 地址在本城市已收录(只查地址记录)且偏差超过 perf_geocode_tolerance 米: 修正为已知坐标,
+          偏差超过 perf_geocode_max_correction 米时视为地址不匹配,不修正
+        - 地址已收录且偏差在范围内,或附近有本城市同名的已知地点: 视为已核实
+        - 只按名称匹配时不修正(同名地点可能有多处),其余坐标保持不变
+        """
+        store = get_geocode_store()
+        if store is None:
+            return
+
+        tolerance = self.settings.perf_geocode_tolerance
+        max_correction = self.settings.perf_geocode_max_correction
+        city_name = normalize_city(city)
+        corrected = verified = unverified = rejected = 0
+        places = [
+            place
+            for day in trip_plan.days
+            for place in [*day.attractions, *day.meals, *([day.hotel] if day.hotel else [])]
+            if place.location is not None
+        ]
+        for place in places:
+            lng, lat = place.location.longitude, place.location.latitude
+            address = normalize_address(place.address or "", city)
+            # 只有区县名称等过短的地址无法定位到具体地点
+            known = store.get(place.address, city, KIND_ADDRESS) if len(address) >= _MIN_ADDRESS_LENGTH else None
+            distance = haversine(lng, lat, known[0], known[1]) if known is not None else None
+
+            if distance is not None and distance <= tolerance:
+                verified += 1
+            elif distance is not None and distance <= max_correction:
+                place.location = Location(longitude=known[0], latitude=known[1])
+                corrected += 1
+            elif distance is None and any(
+                entry.kind == KIND_NAME
+                and normalize_city(entry.city) == city_name
+                and normalize_address(entry.address, city) == normalize_address(place.name, city)
+                for entry in store.nearby(lng, lat, tolerance, limit=50)
+            ):
+                verified += 1
+            else:
+                rejected += distance is not None
+                unverified += 1
+
+        if places:
+            self._log(
+                stream_id,
+                f"📍 坐标校验: 修正 {corrected} 个, 已核实 {verified} 个, 未核实 {unverified} 个"
+                + (f"（其中 {rejected} 个与已知地址偏差过大，未修正）" if rejected else "")
+            )
+
+    def _load_stage(self, stage: str, cache_key: str, loader: Callable[[], str], stream_id: str = None) -> str:
+        """
+        加载阶段结果: 先查缓存,未命中时通过请求合并调用loader
+
+        相同缓存键的并发请求只会触发一次Agent调用,其余请求等待并共享结果。
+
+        Args:
+            stage: 阶段名称(attractions/weather/hotels)
+            cache_key: 规范化后的缓存键
+            loader: 实际查询函数
+            stream_id: 日志流ID（可选）
+
+        Returns:
+            阶段结果
+        """
+        stage_names = {"attractions": "景点", "weather": "天气", "hotels": "酒店"}
+        cache = self._cache[stage] if self._cache else None
+
+        if cache is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                if self.settings.perf_verbose_logging:
+                    self._log(stream_id, f"  ⚡ 使用缓存的{stage_names[stage]}信息")
+                return cached
+
+        def load() -> str:
+            # 等待期间可能已被其他请求写入缓存
+            if cache is not None and cache_key in cache:
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            result = loader()
+            if cache is not None:
+                cache.set(cache_key, result)
+            return result
+
+        result, shared = self._single_flight[stage].do(cache_key, load)
+        if shared:
+            self._log(stream_id, f"  ⚡ 复用并发请求的{stage_names[stage]}查询结果")
+        return result
+
+    def _run_planner(self, planner_query: str, stream_id: str = None, deadline: Deadline = None) -> str:
+        """
+        调用行程规划Agent
+
+        有日志流时使用流式输出,每当一天的行程JSON闭合就校验并推送一条 day 事件。
+
+        Args:
+            planner_query: 规划查询
+            stream_id: 日志流ID（可选）
+            deadline: 截止时间（可选，到期抛出StageTimeoutError）
+
+        Returns:
+            规划Agent的完整响应
+        """
+        if deadline is not None:
+            return call_with_deadline(
+                lambda: self._run_planner(planner_query, stream_id), deadline, "planner",
+                executor=self._shared_executor("planner")
+            )
+
+        # 规划Agent不保留历史对话: 共享的Agent实例会把每次请求追加到历史中,
+        # 导致后续请求(以及并发的分段规划)把无关的旧行程一并发送给LLM
+        messages = [
+            {"role": "system", "content": self.planner_agent.system_prompt},
+            {"role": "user", "content": planner_query}
+        ]
+
+        if not stream_id or not self.settings.perf_stream_days:
+            return self.llm.invoke(messages)
+
+        parser = IncrementalArrayParser("days")
+        chunks = []
+        for chunk in self.llm.stream_invoke(messages):
+            chunks.append(chunk)
+            for day_data in parser.feed(chunk):
+                self._emit_day(stream_id, day_data)
+        return "".join(chunks)
+
+    def _emit_day(self, stream_id: str, day_data: Dict[str, Any]):
+        """校验并推送单日行程事件"""
+        try:
+            day_plan = DayPlan(**day_data)
+        except Exception as e:
+            self._log(stream_id, f"⚠️ 单日行程校验失败，等待完整结果: {str(e)}")
+            return
+
+        self._log(stream_id, f"📅 第{day_plan.day_index + 1}天行程已生成: {day_plan.description}")
+        self._emit(stream_id, {
+            "type": "day",
+            "data": day_plan.model_dump()
+        })
+
+    def _emit(self, stream_id: str, event: Dict[str, Any]):
+        """推送日志流事件"""
+        if stream_id:
+            from ..utils.log_streamer import get_log_streamer
+            get_log_streamer().emit_log(stream_id, json.dumps(event, ensure_ascii=False))
+
     def _log(self, stream_id: str, message: str):
         """发送日志消息"""
         print(message)  # 仍然打印到控制台
         
-        if stream_id:
-            from ..utils.log_streamer import get_log_streamer
-            import json
-            log_streamer = get_log_streamer()
-            log_streamer.emit_log(stream_id, json.dumps({
-                "type": "log",
-                "message": message
-            }, ensure_ascii=False))
+        self._emit(stream_id, {
+            "type": "log",
+            "message": message
+        })
     
     def _get_weather_cached(self, city: str, stream_id: str = None) -> str:
-        """获取天气信息（带缓存）"""
-        if self._cache and city in self._cache["weather"]:
-            if self.settings.perf_verbose_logging:
-                self._log(stream_id, "  ⚡ 使用缓存的天气信息")
-            return self._cache["weather"][city]
+        """获取天气信息（带缓存和请求合并）"""
+        return self._load_stage(
+            "weather",
+            self._normalize_cache_key(city),
+            lambda: self._fetch_weather(city, stream_id),
+            stream_id
+        )
 
+    def _fetch_weather(self, city: str, stream_id: str = None) -> str:
+        """调用天气查询Agent"""
         self._log(stream_id, f"🌤️ 查询{city}的天气信息...")
         self._log(stream_id, f"🔧 使用工具: amap_maps_weather")
-        weather_query = f"请查询{city}的天气信息"
-        result = self.weather_agent.run(weather_query)
+        if self.settings.perf_direct_tool_calls:
+            result = self._call_amap_tool("maps_weather", {"city": city})
+        else:
+            weather_query = f"请查询{city}的天气信息"
+            result = self.weather_agent.run(weather_query)
         
         # 解析并显示天气信息
         try:
-            import re
-            
             self._log(stream_id, f"✅ 获取到天气数据")
-            
-            # 解析格式化文本中的天气信息
-            # 格式: - **2025年11月10日（星期一）**
-            #       - 白天：多云，气温 0°C，西风 1-3 级
-            #       - 夜间：晴，气温 -8°C，西风 1-3 级
-            
-            lines = result.split('\n')
-            day_count = 0
-            
-            for i, line in enumerate(lines):
-                # 查找日期行
-                date_match = re.search(r'\*\*(\d{4}年\d{1,2}月\d{1,2}日).*?\*\*', line)
-                if date_match and day_count < 3:  # 只显示前3天
-                    date_str = date_match.group(1)
-                    self._log(stream_id, f"  📅 {date_str}")
-                    
-                    # 查找接下来的白天和夜间信息
-                    if i + 1 < len(lines):
-                        day_line = lines[i + 1]
-                        # 提取白天信息: 白天：多云，气温 0°C，西风 1-3 级
-                        day_match = re.search(r'白天[：:]\s*([^，,]+).*?气温\s*(-?\d+)°C.*?([东南西北]+风.*?\d+-?\d*\s*级)', day_line)
-                        if day_match:
-                            weather_desc = day_match.group(1).strip()
-                            temp = day_match.group(2)
-                            wind = day_match.group(3).strip()
-                            self._log(stream_id, f"    ☀️ 白天: {weather_desc} {temp}°C {wind}")
-                    
-                    if i + 2 < len(lines):
-                        night_line = lines[i + 2]
-                        # 提取夜间信息
-                        night_match = re.search(r'夜间[：:]\s*([^，,]+).*?气温\s*(-?\d+)°C.*?([东南西北]+风.*?\d+-?\d*\s*级)', night_line)
-                        if night_match:
-                            weather_desc = night_match.group(1).strip()
-                            temp = night_match.group(2)
-                            wind = night_match.group(3).strip()
-                            self._log(stream_id, f"    🌙 夜间: {weather_desc} {temp}°C {wind}")
-                    
-                    day_count += 1
-            
-            if day_count > 0:
-                self._log(stream_id, f"✅ 已显示 {day_count} 天天气预报")
-                    
+
+            # 工具返回的JSON格式
+            forecasts = parse_weather_forecasts(result)
+            for cast in forecasts[:3]:  # 只显示前3天
+                self._log(stream_id, f"  📅 {cast.get('date')}")
+                self._log(stream_id, f"    ☀️ 白天: {cast.get('dayweather', '')} {cast.get('daytemp', '')}°C {cast.get('daywind', '')}风 {cast.get('daypower', '')}级")
+                self._log(stream_id, f"    🌙 夜间: {cast.get('nightweather', '')} {cast.get('nighttemp', '')}°C {cast.get('nightwind', '')}风 {cast.get('nightpower', '')}级")
+            if forecasts:
+                self._log(stream_id, f"✅ 已显示 {min(len(forecasts), 3)} 天天气预报")
+            else:
+                # 不是JSON时回退解析Agent输出的格式化文本
+                days = parse_weather_markdown(result)
+                for day in days[:3]:
+                    self._log(stream_id, f"  📅 {day['date']}")
+                    if day["day"]:
+                        self._log(stream_id, f"    ☀️ 白天: {day['day']}")
+                    if day["night"]:
+                        self._log(stream_id, f"    🌙 夜间: {day['night']}")
+                if days:
+                    self._log(stream_id, f"✅ 已显示 {min(len(days), 3)} 天天气预报")
+
         except Exception as e:
             self._log(stream_id, f"⚠️ 解析天气信息时出错: {str(e)}")
         
         self._log(stream_id, f"✅ 天气信息查询完成")
-
-        if self._cache:
-            self._cache["weather"][city] = result
         return result
 
     def _get_hotels_cached(self, city: str, accommodation: str, stream_id: str = None) -> str:
-        """获取酒店信息（带缓存）"""
-        cache_key = f"{city}_{accommodation}"
-        if self._cache and cache_key in self._cache["hotels"]:
-            if self.settings.perf_verbose_logging:
-                self._log(stream_id, "  ⚡ 使用缓存的酒店信息")
-            return self._cache["hotels"][cache_key]
+        """获取酒店信息（带缓存和请求合并）"""
+        return self._load_stage(
+            "hotels",
+            self._normalize_cache_key(city, accommodation),
+            lambda: self._fetch_hotels(city, accommodation, stream_id),
+            stream_id
+        )
 
+    def _fetch_hotels(self, city: str, accommodation: str, stream_id: str = None) -> str:
+        """调用酒店推荐Agent(或直接调用地图工具)"""
         self._log(stream_id, f"🏨 搜索{city}的{accommodation}...")
         self._log(stream_id, f"🔧 使用工具: amap_maps_text_search")
-        hotel_query = f"请搜索{city}的{accommodation}酒店"
-        result = self.hotel_agent.run(hotel_query)
+        if self.settings.perf_direct_tool_calls:
+            keywords = accommodation if "酒店" in accommodation else f"{accommodation}酒店"
+            result = self._call_amap_tool("maps_text_search", {"keywords": keywords, "city": city})
+        else:
+            hotel_query = f"请搜索{city}的{accommodation}酒店"
+            result = self.hotel_agent.run(hotel_query)
         
         # 解析并显示酒店列表
         try:
-            import re
-            
             self._log(stream_id, f"✅ 找到酒店信息")
-            
-            # 解析格式化文本中的酒店信息
-            # 格式: 1. **金悦酒店**
-            #       - 地址：韦曲街道神禾一路何家营新村南6排西1号
-            
-            # 提取所有酒店
-            pattern = r'\d+\.\s*\*\*([^*]+)\*\*\s*-\s*地址[：:]\s*([^\n]+)'
-            matches = re.findall(pattern, result)
-            
-            if matches:
-                # 只显示前5个
-                for i, (name, address) in enumerate(matches[:5]):
-                    name = name.strip()
-                    address = address.strip()
-                    self._log(stream_id, f"  🏨 {name}")
-                    if address:
-                        # 限制地址长度
-                        if len(address) > 50:
-                            address = address[:50] + "..."
-                        self._log(stream_id, f"     📍 {address}")
-                
-                total = len(matches)
-                self._log(stream_id, f"✅ 共找到 {total} 个酒店")
-            else:
-                self._log(stream_id, f"✅ 酒店搜索完成")
-                
+            self._log_poi_list(stream_id, result, "🏨", "酒店")
         except Exception as e:
             self._log(stream_id, f"⚠️ 解析酒店信息时出错: {str(e)}")
         
         self._log(stream_id, f"✅ 酒店信息查询完成")
-
-        if self._cache:
-            self._cache["hotels"][cache_key] = result
         return result
 
-    def _build_attraction_query(self, request: TripRequest) -> str:
-        """构建景点搜索查询 - 直接包含工具调用"""
-        keywords = []
-        if request.preferences:
-            # 只取第一个偏好作为关键词
-            keywords = request.preferences[0]
-        else:
-            keywords = "景点"
+    def _get_attraction_keywords(self, request: TripRequest) -> List[str]:
+        """获取景点搜索关键词列表(每个偏好标签一个,去重)"""
+        keywords_list = []
+        seen = set()
+        for preference in request.preferences:
+            key = self._normalize_cache_key(preference)
+            if key and key not in seen:
+                seen.add(key)
+                keywords_list.append(preference.strip())
+        return keywords_list or ["景点"]
 
+    def _build_attraction_query(self, city: str, keywords: str) -> str:
+        """构建景点搜索查询 - 直接包含工具调用"""
         # 直接返回工具调用格式
-        query = f"请使用amap_maps_text_search工具搜索{request.city}的{keywords}相关景点。\n[TOOL_CALL:amap_maps_text_search:keywords={keywords},city={request.city}]"
+        query = f"请使用amap_maps_text_search工具搜索{city}的{keywords}相关景点。\n[TOOL_CALL:amap_maps_text_search:keywords={keywords},city={city}]"
         return query
 
-    def _build_planner_query(self, request: TripRequest, attractions: str, weather: str, hotels: str = "") -> str:
-        """构建行程规划查询"""
+    def _split_day_windows(self, request: TripRequest) -> List[Tuple[int, int]]:
+        """
+        将长行程拆分为多个日期窗口
+
+        Returns:
+            (起始天序号, 天数) 列表;不需要分段时只有一个窗口
+        """
+        chunk_days = self.settings.perf_plan_chunk_days
+        if chunk_days <= 0 or request.travel_days < max(self.settings.perf_plan_chunk_min_days, chunk_days + 1):
+            return [(0, request.travel_days)]
+
+        # 尽量均分,避免最后一段只有1天
+        window_count = -(-request.travel_days // chunk_days)
+        base, extra = divmod(request.travel_days, window_count)
+        windows = []
+        offset = 0
+        for i in range(window_count):
+            days = base + (1 if i < extra else 0)
+            windows.append((offset, days))
+            offset += days
+        return windows
+
+    def _plan_in_windows(
+        self,
+        request: TripRequest,
+        windows: List[Tuple[int, int]],
+        attractions: str,
+        weather: str,
+        hotels: str,
+        checkpoint: StageCheckpoint,
+        deadline: Deadline,
+        timed_out: List[str],
+        stream_id: str = None
+    ) -> Optional[TripPlan]:
+        """
+        分段并行规划长行程
+
+        景点池按窗口轮流分配,每个窗口只使用分配给自己的景点,
+        各窗口并发调用规划Agent,最后合并为一个完整的旅行计划。
+
+        各窗口的规划结果分别写入检查点,重试时只重新规划失败的窗口。
+        所有窗口共享同一截止时间,超时的窗口使用备用计划填充对应日期。
+
+        Returns:
+            合并后的旅行计划,任一窗口解析失败时返回None
+        """
+        from datetime import datetime, timedelta
+
+        self._log(stream_id, f"🧩 行程较长，拆分为 {len(windows)} 段并行规划...")
+
+        # 按窗口轮流分配景点,避免不同窗口重复安排
+        pool = parse_pois(attractions)
+        assigned: List[List[Dict[str, Any]]] = [[] for _ in windows]
+        for i, poi in enumerate(pool):
+            assigned[i % len(windows)].append(poi)
+
+        start_date = datetime.strptime(request.start_date, "%Y-%m-%d")
+        forecasts = parse_weather_forecasts(weather)
+
+        window_requests = [
+            request.model_copy(update={
+                "start_date": (start_date + timedelta(days=offset)).strftime("%Y-%m-%d"),
+                "end_date": (start_date + timedelta(days=offset + days - 1)).strftime("%Y-%m-%d"),
+                "travel_days": days
+            })
+            for offset, days in windows
+        ]
+
+        def plan_window(index: int) -> Optional[TripPlan]:
+            offset, days = windows[index]
+            window_request = window_requests[index]
+            window_start, window_end = window_request.start_date, window_request.end_date
+
+            if pool:
+                window_attractions = json.dumps({"pois": assigned[index]}, ensure_ascii=False)
+                excluded = [poi["name"] for j, pois in enumerate(assigned) if j != index for poi in pois]
+            else:
+                window_attractions = attractions
+                excluded = []
+
+            window_weather = weather
+            if forecasts:
+                window_casts = [cast for cast in forecasts if window_start <= cast.get("date", "") <= window_end]
+                window_weather = json.dumps({"forecasts": window_casts}, ensure_ascii=False) if window_casts else "暂无这些日期的天气预报"
+
+            query = self._build_planner_query(window_request, window_attractions, window_weather, hotels, stream_id)
+            query += (
+                f"\n**分段说明:** 这是完整{request.travel_days}天行程（{request.start_date} 至 {request.end_date}）"
+                f"中的第{offset + 1}-{offset + days}天，day_index从{offset}开始编号。"
+            )
+            if excluded:
+                query += f"\n不要安排以下景点（已安排在其他日期）: {', '.join(excluded)}"
+
+            self._log(stream_id, f"  🧩 规划第{offset + 1}-{offset + days}天...")
+            try:
+                response = checkpoint.run(
+                    f"planner:{offset}", lambda: self._run_planner(query, stream_id, deadline), stage="planner"
+                )
+                return self._parse_with_recovery(query, response, window_request, stream_id, deadline)
+            except StageTimeoutError as e:
+                if "planner" not in timed_out:
+                    timed_out.append("planner")
+                self._log(stream_id, f"⏱️ 第{offset + 1}-{offset + days}天{e}，使用备用安排")
+                return self._create_fallback_plan(window_request)
+
+        # 窗口使用独立线程池,并在共享截止时间内等待,到期未返回的窗口使用备用安排
+        executor = self._shared_executor("windows")
+        futures = [executor.submit(plan_window, index) for index in range(len(windows))]
+        window_plans = []
+        for (offset, days), window_request, future in zip(windows, window_requests, futures):
+            try:
+                window_plans.append(wait_for(future, deadline, "planner"))
+            except StageTimeoutError as e:
+                if "planner" not in timed_out:
+                    timed_out.append("planner")
+                self._log(stream_id, f"⏱️ 第{offset + 1}-{offset + days}天{e}，使用备用安排")
+                window_plans.append(self._create_fallback_plan(window_request))
+
+        if any(plan is None for plan in window_plans):
+            self._log(stream_id, "⚠️ 部分分段规划失败")
+            return None
+
+        return self._merge_window_plans(request, window_plans)
+
+    def _merge_window_plans(self, request: TripRequest, window_plans: List[TripPlan]) -> TripPlan:
+        """合并分段规划结果: 重新编号日期、去除重复景点、汇总天气和预算"""
+        from datetime import datetime, timedelta
+
+        start_date = datetime.strptime(request.start_date, "%Y-%m-%d")
+        days: List[DayPlan] = []
+        weather_by_date: Dict[str, WeatherInfo] = {}
+        seen_attractions = set()
+        suggestions: List[str] = []
+        totals = {"total_hotels": 0, "total_meals": 0, "total_transportation": 0}
+
+        for plan in window_plans:
+            for day in plan.days:
+                day.day_index = len(days)
+                day.date = (start_date + timedelta(days=day.day_index)).strftime("%Y-%m-%d")
+                unique_attractions = []
+                for attraction in day.attractions:
+                    key = self._normalize_cache_key(attraction.name)
+                    if key not in seen_attractions:
+                        seen_attractions.add(key)
+                        unique_attractions.append(attraction)
+                day.attractions = unique_attractions
+                days.append(day)
+
+            for info in plan.weather_info:
+                weather_by_date.setdefault(info.date, info)
+
+            if plan.overall_suggestions and plan.overall_suggestions not in suggestions:
+                suggestions.append(plan.overall_suggestions)
+
+            if plan.budget:
+                for field in totals:
+                    totals[field] += getattr(plan.budget, field)
+
+        total_attractions = sum(a.ticket_price for day in days for a in day.attractions)
+        budget = Budget(
+            total_attractions=total_attractions,
+            total=total_attractions + sum(totals.values()),
+            **totals
+        )
+
+        return TripPlan(
+            city=request.city,
+            start_date=request.start_date,
+            end_date=request.end_date,
+            days=days,
+            weather_info=[weather_by_date[date] for date in sorted(weather_by_date)],
+            overall_suggestions="\n".join(suggestions),
+            budget=budget
+        )
+
+    def _build_planner_query(
+        self,
+        request: TripRequest,
+        attractions: str,
+        weather: str,
+        hotels: str = "",
+        stream_id: str = None
+    ) -> str:
+        """构建行程规划查询(阶段输出按token预算压缩为紧凑摘要)"""
+        token_budget = self.settings.perf_planner_token_budget
+        if token_budget > 0:
+            compacted, token_stats = compact_stage_outputs(attractions, weather, hotels, token_budget)
+            attractions, weather, hotels = compacted["attractions"], compacted["weather"], compacted["hotels"]
+            self._log(
+                stream_id,
+                f"🗜️ 规划信息压缩: 约{token_stats['before']} → {token_stats['after']} tokens (预算 {token_budget})"
+            )
+
         query = f"""请根据以下信息生成{request.city}的{request.travel_days}天旅行计划:
 
 **基本信息:**
@@ -566,40 +1205,183 @@ class MultiAgentTripPlanner:
             request: 原始请求
             
         Returns:
-            旅行计划
+            旅行计划(解析失败时返回备用计划)
         """
-        try:
-            # 尝试从响应中提取JSON
-            # 查找JSON代码块
-            if "```json" in response:
-                json_start = response.find("```json") + 7
-                json_end = response.find("```", json_start)
-                json_str = response[json_start:json_end].strip()
-            elif "```" in response:
-                json_start = response.find("```") + 3
-                json_end = response.find("```", json_start)
-                json_str = response[json_start:json_end].strip()
-            elif "{" in response and "}" in response:
-                # 直接查找JSON对象
-                json_start = response.find("{")
-                json_end = response.rfind("}") + 1
-                json_str = response[json_start:json_end]
-            else:
-                raise ValueError("响应中未找到JSON数据")
-            
-            # 解析JSON
-            data = json.loads(json_str)
-            
-            # 转换为TripPlan对象
-            trip_plan = TripPlan(**data)
-            
-            return trip_plan
-            
-        except Exception as e:
-            print(f"⚠️  解析响应失败: {str(e)}")
+        trip_plan = self._try_parse_response(response)
+        if trip_plan is None:
             print(f"   将使用备用方案生成计划")
             return self._create_fallback_plan(request)
-    
+        return trip_plan
+
+    def _try_parse_response(self, response: str, request: TripRequest = None) -> Optional[TripPlan]:
+        """
+        从Agent响应中解析旅行计划
+
+        先按标准JSON解析;失败时修复尾随逗号、注释、引号、截断等问题,
+        并只保留结构完整、校验通过的天数。
+
+        Args:
+            response: Agent响应文本
+            request: 原始请求(用于补全缺失的城市和日期)
+
+        Returns:
+            旅行计划,没有可用内容时返回None
+        """
+        data = loads_tolerant(response or "")
+        if not isinstance(data, dict):
+            print(f"⚠️  解析响应失败: 响应中未找到可用的JSON数据")
+            return None
+
+        try:
+            return TripPlan(**data)
+        except Exception as e:
+            print(f"⚠️  解析响应失败: {str(e)}，尝试保留完整的天数")
+
+        days = self._salvage_days(response, data.get("days"))
+        if not days:
+            return None
+
+        budget = None
+        if isinstance(data.get("budget"), dict):
+            try:
+                budget = Budget(**data["budget"])
+            except Exception:
+                budget = None
+
+        return TripPlan(
+            city=str(data.get("city") or (request.city if request else "")),
+            start_date=str(data.get("start_date") or (request.start_date if request else days[0].date)),
+            end_date=str(data.get("end_date") or (request.end_date if request else days[-1].date)),
+            days=days,
+            weather_info=self._salvage_weather(data.get("weather_info")),
+            overall_suggestions=str(data.get("overall_suggestions") or ""),
+            budget=budget or self._estimate_budget(days)
+        )
+
+    def _salvage_days(self, response: str, raw_days: Any, trusted: bool = False) -> List[DayPlan]:
+        """
+        保留已完整输出并通过校验的天(被截断的最后一天会被丢弃)
+
+        Args:
+            response: 原始响应文本,用于判断哪些day对象已闭合
+            raw_days: 修复后解析出的days
+            trusted: raw_days 已是完整解析的结果(不检查截断)
+        """
+        if not isinstance(raw_days, list):
+            return []
+
+        if not trusted:
+            # 原始文本中已闭合的day对象数量,修复时补全的天(包括在第一天内截断的情况)不计入
+            parser = IncrementalArrayParser("days")
+            closed = len(parser.feed(response or "")) + parser.errors
+            raw_days = raw_days[:closed]
+
+        days = []
+        for raw_day in raw_days:
+            try:
+                days.append(DayPlan(**raw_day))
+            except Exception:
+                break
+        return days
+
+    @staticmethod
+    def _salvage_weather(raw_weather: Any) -> List[WeatherInfo]:
+        """保留通过校验的天气信息"""
+        weather = []
+        for item in raw_weather if isinstance(raw_weather, list) else []:
+            try:
+                weather.append(WeatherInfo(**item))
+            except Exception:
+                continue
+        return weather
+
+    @staticmethod
+    def _estimate_budget(days: List[DayPlan]) -> Budget:
+        """根据每天的门票、餐饮、酒店费用估算预算"""
+        total_attractions = sum(a.ticket_price for day in days for a in day.attractions)
+        total_meals = sum(meal.estimated_cost for day in days for meal in day.meals)
+        total_hotels = sum(day.hotel.estimated_cost for day in days if day.hotel)
+        return Budget(
+            total_attractions=total_attractions,
+            total_hotels=total_hotels,
+            total_meals=total_meals,
+            total_transportation=0,
+            total=total_attractions + total_hotels + total_meals
+        )
+
+    def _parse_with_recovery(
+        self,
+        planner_query: str,
+        response: str,
+        request: TripRequest,
+        stream_id: str = None,
+        deadline: Deadline = None
+    ) -> Optional[TripPlan]:
+        """
+        解析规划结果,内容不足时追加一次有针对性的LLM调用
+
+        - 修复后天数完整: 直接返回
+        - 保留了部分天数: 请求模型只续写缺少的天数并合并
+        - 完全无法解析: 请求模型修复JSON
+
+        追加调用与首次调用共享截止时间;续写超时时返回已保留的天数。
+
+        Returns:
+            旅行计划,仍无可用内容时返回None
+        """
+        from datetime import datetime, timedelta
+
+        trip_plan = self._try_parse_response(response, request)
+        if trip_plan is not None and len(trip_plan.days) >= request.travel_days:
+            return trip_plan
+        if not self.settings.perf_json_repair_followup:
+            return trip_plan
+
+        if trip_plan is None:
+            self._log(stream_id, "🔧 规划结果无法解析，请求模型修复JSON...")
+            repair_query = (
+                f"{planner_query}\n\n**修复说明:** 你上一次的输出不是合法的JSON，内容如下:\n"
+                f"{response}\n\n请按照要求的格式重新输出完整、合法的JSON，不要包含其他文字。"
+            )
+            return self._try_parse_response(self._run_planner(repair_query, stream_id, deadline), request)
+
+        done = len(trip_plan.days)
+        start_date = datetime.strptime(request.start_date, "%Y-%m-%d")
+        next_date = (start_date + timedelta(days=done)).strftime("%Y-%m-%d")
+        next_index = trip_plan.days[-1].day_index + 1
+        planned = [a.name for day in trip_plan.days for a in day.attractions]
+
+        self._log(stream_id, f"🩹 规划结果不完整，已保留{done}天，续写剩余{request.travel_days - done}天...")
+        continue_query = (
+            f"{planner_query}\n\n**续写说明:** 前{done}天已生成。请只生成 {next_date} 至 {request.end_date} "
+            f"的{request.travel_days - done}天，day_index从{next_index}开始，"
+            f"返回 {{\"days\": [...], \"weather_info\": [...]}} 格式的JSON。"
+        )
+        if planned:
+            continue_query += f"\n不要安排以下景点（已安排在前面的日期）: {', '.join(planned)}"
+
+        try:
+            continuation = loads_tolerant(self._run_planner(continue_query, stream_id, deadline) or "")
+        except StageTimeoutError as e:
+            self._log(stream_id, f"⏱️ 续写{e}，返回已保留的{done}天")
+            return trip_plan
+        if not isinstance(continuation, dict):
+            return trip_plan
+
+        for day in self._salvage_days("", continuation.get("days"), trusted=True)[:request.travel_days - done]:
+            day.day_index = len(trip_plan.days) + trip_plan.days[0].day_index
+            day.date = (start_date + timedelta(days=len(trip_plan.days))).strftime("%Y-%m-%d")
+            trip_plan.days.append(day)
+
+        known_dates = {info.date for info in trip_plan.weather_info}
+        for info in self._salvage_weather(continuation.get("weather_info")):
+            if info.date not in known_dates:
+                trip_plan.weather_info.append(info)
+        if trip_plan.budget is None or len(trip_plan.days) > done:
+            trip_plan.budget = self._estimate_budget(trip_plan.days)
+
+        return trip_plan
+
     def _create_fallback_plan(self, request: TripRequest) -> TripPlan:
         """创建备用计划(当Agent失败时)"""
         from datetime import datetime, timedelta
@@ -649,14 +1431,89 @@ class MultiAgentTripPlanner:
 
 # 全局多智能体系统实例
 _multi_agent_planner = None
+_planner_lock = threading.Lock()
+
+# 预热状态: 规划系统初始化完成前服务未就绪
+_warmup_status: Dict[str, Any] = {
+    "ready": False,
+    "warming_up": False,
+    "warmup_seconds": None,
+    "error": None,
+}
 
 
 def get_trip_planner_agent() -> MultiAgentTripPlanner:
-    """获取多智能体旅行规划系统实例(单例模式)"""
+    """
+    获取多智能体旅行规划系统实例(单例模式)
+
+    初始化会启动MCP服务器进程并创建Agent,加锁保证并发的首次调用只初始化一次。
+    """
     global _multi_agent_planner
 
     if _multi_agent_planner is None:
-        _multi_agent_planner = MultiAgentTripPlanner()
+        with _planner_lock:
+            if _multi_agent_planner is None:
+                start = time.perf_counter()
+                _warmup_status["warming_up"] = True
+                try:
+                    _multi_agent_planner = MultiAgentTripPlanner()
+                except Exception as e:
+                    _warmup_status["error"] = str(e)
+                    raise
+                finally:
+                    _warmup_status["warming_up"] = False
+                _warmup_status.update(
+                    ready=True,
+                    warmup_seconds=round(time.perf_counter() - start, 3),
+                    error=None
+                )
 
     return _multi_agent_planner
 
+
+def warm_up_trip_planner() -> bool:
+    """
+    预热规划系统(应用启动时调用)
+
+    提前完成多智能体系统、LLM客户端和规划调度器的初始化,避免第一个请求承担这些开销。
+
+    Returns:
+        是否预热成功
+    """
+    print("🔥 预热多智能体旅行规划系统...")
+    try:
+        get_trip_planner_agent()
+        get_plan_scheduler()
+    except Exception as e:
+        print(f"❌ 规划系统预热失败（首个请求时将重新初始化）: {e}")
+        return False
+
+    print(f"✅ 规划系统预热完成，耗时 {_warmup_status['warmup_seconds']:.2f} 秒")
+    return True
+
+
+def get_warmup_status() -> Dict[str, Any]:
+    """获取规划系统的预热/就绪状态"""
+    return dict(_warmup_status)
+
+
+def get_planner_metrics() -> Dict[str, Any]:
+    """获取规划系统的性能指标(系统未初始化时返回空字典)"""
+    if _multi_agent_planner is None:
+        return {}
+
+    return {
+        "cache": _multi_agent_planner.get_cache_stats(),
+        "single_flight": _multi_agent_planner.get_single_flight_stats(),
+        "stages": _multi_agent_planner.get_stage_stats(),
+        "abandoned": get_abandoned_stats()
+    }
+
+
+async def get_trip_planner_agent_async() -> MultiAgentTripPlanner:
+    """异步获取多智能体旅行规划系统实例(首次初始化在线程池中执行)"""
+    if _multi_agent_planner is not None:
+        return _multi_agent_planner
+
+    return await run_blocking(get_trip_planner_agent)
+
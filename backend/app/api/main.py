@@ -1,6 +1,8 @@
 """FastAPI主应用"""
 
+import asyncio
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from ..config import get_settings, validate_config, print_config
 from .routes import trip, poi, map as map_routes
@@ -59,6 +61,14 @@ async def startup_event():
         init_database()
     except Exception as e:
         print(f"⚠️  数据库初始化警告: {e}")
+
+    # 在后台预热规划系统(启动MCP服务器、创建Agent),预热完成前 /ready 返回503
+    if settings.perf_warmup_on_startup:
+        from ..agents.trip_planner_agent import warm_up_trip_planner
+        from ..utils.executor import get_blocking_executor
+        app.state.warmup = asyncio.get_running_loop().run_in_executor(
+            get_blocking_executor(), warm_up_trip_planner
+        )
     
     print("\n" + "="*60)
     print("📚 API文档: http://localhost:8000/docs")
@@ -73,6 +83,16 @@ async def shutdown_event():
     print("👋 应用正在关闭...")
     print("="*60 + "\n")
 
+    from ..utils.plan_scheduler import shutdown_plan_scheduler
+    from ..utils.executor import shutdown_blocking_executor
+    from ..services.amap_service import shutdown_amap_mcp_manager, shutdown_amap_http_client
+    from ..services.geocode_store import shutdown_geocode_store
+    shutdown_plan_scheduler()
+    shutdown_blocking_executor()
+    shutdown_amap_mcp_manager()
+    shutdown_amap_http_client()
+    shutdown_geocode_store()
+
 
 @app.get("/")
 async def root():
@@ -96,6 +116,57 @@ async def health():
     }
 
 
+@app.get("/ready")
+async def ready():
+    """就绪检查(规划系统预热完成前返回503)"""
+    from ..agents.trip_planner_agent import get_warmup_status
+
+    status = get_warmup_status()
+    # 未开启预热时规划系统在首个请求时初始化,服务始终视为就绪
+    is_ready = status["ready"] or not settings.perf_warmup_on_startup
+    if is_ready:
+        state = "ready"
+    elif status["error"] and not status["warming_up"]:
+        state = "failed"
+    else:
+        state = "warming_up"
+    content = {
+        "status": state,
+        "service": settings.app_name,
+        **status
+    }
+    return JSONResponse(status_code=200 if is_ready else 503, content=content)
+
+
+@app.get("/metrics")
+async def metrics():
+    """性能指标"""
+    from ..agents.trip_planner_agent import get_planner_metrics
+    from ..services.llm_service import get_llm_metrics
+    from ..utils.rate_limiter import get_rate_limiter_stats
+    from ..utils.concurrency_limiter import get_concurrency_stats
+    from ..utils.retry_handler import get_retry_metrics
+    from ..utils.plan_scheduler import get_plan_scheduler_stats
+    from ..services.trip_job_service import get_trip_job_stats
+    from ..services.amap_service import get_mcp_stats, get_amap_http_stats, get_amap_cache_stats
+    from ..services.geocode_store import get_geocode_store_stats
+
+    return {
+        "service": settings.app_name,
+        "planner": get_planner_metrics(),
+        "scheduler": get_plan_scheduler_stats(),
+        "jobs": get_trip_job_stats(),
+        "llm": get_llm_metrics(),
+        "rate_limits": get_rate_limiter_stats(),
+        "concurrency": get_concurrency_stats(),
+        "mcp": get_mcp_stats(),
+        "amap_http": get_amap_http_stats(),
+        "map_cache": get_amap_cache_stats(),
+        "geocode_store": get_geocode_store_stats(),
+        "retries": get_retry_metrics()
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     
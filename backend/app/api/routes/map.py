@@ -10,6 +10,7 @@ from ...models.schemas import (
     WeatherResponse
 )
 from ...services.amap_service import get_amap_service
+from ...utils.executor import run_blocking
 
 router = APIRouter(prefix="/map", tags=["地图服务"])
 
@@ -41,7 +42,7 @@ async def search_poi(
         service = get_amap_service()
         
         # 搜索POI
-        pois = service.search_poi(keywords, city, citylimit)
+        pois = await run_blocking(service.search_poi, keywords, city, citylimit)
         
         return POISearchResponse(
             success=True,
@@ -80,7 +81,7 @@ async def get_weather(
         service = get_amap_service()
         
         # 查询天气
-        weather_info = service.get_weather(city)
+        weather_info = await run_blocking(service.get_weather, city)
         
         return WeatherResponse(
             success=True,
@@ -117,7 +118,8 @@ async def plan_route(request: RouteRequest):
         service = get_amap_service()
         
         # 规划路线
-        route_info = service.plan_route(
+        route_info = await run_blocking(
+            service.plan_route,
             origin_address=request.origin_address,
             destination_address=request.destination_address,
             origin_city=request.origin_city,
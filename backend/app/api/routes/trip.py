@@ -4,27 +4,46 @@ from fastapi import APIRouter, HTTPException, Header, Depends
 from fastapi.responses import StreamingResponse
 from typing import Optional
 import uuid
-import threading
 import asyncio
+from concurrent.futures import Future
 from ...models.schemas import (
     TripRequest,
     TripPlanResponse,
     TripHistoryResponse,
+    TripJobResponse,
     ErrorResponse
 )
-from ...agents.trip_planner_agent import get_trip_planner_agent
+from ...agents.trip_planner_agent import get_trip_planner_agent, get_trip_planner_agent_async
 from ...services.auth_service import get_user_id_from_token
 from ...services.database import save_trip_plan, get_trip_plans_by_user, get_trip_plan_by_id
+from ...services.trip_job_service import JOB_CANCELLED, get_trip_job_service
 from ...utils.log_streamer import get_log_streamer
+from ...utils.executor import run_db
+from ...utils.plan_scheduler import (
+    PRIORITY_ANONYMOUS,
+    PRIORITY_USER,
+    SchedulerFullError,
+    get_plan_scheduler
+)
 
 router = APIRouter(prefix="/trip", tags=["旅行规划"])
 
 
+def _queue_full_error(error: SchedulerFullError) -> HTTPException:
+    """规划队列已满时返回503,并通过Retry-After提示客户端稍后重试"""
+    print(f"⚠️  {error}")
+    return HTTPException(
+        status_code=503,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
 @router.post(
     "/plan",
     response_model=TripPlanResponse,
     summary="生成旅行计划",
-    description="根据用户输入的旅行需求,生成详细的旅行计划。已登录用户的数据会自动保存。"
+    description="根据用户输入的旅行需求,生成详细的旅行计划。已登录用户的数据会自动保存。规划队列已满时返回503。"
 )
 async def plan_trip(
     request: TripRequest,
@@ -52,17 +71,20 @@ async def plan_trip(
         user_id = None
         if authorization:
             token = authorization.replace("Bearer ", "").strip()
-            user_id = get_user_id_from_token(token)
+            user_id = await run_db(get_user_id_from_token, token)
             if user_id:
                 print(f"👤 用户已登录: {user_id}")
 
         # 获取Agent实例
         print("🔄 获取多智能体系统实例...")
-        agent = get_trip_planner_agent()
+        agent = await get_trip_planner_agent_async()
 
-        # 生成旅行计划
+        # 生成旅行计划（由规划调度器排队执行，已登录用户优先，不阻塞事件循环）
         print("🚀 开始生成旅行计划...")
-        trip_plan = agent.plan_trip(request)
+        trip_plan = await agent.plan_trip_async(
+            request,
+            priority=PRIORITY_USER if user_id else PRIORITY_ANONYMOUS
+        )
 
         print("✅ 旅行计划生成成功,准备返回响应\n")
 
@@ -73,7 +95,7 @@ async def plan_trip(
                 request_data = request.model_dump()
                 response_data = trip_plan.model_dump() if hasattr(trip_plan, 'model_dump') else trip_plan.dict()
                 
-                plan_id = save_trip_plan(user_id, request_data, response_data)
+                plan_id = await run_db(save_trip_plan, user_id, request_data, response_data)
                 if plan_id:
                     print(f"💾 旅行规划已保存到数据库: {plan_id}")
             except Exception as e:
@@ -86,6 +108,8 @@ async def plan_trip(
             data=trip_plan
         )
 
+    except SchedulerFullError as e:
+        raise _queue_full_error(e)
     except Exception as e:
         print(f"❌ 生成旅行计划失败: {str(e)}")
         import traceback
@@ -99,7 +123,7 @@ async def plan_trip(
 @router.post(
     "/plan-stream",
     summary="生成旅行计划（带实时日志流）",
-    description="根据用户输入的旅行需求,生成详细的旅行计划,并实时返回日志流。"
+    description="根据用户输入的旅行需求,生成详细的旅行计划,并实时返回日志流。规划队列已满时返回503。"
 )
 async def plan_trip_stream(
     request: TripRequest,
@@ -110,6 +134,8 @@ async def plan_trip_stream(
     
     返回格式: Server-Sent Events (SSE)
     - 日志消息: data: {"type": "log", "message": "..."}
+    - 排队位置: data: {"type": "log", "message": "...", "queue_position": 3}（排队期间位置变化时推送）
+    - 单日行程: data: {"type": "day", "data": {...}}（生成过程中逐天推送）
     - 最终结果: data: {"type": "result", "data": {...}}
     - 错误消息: data: {"type": "error", "message": "..."}
     """
@@ -117,156 +143,147 @@ async def plan_trip_stream(
     
     stream_id = str(uuid.uuid4())
     log_streamer = get_log_streamer()
-    
+    scheduler = get_plan_scheduler()
+
+    def emit(message: str, event_type: str = "log"):
+        log_streamer.emit_log(stream_id, json.dumps({
+            "type": event_type,
+            "message": message
+        }, ensure_ascii=False))
+
+    # 获取用户ID（已登录用户优先调度）
+    user_id = None
+    if authorization:
+        token = authorization.replace("Bearer ", "").strip()
+        user_id = await run_db(get_user_id_from_token, token)
+
+    # 创建日志队列（先于提交任务创建，避免丢失规划开始时的日志）
+    queue = log_streamer.create_stream(stream_id)
+
+    # 发送初始日志
+    emit(f"{'='*60}")
+    emit(f"📥 收到旅行规划请求:")
+    emit(f"城市: {request.city}")
+    emit(f"日期: {request.start_date} - {request.end_date}")
+    emit(f"天数: {request.travel_days}")
+    emit(f"{'='*60}")
+    if user_id:
+        emit(f"👤 用户已登录: {user_id}")
+
+    # 由规划调度器的工作线程执行规划
+    result_container = {"trip_plan": None, "error": None}
+
+    def save_plan(trip_plan):
+        """已登录时保存到数据库"""
+        if not user_id:
+            return
+        try:
+            request_data = request.model_dump()
+            response_data = trip_plan.model_dump() if hasattr(trip_plan, 'model_dump') else trip_plan.dict()
+            plan_id = save_trip_plan(user_id, request_data, response_data)
+            if plan_id:
+                emit(f"💾 旅行规划已保存到数据库: {plan_id}")
+        except Exception as e:
+            emit(f"⚠️  保存旅行规划到数据库失败: {e}")
+
+    def run_planning():
+        try:
+            emit("🔄 获取多智能体系统实例...")
+
+            agent = get_trip_planner_agent()
+
+            # 显示可用工具信息
+            try:
+                tools = agent.attraction_agent.list_tools()
+                emit(f"✅ 多智能体系统就绪 (共 {len(tools)} 个工具)")
+
+                # 显示部分工具名称
+                tool_names = []
+                for tool in tools[:5]:
+                    if hasattr(tool, 'name'):
+                        tool_names.append(tool.name)
+                    elif isinstance(tool, str):
+                        tool_names.append(tool)
+                    else:
+                        tool_names.append(str(tool))
+
+                for tool_name in tool_names:
+                    emit(f"  🔧 工具: {tool_name}")
+
+                if len(tools) > 5:
+                    emit(f"  ... 还有 {len(tools) - 5} 个工具")
+            except Exception as e:
+                emit(f"✅ 多智能体系统就绪")
+
+            emit("🚀 开始生成旅行计划...")
+
+            # 传递stream_id给agent
+            trip_plan = agent.plan_trip(request, stream_id=stream_id)
+            result_container["trip_plan"] = trip_plan
+
+            emit("✅ 旅行计划生成成功,准备返回响应")
+
+            # 保存到数据库
+            save_plan(trip_plan)
+
+        except Exception as e:
+            result_container["error"] = str(e)
+            emit(f"❌ 生成旅行计划失败: {str(e)}", event_type="error")
+
+    # 相同请求命中行程缓存时直接返回，不进入规划队列
+    job = None
+    agent = await get_trip_planner_agent_async()
+    cached_plan = agent.get_cached_plan(request, stream_id)
+    if cached_plan is not None:
+        result_container["trip_plan"] = cached_plan
+        emit("✅ 旅行计划生成成功,准备返回响应")
+        await run_db(save_plan, cached_plan)
+        future = Future()
+        future.set_result(None)
+    else:
+        # 提交规划任务（队列已满时直接返回503，不建立日志流）
+        try:
+            job = scheduler.submit(
+                run_planning,
+                priority=PRIORITY_USER if user_id else PRIORITY_ANONYMOUS
+            )
+        except SchedulerFullError as e:
+            log_streamer.close_stream(stream_id)
+            raise _queue_full_error(e)
+        future = job.future
+
     async def generate():
         try:
-            # 发送初始日志
-            log_streamer.emit_log(stream_id, json.dumps({
-                "type": "log",
-                "message": f"{'='*60}"
-            }, ensure_ascii=False))
-            log_streamer.emit_log(stream_id, json.dumps({
-                "type": "log",
-                "message": f"📥 收到旅行规划请求:"
-            }, ensure_ascii=False))
-            log_streamer.emit_log(stream_id, json.dumps({
-                "type": "log",
-                "message": f"城市: {request.city}"
-            }, ensure_ascii=False))
-            log_streamer.emit_log(stream_id, json.dumps({
-                "type": "log",
-                "message": f"日期: {request.start_date} - {request.end_date}"
-            }, ensure_ascii=False))
-            log_streamer.emit_log(stream_id, json.dumps({
-                "type": "log",
-                "message": f"天数: {request.travel_days}"
-            }, ensure_ascii=False))
-            log_streamer.emit_log(stream_id, json.dumps({
-                "type": "log",
-                "message": f"{'='*60}"
-            }, ensure_ascii=False))
-            
-            # 获取用户ID
-            user_id = None
-            if authorization:
-                token = authorization.replace("Bearer ", "").strip()
-                user_id = get_user_id_from_token(token)
-                if user_id:
-                    log_streamer.emit_log(stream_id, json.dumps({
-                        "type": "log",
-                        "message": f"👤 用户已登录: {user_id}"
-                    }, ensure_ascii=False))
-            
-            # 在后台线程中执行规划
-            result_container = {"trip_plan": None, "error": None}
-            
-            def run_planning():
-                try:
-                    log_streamer.emit_log(stream_id, json.dumps({
-                        "type": "log",
-                        "message": "🔄 获取多智能体系统实例..."
-                    }, ensure_ascii=False))
-                    
-                    agent = get_trip_planner_agent()
-                    
-                    # 显示可用工具信息
-                    try:
-                        tools = agent.attraction_agent.list_tools()
-                        log_streamer.emit_log(stream_id, json.dumps({
-                            "type": "log",
-                            "message": f"✅ 多智能体系统就绪 (共 {len(tools)} 个工具)"
-                        }, ensure_ascii=False))
-                        
-                        # 显示部分工具名称
-                        tool_names = []
-                        for tool in tools[:5]:
-                            if hasattr(tool, 'name'):
-                                tool_names.append(tool.name)
-                            elif isinstance(tool, str):
-                                tool_names.append(tool)
-                            else:
-                                tool_names.append(str(tool))
-                        
-                        for tool_name in tool_names:
-                            log_streamer.emit_log(stream_id, json.dumps({
-                                "type": "log",
-                                "message": f"  🔧 工具: {tool_name}"
-                            }, ensure_ascii=False))
-                        
-                        if len(tools) > 5:
-                            log_streamer.emit_log(stream_id, json.dumps({
-                                "type": "log",
-                                "message": f"  ... 还有 {len(tools) - 5} 个工具"
-                            }, ensure_ascii=False))
-                    except Exception as e:
-                        log_streamer.emit_log(stream_id, json.dumps({
-                            "type": "log",
-                            "message": f"✅ 多智能体系统就绪"
-                        }, ensure_ascii=False))
-                    
-                    log_streamer.emit_log(stream_id, json.dumps({
-                        "type": "log",
-                        "message": "🚀 开始生成旅行计划..."
-                    }, ensure_ascii=False))
-                    
-                    # 传递stream_id给agent
-                    trip_plan = agent.plan_trip(request, stream_id=stream_id)
-                    result_container["trip_plan"] = trip_plan
-                    
-                    log_streamer.emit_log(stream_id, json.dumps({
-                        "type": "log",
-                        "message": "✅ 旅行计划生成成功,准备返回响应"
-                    }, ensure_ascii=False))
-                    
-                    # 保存到数据库
-                    if user_id:
-                        try:
-                            request_data = request.model_dump()
-                            response_data = trip_plan.model_dump() if hasattr(trip_plan, 'model_dump') else trip_plan.dict()
-                            plan_id = save_trip_plan(user_id, request_data, response_data)
-                            if plan_id:
-                                log_streamer.emit_log(stream_id, json.dumps({
-                                    "type": "log",
-                                    "message": f"💾 旅行规划已保存到数据库: {plan_id}"
-                                }, ensure_ascii=False))
-                        except Exception as e:
-                            log_streamer.emit_log(stream_id, json.dumps({
-                                "type": "log",
-                                "message": f"⚠️  保存旅行规划到数据库失败: {e}"
-                            }, ensure_ascii=False))
-                    
-                except Exception as e:
-                    result_container["error"] = str(e)
-                    log_streamer.emit_log(stream_id, json.dumps({
-                        "type": "error",
-                        "message": f"❌ 生成旅行计划失败: {str(e)}"
-                    }, ensure_ascii=False))
-            
-            # 创建日志队列
-            queue = log_streamer.create_stream(stream_id)
-            
-            # 启动后台线程
-            thread = threading.Thread(target=run_planning)
-            thread.start()
-            
+            last_position = None
+
             # 流式传输日志
-            if queue:
-                while True:
-                    # 检查线程是否完成
-                    if not thread.is_alive() and queue.empty():
+            while True:
+                # 检查规划任务是否完成
+                if future.done() and queue.empty():
+                    break
+
+                # 非阻塞地检查队列
+                if not queue.empty():
+                    message = queue.get()
+                    if message is None:  # 结束信号
                         break
-                    
-                    # 非阻塞地检查队列
-                    if not queue.empty():
-                        message = queue.get()
-                        if message is None:  # 结束信号
-                            break
-                        yield f"data: {message}\n\n"
-                    else:
-                        await asyncio.sleep(0.1)
+                    yield f"data: {message}\n\n"
+                    continue
+
+                # 排队期间推送队列位置
+                position = scheduler.position(job) if job is not None else None
+                if position is not None and position != last_position:
+                    last_position = position
+                    message = (
+                        f"⏳ 排队中，前面还有 {position} 个规划任务"
+                        f"（预计等待约 {scheduler.estimate_wait(position)} 秒）"
+                    )
+                    yield f"data: {json.dumps({'type': 'log', 'message': message, 'queue_position': position}, ensure_ascii=False)}\n\n"
+
+                await asyncio.sleep(0.1)
             
-            # 等待线程完成
-            thread.join()
+            # 等待规划任务完成（不阻塞事件循环）
+            await asyncio.wrap_future(future)
             
             # 发送最终结果
             if result_container["error"]:
@@ -279,6 +296,9 @@ async def plan_trip_stream(
         except Exception as e:
             yield f"data: {json.dumps({'type': 'error', 'message': str(e)}, ensure_ascii=False)}\n\n"
         finally:
+            # 客户端断开时取消尚未开始执行的任务
+            if job is not None:
+                scheduler.cancel(job)
             log_streamer.close_stream(stream_id)
     
     return StreamingResponse(
@@ -292,6 +312,109 @@ async def plan_trip_stream(
     )
 
 
+async def _get_optional_user_id(authorization: Optional[str]) -> Optional[str]:
+    """从可选的认证头中获取用户ID（未登录或token无效时返回None）"""
+    if not authorization:
+        return None
+    token = authorization.replace("Bearer ", "").strip()
+    return await run_db(get_user_id_from_token, token)
+
+
+@router.post(
+    "/jobs",
+    response_model=TripJobResponse,
+    status_code=202,
+    summary="提交旅行规划任务",
+    description="提交旅行规划任务并立即返回任务ID,通过 GET /trip/jobs/{job_id} 轮询状态和结果。规划队列已满时返回503。"
+)
+async def create_trip_job(
+    request: TripRequest,
+    authorization: Optional[str] = Header(None)
+):
+    """
+    提交旅行规划任务
+
+    任务在规划调度器中执行,与本次HTTP连接无关;结果在服务端保存 perf_job_result_ttl 秒,
+    客户端断线后可以用任务ID重新获取,不会重新规划。
+
+    Args:
+        request: 旅行请求参数
+        authorization: 可选的认证token（Bearer token）
+
+    Returns:
+        任务状态
+    """
+    user_id = await _get_optional_user_id(authorization)
+    service = get_trip_job_service()
+
+    try:
+        job = service.submit(request, user_id)
+    except SchedulerFullError as e:
+        raise _queue_full_error(e)
+
+    return TripJobResponse(
+        success=True,
+        message="旅行规划任务已提交",
+        data=service.describe(job)
+    )
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=TripJobResponse,
+    summary="查询旅行规划任务",
+    description="查询旅行规划任务的状态,任务成功后返回旅行计划"
+)
+async def get_trip_job(
+    job_id: str,
+    authorization: Optional[str] = Header(None)
+):
+    """查询旅行规划任务"""
+    user_id = await _get_optional_user_id(authorization)
+    service = get_trip_job_service()
+
+    job = service.get(job_id, user_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail="任务不存在、已过期或无权访问"
+        )
+
+    return TripJobResponse(
+        success=True,
+        message="获取任务状态成功",
+        data=service.describe(job)
+    )
+
+
+@router.delete(
+    "/jobs/{job_id}",
+    response_model=TripJobResponse,
+    summary="取消旅行规划任务",
+    description="取消排队中或执行中的旅行规划任务（执行中的任务结果会被丢弃）"
+)
+async def cancel_trip_job(
+    job_id: str,
+    authorization: Optional[str] = Header(None)
+):
+    """取消旅行规划任务"""
+    user_id = await _get_optional_user_id(authorization)
+    service = get_trip_job_service()
+
+    job = service.cancel(job_id, user_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail="任务不存在、已过期或无权访问"
+        )
+
+    return TripJobResponse(
+        success=True,
+        message="任务已取消" if job.status == JOB_CANCELLED else "任务已结束或正在保存结果，无法取消",
+        data=service.describe(job)
+    )
+
+
 @router.get(
     "/history",
     response_model=TripHistoryResponse,
@@ -309,7 +432,7 @@ async def get_history(
         )
     
     token = authorization.replace("Bearer ", "").strip()
-    user_id = get_user_id_from_token(token)
+    user_id = await run_db(get_user_id_from_token, token)
     
     if not user_id:
         raise HTTPException(
@@ -318,7 +441,7 @@ async def get_history(
         )
     
     try:
-        plans = get_trip_plans_by_user(user_id)
+        plans = await run_db(get_trip_plans_by_user, user_id)
         
         # 转换数据格式，只返回请求数据用于列表显示
         history_items = []
@@ -362,7 +485,7 @@ async def get_trip_plan(
         )
     
     token = authorization.replace("Bearer ", "").strip()
-    user_id = get_user_id_from_token(token)
+    user_id = await run_db(get_user_id_from_token, token)
     
     if not user_id:
         raise HTTPException(
@@ -371,7 +494,7 @@ async def get_trip_plan(
         )
     
     try:
-        plan = get_trip_plan_by_id(plan_id, user_id)
+        plan = await run_db(get_trip_plan_by_id, plan_id, user_id)
         
         if not plan:
             raise HTTPException(
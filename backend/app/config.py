@@ -33,6 +33,8 @@ class Settings(BaseSettings):
 
     # 高德地图API配置
     amap_api_key: str = ""
+    amap_backend: str = "mcp"  # 地图工具后端: mcp(通过MCP服务器) / http(直连高德Web服务API)
+    amap_api_base_url: str = "https://restapi.amap.com"  # 高德Web服务地址(http后端)
 
     # Unsplash API配置
     unsplash_access_key: str = ""
@@ -42,6 +44,8 @@ class Settings(BaseSettings):
     openai_api_key: str = ""
     openai_base_url: str = "https://api.openai.com/v1"
     openai_model: str = "gpt-4"
+    # 多端点LLM池(可选): 端点用分号分隔,格式 base_url|api_key|权重|模型,权重和模型可省略
+    llm_endpoints: str = ""
 
     # 日志配置
     log_level: str = "INFO"
@@ -54,13 +58,58 @@ class Settings(BaseSettings):
 
     # 性能配置
     perf_max_workers: int = 3  # 最大并行工作线程数
+    perf_warmup_on_startup: bool = True  # 启动时预热规划系统（预热完成前 /ready 返回503）
+    perf_max_concurrent_plans: int = 16  # 同时执行的规划任务上限（规划调度器的工作线程数）
+    perf_db_workers: int = 4  # 鉴权和数据库读写线程池大小（与地图查询等阻塞任务分开）
+    perf_plan_queue_size: int = 32  # 规划队列每个优先级的排队上限（队列满时返回503）
+    perf_job_result_ttl: int = 3600  # 异步规划任务结束后结果的保存时间（秒）
+    perf_job_max_results: int = 1000  # 保存的已结束异步规划任务数上限（超出后按LRU淘汰）
     perf_enable_cache: bool = True  # 是否启用缓存
     perf_cache_ttl: int = 3600  # 缓存过期时间（秒）
+    perf_cache_max_size: int = 256  # 每类缓存的最大条目数（超出后按LRU淘汰）
+    perf_plan_cache_ttl: int = 1800  # 整体行程缓存过期时间（秒，0表示禁用）
+    perf_plan_cache_max_size: int = 128  # 整体行程缓存的最大条目数
+    perf_map_poi_cache_ttl: int = 3600  # 地图服务POI搜索结果缓存时间（秒，0表示禁用）
+    perf_map_weather_cache_ttl: int = 1800  # 地图服务天气结果缓存时间（秒，0表示禁用）
+    perf_map_route_cache_ttl: int = 3600  # 地图服务路线规划结果缓存时间（秒，0表示禁用）
+    perf_map_geocode_cache_ttl: int = 86400  # 地图服务地理编码结果缓存时间（秒，0表示禁用）
+    perf_geocode_store_path: str = "data/geocode.sqlite3"  # 持久化地理编码库的SQLite文件路径（相对路径基于backend目录，空表示禁用）
+    perf_geocode_grid_size: float = 0.01  # 地理编码库反向查找的网格大小（度，约1公里）
+    perf_geocode_tolerance: float = 500  # 行程中的坐标与已知坐标的允许偏差（米，超出时修正为已知坐标）
+    perf_geocode_max_correction: float = 5000  # 单次坐标修正的最大距离（米，超出时视为地址不匹配，不修正）
     perf_agent_timeout: int = 30  # Agent 执行超时时间（秒）
     perf_llm_timeout: int = 60  # LLM 调用超时时间（秒）
+    perf_planner_timeout: int = 180  # 规划阶段的总截止时间（秒，包含续写/修复调用和所有分段窗口，应为单次LLM调用超时的数倍，0表示不限时）
     perf_max_retries: int = 2  # 最大重试次数
     perf_retry_delay: float = 1.0  # 重试延迟（秒）
+    perf_retry_budget_ratio: float = 0.2  # 重试预算: 每次调用可积累的重试次数（重试量占调用量的比例上限）
+    perf_retry_budget_min_per_second: float = 1.0  # 重试预算: 每秒固定补充的重试次数
     perf_verbose_logging: bool = False  # 是否启用详细日志
+    perf_attraction_fanout_workers: int = 4  # 多偏好景点搜索的并行线程数
+    perf_attraction_pool_size: int = 30  # 多偏好合并后保留的景点数上限
+    perf_plan_chunk_days: int = 3  # 长行程分段并行规划时每段的天数（0表示不分段）
+    perf_plan_chunk_min_days: int = 5  # 达到该天数的行程才分段规划
+    perf_stream_days: bool = True  # 流式接口在规划生成过程中逐天推送行程
+    perf_direct_tool_calls: bool = False  # 景点/天气/酒店阶段直接调用地图工具（跳过LLM）
+    perf_mcp_pool_size: int = 2  # 常驻的高德MCP服务器连接数（0表示每次调用启动新的服务器进程）
+    perf_mcp_call_timeout: float = 30.0  # 单次MCP工具调用的超时时间（秒，包含排队等待）
+    perf_mcp_health_interval: float = 30.0  # MCP连接健康检查间隔（秒，0表示不检查）
+    perf_amap_http_max_connections: int = 32  # 高德HTTP客户端连接池的最大连接数（http后端）
+    perf_amap_http_timeout: float = 10.0  # 高德HTTP请求超时时间（秒，http后端）
+    perf_llm_eject_cooldown: float = 30.0  # LLM端点出现429/5xx后移出轮转的冷却时间（秒）
+    perf_llm_rpm: int = 0  # LLM每分钟请求数上限（主动限流，0表示不限）
+    perf_llm_tpm: int = 0  # LLM每分钟token数上限（按估算的输入+输出token计，0表示不限）
+    perf_amap_qps: float = 0  # 高德地图每秒请求数上限（0表示不限）
+    perf_adaptive_concurrency: bool = True  # 按AIMD自动调整LLM/高德调用的并发上限
+    perf_llm_max_concurrency: int = 32  # LLM并发调用上限的最大值（初始值为其1/4）
+    perf_amap_max_concurrency: int = 16  # 高德调用并发上限的最大值（初始值为其1/4）
+    perf_concurrency_latency_factor: float = 3.0  # 高德调用耗时超过基线的倍数时视为拥塞
+    perf_llm_hedge_enabled: bool = False  # LLM对冲请求: 耗时超过近期百分位时发出重复请求，先返回者生效
+    perf_llm_hedge_percentile: float = 95.0  # 触发对冲请求的耗时百分位
+    perf_llm_hedge_budget: float = 0.1  # 对冲请求占LLM总调用数的比例上限
+    perf_llm_hedge_min_samples: int = 20  # 开始对冲前需要的最少耗时样本数
+    perf_json_repair_followup: bool = True  # 规划结果无法完整修复时追加一次续写/修复LLM调用
+    perf_planner_token_budget: int = 2000  # 规划提示词中景点/天气/酒店信息的token预算（0表示不压缩）
 
     class Config:
         env_file = ".env"
@@ -148,6 +148,7 @@ class TripPlan(BaseModel):
     weather_info: List[WeatherInfo] = Field(default=[], description="天气信息")
     overall_suggestions: str = Field(..., description="总体建议")
     budget: Optional[Budget] = Field(default=None, description="预算信息")
+    timed_out_stages: List[str] = Field(default_factory=list, description="超时后被跳过或降级的阶段")
 
 
 class TripPlanResponse(BaseModel):
@@ -157,6 +158,26 @@ class TripPlanResponse(BaseModel):
     data: Optional[TripPlan] = Field(default=None, description="旅行计划数据")
 
 
+class TripJobInfo(BaseModel):
+    """旅行规划任务状态"""
+    job_id: str = Field(..., description="任务ID")
+    status: str = Field(..., description="任务状态: queued/running/succeeded/failed/cancelled")
+    queue_position: Optional[int] = Field(default=None, description="排在前面的任务数（仅排队中）")
+    created_at: str = Field(..., description="创建时间")
+    started_at: Optional[str] = Field(default=None, description="开始执行时间")
+    finished_at: Optional[str] = Field(default=None, description="结束时间")
+    error: Optional[str] = Field(default=None, description="失败原因")
+    plan_id: Optional[str] = Field(default=None, description="已保存到数据库的旅行规划ID（已登录用户）")
+    result: Optional[TripPlan] = Field(default=None, description="旅行计划（任务成功后返回）")
+
+
+class TripJobResponse(BaseModel):
+    """旅行规划任务响应"""
+    success: bool = Field(..., description="是否成功")
+    message: str = Field(default="", description="消息")
+    data: Optional[TripJobInfo] = Field(default=None, description="任务状态")
+
+
 class POIInfo(BaseModel):
     """POI信息"""
     id: str = Field(..., description="POI ID")
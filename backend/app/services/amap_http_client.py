@@ -0,0 +1,358 @@
+"""高德地图Web服务HTTP客户端 - 直接调用高德REST接口,工具名称和参数与高德MCP服务器保持一致"""
+
+import json
+import time
+import threading
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple
+
+import httpx
+
+from ..utils.latency import ToolLatencyStats
+
+# 高德Web服务默认地址
+DEFAULT_AMAP_BASE_URL = "https://restapi.amap.com"
+
+# 一次HTTP请求: (接口路径, 查询参数)
+_Request = Tuple[str, Dict[str, Any]]
+# 工具处理器: 逐个产出HTTP请求并接收接口返回的JSON,最终返回工具结果
+_Handler = Generator[_Request, Dict[str, Any], Dict[str, Any]]
+
+
+class AmapApiError(RuntimeError):
+    """高德Web服务返回错误(status不为1)"""
+
+    def __init__(self, info: str, infocode: str = ""):
+        super().__init__(f"{info} ({infocode})" if infocode else info)
+        self.info = info
+        self.infocode = infocode
+
+
+# ============ 工具定义(与 amap-mcp-server 同名同参,Agent展开工具时使用) ============
+
+def _schema(required: List[str], **properties: str) -> Dict[str, Any]:
+    return {
+        "type": "object",
+        "properties": {name: {"type": "string", "description": desc} for name, desc in properties.items()},
+        "required": required,
+    }
+
+
+AMAP_TOOLS: List[Dict[str, Any]] = [
+    {
+        "name": "maps_text_search",
+        "description": "关键词搜索，根据用户传入关键词，搜索出相关的POI",
+        "input_schema": _schema(["keywords"], keywords="搜索关键词", city="查询城市", citylimit="是否强制限制在设置的城市内搜索，默认值为false"),
+    },
+    {
+        "name": "maps_around_search",
+        "description": "周边搜，根据用户传入关键词以及坐标location，搜索出radius半径范围的POI",
+        "input_schema": _schema(["location"], keywords="搜索关键词", location="中心点经度纬度", radius="搜索半径"),
+    },
+    {
+        "name": "maps_search_detail",
+        "description": "查询关键词搜或者周边搜获取到的POI ID的详细信息",
+        "input_schema": _schema(["id"], id="关键词搜或者周边搜获取到的POI ID"),
+    },
+    {
+        "name": "maps_weather",
+        "description": "根据城市名称或者标准adcode查询指定城市的天气",
+        "input_schema": _schema(["city"], city="城市名称或者adcode"),
+    },
+    {
+        "name": "maps_geo",
+        "description": "将详细的结构化地址转换为经纬度坐标。支持对地标性名胜景区、建筑物名称解析为经纬度坐标",
+        "input_schema": _schema(["address"], address="待解析的结构化地址信息", city="指定查询的城市"),
+    },
+    {
+        "name": "maps_regeocode",
+        "description": "将一个高德经纬度坐标转换为行政区划地址信息",
+        "input_schema": _schema(["location"], location="经纬度"),
+    },
+    {
+        "name": "maps_direction_walking",
+        "description": "步行路径规划，根据起终点经纬度坐标规划100km以内的步行通勤方案",
+        "input_schema": _schema(["origin", "destination"], origin="出发点经纬度，坐标格式为：经度，纬度", destination="目的地经纬度，坐标格式为：经度，纬度"),
+    },
+    {
+        "name": "maps_direction_driving",
+        "description": "驾车路径规划，根据起终点经纬度坐标规划以小客车、轿车通勤出行的方案",
+        "input_schema": _schema(["origin", "destination"], origin="出发点经纬度，坐标格式为：经度，纬度", destination="目的地经纬度，坐标格式为：经度，纬度"),
+    },
+    {
+        "name": "maps_direction_transit_integrated",
+        "description": "公交路径规划，根据起终点经纬度坐标规划综合各类公共交通方式（火车、公交、地铁）的通勤方案",
+        "input_schema": _schema(["origin", "destination", "city", "cityd"], origin="出发点经纬度", destination="目的地经纬度", city="起点城市", cityd="终点城市"),
+    },
+    {
+        "name": "maps_direction_walking_by_address",
+        "description": "根据起终点地址规划步行路线",
+        "input_schema": _schema(["origin_address", "destination_address"], origin_address="起点地址", destination_address="终点地址", origin_city="起点所在城市", destination_city="终点所在城市"),
+    },
+    {
+        "name": "maps_direction_driving_by_address",
+        "description": "根据起终点地址规划驾车路线",
+        "input_schema": _schema(["origin_address", "destination_address"], origin_address="起点地址", destination_address="终点地址", origin_city="起点所在城市", destination_city="终点所在城市"),
+    },
+    {
+        "name": "maps_direction_transit_integrated_by_address",
+        "description": "根据起终点地址规划公共交通路线",
+        "input_schema": _schema(["origin_address", "destination_address", "origin_city", "destination_city"], origin_address="起点地址", destination_address="终点地址", origin_city="起点所在城市", destination_city="终点所在城市"),
+    },
+]
+
+
+# ============ 工具处理器 ============
+# 处理器是生成器: yield (路径, 参数) 发起请求并拿到返回的JSON,多步工具(按地址规划路线)在一个处理器中完成
+
+# POI结果中保留的字段(其余字段对规划无用,只会增加Agent的提示词长度)
+_POI_FIELDS = ("id", "name", "address", "type", "typecode", "location", "tel", "biz_ext", "photos")
+
+
+def _pick(item: Dict[str, Any], fields: Tuple[str, ...]) -> Dict[str, Any]:
+    return {field: item[field] for field in fields if field in item}
+
+
+def _text_search(args: Dict[str, Any]) -> _Handler:
+    params = {"keywords": args.get("keywords", ""), "city": args.get("city", ""), "extensions": "all"}
+    if args.get("citylimit") is not None:
+        params["citylimit"] = str(args["citylimit"]).lower()
+    data = yield "/v3/place/text", params
+    return {"pois": [_pick(poi, _POI_FIELDS) for poi in data.get("pois") or []]}
+
+
+def _around_search(args: Dict[str, Any]) -> _Handler:
+    params = {"location": args.get("location", ""), "keywords": args.get("keywords", ""), "radius": args.get("radius") or "1000"}
+    data = yield "/v3/place/around", params
+    return {"pois": [_pick(poi, _POI_FIELDS) for poi in data.get("pois") or []]}
+
+
+def _search_detail(args: Dict[str, Any]) -> _Handler:
+    data = yield "/v3/place/detail", {"id": args.get("id", "")}
+    pois = data.get("pois") or []
+    if not pois:
+        raise AmapApiError(f"POI不存在: {args.get('id')}")
+    return pois[0]
+
+
+def _weather(args: Dict[str, Any]) -> _Handler:
+    data = yield "/v3/weather/weatherInfo", {"city": args.get("city", ""), "extensions": "all"}
+    forecasts = data.get("forecasts") or []
+    if not forecasts:
+        raise AmapApiError(f"没有天气数据: {args.get('city')}")
+    return {"city": forecasts[0].get("city", ""), "forecasts": forecasts[0].get("casts") or []}
+
+
+def _geo(args: Dict[str, Any]) -> _Handler:
+    params = {"address": args.get("address", "")}
+    if args.get("city"):
+        params["city"] = args["city"]
+    data = yield "/v3/geocode/geo", params
+    fields = ("country", "province", "city", "citycode", "district", "street", "number", "adcode", "location", "level")
+    return {"return": [_pick(geocode, fields) for geocode in data.get("geocodes") or []]}
+
+
+def _regeocode(args: Dict[str, Any]) -> _Handler:
+    data = yield "/v3/geocode/regeo", {"location": args.get("location", "")}
+    regeocode = data.get("regeocode") or {}
+    component = regeocode.get("addressComponent") or {}
+    return {
+        "province": component.get("province", ""),
+        "city": component.get("city", ""),
+        "district": component.get("district", ""),
+        "formatted_address": regeocode.get("formatted_address", ""),
+    }
+
+
+def _direction(mode: str) -> Callable[[Dict[str, Any]], _Handler]:
+    path = {
+        "walking": "/v3/direction/walking",
+        "driving": "/v3/direction/driving",
+        "transit": "/v3/direction/transit/integrated",
+    }[mode]
+
+    def handler(args: Dict[str, Any]) -> _Handler:
+        params = {"origin": args.get("origin", ""), "destination": args.get("destination", "")}
+        if mode == "transit":
+            params.update(city=args.get("city", ""), cityd=args.get("cityd", ""))
+        data = yield path, params
+        return data.get("route") or {}
+
+    return handler
+
+
+def _geocode_location(address: str, city: Optional[str]) -> _Handler:
+    """地址转 "经度,纬度",解析不到时抛出 AmapApiError"""
+    result = yield from _geo({"address": address, "city": city})
+    geocodes = result["return"]
+    if not geocodes or not geocodes[0].get("location"):
+        raise AmapApiError(f"地址无法解析: {address}")
+    return geocodes[0]["location"]
+
+
+def _direction_by_address(mode: str) -> Callable[[Dict[str, Any]], _Handler]:
+    direction = _direction(mode)
+
+    def handler(args: Dict[str, Any]) -> _Handler:
+        origin_city = args.get("origin_city")
+        destination_city = args.get("destination_city") or origin_city
+        origin = yield from _geocode_location(args.get("origin_address", ""), origin_city)
+        destination = yield from _geocode_location(args.get("destination_address", ""), destination_city)
+        route = yield from direction({
+            "origin": origin,
+            "destination": destination,
+            "city": origin_city or "",
+            "cityd": destination_city or "",
+        })
+        return {
+            "origin": {"address": args.get("origin_address", ""), "location": origin},
+            "destination": {"address": args.get("destination_address", ""), "location": destination},
+            "route": route,
+        }
+
+    return handler
+
+
+_HANDLERS: Dict[str, Callable[[Dict[str, Any]], _Handler]] = {
+    "maps_text_search": _text_search,
+    "maps_around_search": _around_search,
+    "maps_search_detail": _search_detail,
+    "maps_weather": _weather,
+    "maps_geo": _geo,
+    "maps_regeocode": _regeocode,
+    "maps_direction_walking": _direction("walking"),
+    "maps_direction_driving": _direction("driving"),
+    "maps_direction_transit_integrated": _direction("transit"),
+    "maps_direction_walking_by_address": _direction_by_address("walking"),
+    "maps_direction_driving_by_address": _direction_by_address("driving"),
+    "maps_direction_transit_integrated_by_address": _direction_by_address("transit"),
+}
+
+
+class AmapHttpClient:
+    """
+    高德Web服务HTTP客户端
+
+    - 使用 httpx.Client 复用长连接(keep-alive),由地图路由的阻塞任务线程池和规划线程同步调用
+    - 工具名称、参数和返回结构与高德MCP服务器一致,现有的结果解析逻辑无需修改
+    - 记录每个工具的调用次数、错误数和耗时分布
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = DEFAULT_AMAP_BASE_URL,
+        timeout: float = 10.0,
+        max_connections: int = 32
+    ):
+        """
+        初始化客户端(连接在首次调用时建立)
+
+        Args:
+            api_key: 高德Web服务Key
+            base_url: 高德Web服务地址
+            timeout: 单次HTTP请求超时时间（秒）
+            max_connections: 连接池最大连接数
+        """
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+
+        self._client: Optional[httpx.Client] = None
+        self._lock = threading.Lock()
+
+        self._tool_stats: Dict[str, ToolLatencyStats] = {}
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+
+    @staticmethod
+    def list_tools() -> List[Dict[str, Any]]:
+        """获取支持的工具列表"""
+        return list(AMAP_TOOLS)
+
+    def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        调用工具(同步)
+
+        Args:
+            tool_name: 工具名称
+            arguments: 工具参数
+
+        Returns:
+            工具结果
+
+        Raises:
+            AmapApiError: 高德接口返回错误
+            httpx.HTTPError: 网络错误或HTTP状态码错误
+        """
+        handler = self._handler(tool_name, arguments)
+        client = self._get_client()
+        start = time.perf_counter()
+        try:
+            request = next(handler)
+            while True:
+                request = handler.send(self._check(client.get(request[0], params=self._params(request[1]))))
+        except StopIteration as stop:
+            self._record(tool_name, time.perf_counter() - start)
+            return stop.value
+        except Exception:
+            self._record(tool_name, time.perf_counter() - start, error=True)
+            raise
+
+    def close(self):
+        """关闭连接池"""
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        """获取调用统计信息"""
+        with self._stats_lock:
+            tools = {name: stats.stats() for name, stats in self._tool_stats.items()}
+            requests = self.requests
+        return {
+            "base_url": self.base_url,
+            "max_connections": self._limits.max_connections,
+            "requests": requests,
+            "tools": tools,
+        }
+
+    def _handler(self, tool_name: str, arguments: Dict[str, Any]) -> _Handler:
+        factory = _HANDLERS.get(tool_name)
+        if factory is None:
+            raise ValueError(f"不支持的高德工具: {tool_name}")
+        return factory(arguments or {})
+
+    def _params(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        with self._stats_lock:
+            self.requests += 1
+        return {"key": self.api_key, "output": "JSON", **params}
+
+    @staticmethod
+    def _check(response: httpx.Response) -> Dict[str, Any]:
+        """检查HTTP状态和高德的status字段"""
+        response.raise_for_status()
+        data = response.json()
+        if str(data.get("status")) != "1":
+            raise AmapApiError(data.get("info") or "UNKNOWN_ERROR", str(data.get("infocode") or ""))
+        return data
+
+    def _get_client(self) -> httpx.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(base_url=self.base_url, timeout=self.timeout, limits=self._limits)
+        return self._client
+
+    def _record(self, tool_name: str, seconds: float, error: bool = False):
+        with self._stats_lock:
+            stats = self._tool_stats.get(tool_name)
+            if stats is None:
+                stats = self._tool_stats[tool_name] = ToolLatencyStats()
+            stats.record(seconds, error)
+
+
+def format_tool_result(tool_name: str, result: Any) -> str:
+    """格式化为与 MCPTool 相同的结果字符串"""
+    return f"工具 '{tool_name}' 执行结果:\n{json.dumps(result, ensure_ascii=False)}"
@@ -1,17 +1,250 @@
-"""高德地图MCP服务封装"""
+"""高德地图服务封装(MCP服务器或直连Web服务API)"""
 
+import threading
 from typing import List, Dict, Any, Optional
 from hello_agents.tools import MCPTool
 from ..config import get_settings
-from ..models.schemas import Location, POIInfo, WeatherInfo
+from ..models.schemas import Location, POIInfo, RouteInfo, WeatherInfo
+from ..utils.rate_limiter import get_rate_limiter
+from ..utils.concurrency_limiter import get_concurrency_limiter
+from ..utils.cache import TTLCache
+from ..utils.amap_parser import (
+    AmapToolError, get_tool_error, parse_geocode, parse_location, parse_pois, parse_route,
+    parse_weather_forecasts, weather_fields
+)
+from .mcp_manager import MCPManager
+from .amap_http_client import AmapHttpClient, format_tool_result
+from .geocode_store import get_geocode_store
+
+# 高德地图MCP服务器启动命令
+AMAP_MCP_SERVER_COMMAND = ["uvx", "amap-mcp-server"]
 
 # 全局MCP工具实例
 _amap_mcp_tool = None
+_amap_mcp_tool_lock = threading.Lock()
+
+# 全局MCP连接池实例
+_amap_mcp_manager: Optional[MCPManager] = None
+_amap_mcp_manager_lock = threading.Lock()
+
+# 全局高德HTTP客户端实例
+_amap_http_client: Optional[AmapHttpClient] = None
+_amap_http_client_lock = threading.Lock()
+
+
+# 高德返回的限流/配额错误
+_AMAP_OVERLOAD_MARKERS = ("CUQPS_HAS_EXCEEDED_THE_LIMIT", "EXCEEDED_THE_LIMIT", "OVER_LIMIT", "429")
+
+
+class ThrottledMCPTool(MCPTool):
+    """
+    限流的高德地图MCP工具
+
+    每次工具调用(包括Agent通过展开工具发起的调用)前向高德限流器申请配额,
+    使请求速率保持在 perf_amap_qps 以内;开启自适应并发控制时还需占用一个并发名额,
+    返回限流错误或耗时突增时并发上限自动下调。
+    """
+
+    def run(self, parameters: Dict[str, Any]) -> str:
+        if parameters.get("action") != "call_tool":
+            return self._execute(parameters)
+
+        get_rate_limiter("amap").acquire()
+        if not get_settings().perf_adaptive_concurrency:
+            return self._execute(parameters)
+
+        with get_concurrency_limiter("amap").slot() as slot:
+            result = self._execute(parameters)
+            error = get_tool_error(result)
+            slot.overloaded = bool(error) and any(marker in error for marker in _AMAP_OVERLOAD_MARKERS)
+            return result
+
+    def _execute(self, parameters: Dict[str, Any]) -> str:
+        """实际执行MCP操作(每次调用启动一个MCP服务器进程)"""
+        return MCPTool.run(self, parameters)
+
+
+class PooledMCPTool(ThrottledMCPTool):
+    """
+    使用MCP连接池的高德地图MCP工具
+
+    工具列表和工具调用都通过进程内共享的 MCPManager 完成,
+    不再为每次调用启动新的MCP服务器进程。返回格式与 MCPTool 保持一致。
+    """
+
+    def __init__(self, manager: MCPManager, name: str = "amap", description: Optional[str] = None, auto_expand: bool = True):
+        """
+        初始化工具
+
+        Args:
+            manager: MCP连接池
+            name: 工具名称
+            description: 工具描述
+            auto_expand: 是否自动展开为独立工具
+        """
+        self.manager = manager
+        super().__init__(
+            name=name,
+            description=description,
+            server_command=manager.server_command,
+            auto_expand=auto_expand
+        )
+
+    def _discover_tools(self):
+        # 工具列表由连接池在启动时获取
+        self._available_tools = self.manager.list_tools()
+
+    def _execute(self, parameters: Dict[str, Any]) -> str:
+        action = parameters.get("action", "").lower()
+        if not action and "tool_name" in parameters:
+            action = "call_tool"
+
+        try:
+            if action == "call_tool":
+                tool_name = parameters.get("tool_name")
+                if not tool_name:
+                    return "错误：必须指定 tool_name 参数"
+                result = self.manager.call_tool(tool_name, parameters.get("arguments", {}))
+                return f"工具 '{tool_name}' 执行结果:\n{result}"
+
+            if action == "list_tools":
+                tools = self.manager.list_tools()
+                if not tools:
+                    return "没有找到可用的工具"
+                return f"找到 {len(tools)} 个工具:\n" + "".join(
+                    f"- {tool['name']}: {tool['description']}\n" for tool in tools
+                )
+        except Exception as e:
+            return f"MCP 操作失败: {str(e)}"
+
+        # 资源、提示词等其他操作不经过连接池
+        return super()._execute(parameters)
+
+
+class HttpAmapTool(ThrottledMCPTool):
+    """
+    直连高德Web服务API的地图工具
+
+    与 MCPTool 接口一致(工具名称、参数、自动展开和返回格式相同),
+    但通过进程内长连接的HTTP客户端调用高德REST接口,不经过MCP服务器进程。
+    """
+
+    def __init__(self, client: AmapHttpClient, name: str = "amap", description: Optional[str] = None, auto_expand: bool = True):
+        """
+        初始化工具
+
+        Args:
+            client: 高德HTTP客户端
+            name: 工具名称
+            description: 工具描述
+            auto_expand: 是否自动展开为独立工具
+        """
+        self.client = client
+        # 传入 server 以免 MCPTool 创建内置演示服务器
+        super().__init__(name=name, description=description, server=client, auto_expand=auto_expand)
+
+    def _discover_tools(self):
+        self._available_tools = self.client.list_tools()
+
+    def _execute(self, parameters: Dict[str, Any]) -> str:
+        action = parameters.get("action", "").lower()
+        if not action and "tool_name" in parameters:
+            action = "call_tool"
+
+        if action == "call_tool":
+            tool_name = parameters.get("tool_name")
+            if not tool_name:
+                return "错误：必须指定 tool_name 参数"
+            try:
+                result = self.client.call_tool(tool_name, parameters.get("arguments", {}))
+            except Exception as e:
+                return f"错误：高德API调用失败: {str(e)}"
+            return format_tool_result(tool_name, result)
+
+        if action == "list_tools":
+            tools = self.client.list_tools()
+            return f"找到 {len(tools)} 个工具:\n" + "".join(
+                f"- {tool['name']}: {tool['description']}\n" for tool in tools
+            )
+
+        return f"错误：HTTP后端不支持操作 {action}"
+
+
+def get_amap_http_client() -> AmapHttpClient:
+    """
+    获取高德HTTP客户端(单例模式)
+
+    地址由 amap_api_base_url 控制,连接池大小和超时由 perf_amap_http_max_connections、perf_amap_http_timeout 控制。
+    """
+    global _amap_http_client
+
+    if _amap_http_client is None:
+        with _amap_http_client_lock:
+            if _amap_http_client is None:
+                settings = get_settings()
+                _amap_http_client = AmapHttpClient(
+                    settings.amap_api_key,
+                    base_url=settings.amap_api_base_url,
+                    timeout=settings.perf_amap_http_timeout,
+                    max_connections=settings.perf_amap_http_max_connections
+                )
+    return _amap_http_client
+
+
+def get_amap_mcp_manager() -> MCPManager:
+    """
+    获取高德地图MCP连接池(单例模式)
+
+    连接数由 perf_mcp_pool_size 控制,首次使用时启动。
+    """
+    global _amap_mcp_manager
+
+    if _amap_mcp_manager is None:
+        with _amap_mcp_manager_lock:
+            if _amap_mcp_manager is None:
+                settings = get_settings()
+                _amap_mcp_manager = MCPManager(
+                    AMAP_MCP_SERVER_COMMAND,
+                    env={"AMAP_MAPS_API_KEY": settings.amap_api_key},
+                    pool_size=settings.perf_mcp_pool_size,
+                    call_timeout=settings.perf_mcp_call_timeout,
+                    health_interval=settings.perf_mcp_health_interval,
+                    name="amap-mcp"
+                )
+    return _amap_mcp_manager
+
+
+def create_amap_mcp_tool(description: str = "高德地图服务") -> MCPTool:
+    """
+    创建高德地图工具(所有调用经过高德限流器)
+
+    amap_backend 为 http 时直连高德Web服务API;为 mcp 时,perf_mcp_pool_size 大于0
+    使用共享的MCP连接池,否则每次调用启动一个MCP服务器进程。
+
+    Args:
+        description: 工具描述
+
+    Returns:
+        MCPTool实例
+    """
+    settings = get_settings()
+    if settings.amap_backend == "http":
+        return HttpAmapTool(get_amap_http_client(), name="amap", description=description)
+    if settings.perf_mcp_pool_size > 0:
+        return PooledMCPTool(get_amap_mcp_manager(), name="amap", description=description)
+
+    return ThrottledMCPTool(
+        name="amap",
+        description=description,
+        server_command=AMAP_MCP_SERVER_COMMAND,
+        env={"AMAP_MAPS_API_KEY": settings.amap_api_key},
+        auto_expand=True  # 自动展开为独立工具
+    )
 
 
 def get_amap_mcp_tool() -> MCPTool:
     """
-    获取高德地图MCP工具实例(单例模式)
+    获取高德地图工具实例(单例模式,Agent和AmapService共享,后端由 amap_backend 决定)
     
     Returns:
         MCPTool实例
@@ -19,41 +252,104 @@ def get_amap_mcp_tool() -> MCPTool:
     global _amap_mcp_tool
     
     if _amap_mcp_tool is None:
-        settings = get_settings()
-        
-        if not settings.amap_api_key:
-            raise ValueError("高德地图API Key未配置,请在.env文件中设置AMAP_API_KEY")
-        
-        # 创建MCP工具
-        _amap_mcp_tool = MCPTool(
-            name="amap",
-            description="高德地图服务,支持POI搜索、路线规划、天气查询等功能",
-            server_command=["uvx", "amap-mcp-server"],
-            env={"AMAP_MAPS_API_KEY": settings.amap_api_key},
-            auto_expand=True  # 自动展开为独立工具
-        )
-        
-        print(f"✅ 高德地图MCP工具初始化成功")
-        print(f"   工具数量: {len(_amap_mcp_tool._available_tools)}")
-        
-        # 打印可用工具列表
-        if _amap_mcp_tool._available_tools:
-            print("   可用工具:")
-            for tool in _amap_mcp_tool._available_tools[:5]:  # 只打印前5个
-                print(f"     - {tool.get('name', 'unknown')}")
-            if len(_amap_mcp_tool._available_tools) > 5:
-                print(f"     ... 还有 {len(_amap_mcp_tool._available_tools) - 5} 个工具")
+        with _amap_mcp_tool_lock:
+            if _amap_mcp_tool is None:
+                settings = get_settings()
+
+                if not settings.amap_api_key:
+                    raise ValueError("高德地图API Key未配置,请在.env文件中设置AMAP_API_KEY")
+
+                # 创建MCP工具
+                tool = create_amap_mcp_tool("高德地图服务,支持POI搜索、路线规划、天气查询等功能")
+
+                print(f"✅ 高德地图工具初始化成功 (后端: {settings.amap_backend})")
+                print(f"   工具数量: {len(tool._available_tools)}")
+
+                # 打印可用工具列表
+                if tool._available_tools:
+                    print("   可用工具:")
+                    for item in tool._available_tools[:5]:  # 只打印前5个
+                        print(f"     - {item.get('name', 'unknown')}")
+                    if len(tool._available_tools) > 5:
+                        print(f"     ... 还有 {len(tool._available_tools) - 5} 个工具")
+
+                _amap_mcp_tool = tool
     
     return _amap_mcp_tool
 
 
+def get_mcp_stats() -> Dict[str, Any]:
+    """获取MCP连接池统计信息(连接池未创建时返回空字典)"""
+    if _amap_mcp_manager is None:
+        return {}
+    return _amap_mcp_manager.stats()
+
+
+def get_amap_http_stats() -> Dict[str, Any]:
+    """获取高德HTTP客户端统计信息(客户端未创建时返回空字典)"""
+    if _amap_http_client is None:
+        return {}
+    return _amap_http_client.stats()
+
+
+def shutdown_amap_http_client():
+    """关闭高德HTTP客户端的连接池(应用关闭时调用)"""
+    global _amap_http_client
+
+    with _amap_http_client_lock:
+        client, _amap_http_client = _amap_http_client, None
+    if client is not None:
+        client.close()
+
+
+def shutdown_amap_mcp_manager():
+    """关闭MCP连接池(应用关闭时调用)"""
+    global _amap_mcp_manager
+
+    with _amap_mcp_manager_lock:
+        if _amap_mcp_manager is not None:
+            _amap_mcp_manager.close()
+            _amap_mcp_manager = None
+
+
 class AmapService:
-    """高德地图服务封装类"""
-    
+    """
+    高德地图服务封装类
+
+    工具结果解析为 POIInfo / WeatherInfo / RouteInfo / Location,
+    每个查询方法前有独立的TTL缓存(过期时间分别由 perf_map_*_cache_ttl 控制),
+    调用失败或没有结果时不写入缓存。
+    """
+
+    # 路线类型 -> (按地址规划的工具, 中文名称)
+    _ROUTE_TOOLS = {
+        "walking": ("maps_direction_walking_by_address", "步行"),
+        "driving": ("maps_direction_driving_by_address", "驾车"),
+        "transit": ("maps_direction_transit_integrated_by_address", "公共交通"),
+    }
+
+    # 路线描述中保留的步骤数
+    _ROUTE_DESCRIPTION_STEPS = 8
+
     def __init__(self):
         """初始化服务"""
         self.mcp_tool = get_amap_mcp_tool()
-    
+
+        settings = get_settings()
+        self._caches: Dict[str, Optional[TTLCache]] = {
+            name: (
+                TTLCache(name=f"map_{name}", ttl=ttl, max_size=settings.perf_cache_max_size)
+                if settings.perf_enable_cache and ttl > 0
+                else None
+            )
+            for name, ttl in (
+                ("poi", settings.perf_map_poi_cache_ttl),
+                ("weather", settings.perf_map_weather_cache_ttl),
+                ("route", settings.perf_map_route_cache_ttl),
+                ("geocode", settings.perf_map_geocode_cache_ttl),
+            )
+        }
+
     def search_poi(self, keywords: str, city: str, citylimit: bool = True) -> List[POIInfo]:
         """
         搜索POI
@@ -64,27 +360,37 @@ class AmapService:
             citylimit: 是否限制在城市范围内
             
         Returns:
-            POI信息列表
+            POI信息列表(没有坐标的POI会被跳过)
         """
+        key = self._cache_key(keywords, city, str(citylimit))
+        cached = self._cache_get("poi", key)
+        if cached is not None:
+            return list(cached)
+
         try:
-            # 调用MCP工具
-            result = self.mcp_tool.run({
-                "action": "call_tool",
-                "tool_name": "maps_text_search",
-                "arguments": {
-                    "keywords": keywords,
-                    "city": city,
-                    "citylimit": str(citylimit).lower()
-                }
+            result = self._call_tool("maps_text_search", {
+                "keywords": keywords,
+                "city": city,
+                "citylimit": str(citylimit).lower()
             })
-            
-            # 解析结果
-            # 注意: MCP工具返回的是字符串,需要解析
-            # 这里简化处理,实际应该解析JSON
-            print(f"POI搜索结果: {result[:200]}...")  # 打印前200字符
-            
-            # TODO: 解析实际的POI数据
-            return []
+
+            pois = []
+            for poi in parse_pois(result):
+                location = parse_location(poi["location"])
+                if location is None:
+                    continue
+                pois.append(POIInfo(
+                    id=poi["id"],
+                    name=poi["name"],
+                    type=poi["type"],
+                    address=poi["address"],
+                    location=Location(longitude=location[0], latitude=location[1]),
+                    tel=poi["tel"]
+                ))
+
+            self._cache_set("poi", key, pois)
+            self._remember_pois(pois, city)
+            return list(pois)
             
         except Exception as e:
             print(f"❌ POI搜索失败: {str(e)}")
@@ -100,20 +406,23 @@ class AmapService:
         Returns:
             天气信息列表
         """
+        key = self._cache_key(city)
+        cached = self._cache_get("weather", key)
+        if cached is not None:
+            return list(cached)
+
         try:
-            # 调用MCP工具
-            result = self.mcp_tool.run({
-                "action": "call_tool",
-                "tool_name": "maps_weather",
-                "arguments": {
-                    "city": city
-                }
-            })
-            
-            print(f"天气查询结果: {result[:200]}...")
-            
-            # TODO: 解析实际的天气数据
-            return []
+            result = self._call_tool("maps_weather", {"city": city})
+
+            weather = []
+            for cast in parse_weather_forecasts(result):
+                try:
+                    weather.append(WeatherInfo(**weather_fields(cast)))
+                except ValueError:
+                    continue
+
+            self._cache_set("weather", key, weather)
+            return list(weather)
             
         except Exception as e:
             print(f"❌ 天气查询失败: {str(e)}")
@@ -126,7 +435,7 @@ class AmapService:
         origin_city: Optional[str] = None,
         destination_city: Optional[str] = None,
         route_type: str = "walking"
-    ) -> Dict[str, Any]:
+    ) -> Optional[RouteInfo]:
         """
         规划路线
         
@@ -138,52 +447,51 @@ class AmapService:
             route_type: 路线类型 (walking/driving/transit)
             
         Returns:
-            路线信息
+            路线信息,没有可用路线时返回None
         """
+        if route_type not in self._ROUTE_TOOLS:
+            route_type = "walking"
+        tool_name, type_name = self._ROUTE_TOOLS[route_type]
+
+        key = self._cache_key(origin_address, destination_address, origin_city, destination_city, route_type)
+        cached = self._cache_get("route", key)
+        if cached is not None:
+            return cached
+
         try:
-            # 根据路线类型选择工具
-            tool_map = {
-                "walking": "maps_direction_walking_by_address",
-                "driving": "maps_direction_driving_by_address",
-                "transit": "maps_direction_transit_integrated_by_address"
-            }
-            
-            tool_name = tool_map.get(route_type, "maps_direction_walking_by_address")
-            
-            # 构建参数
             arguments = {
                 "origin_address": origin_address,
                 "destination_address": destination_address
             }
-            
-            # 公共交通需要城市参数
-            if route_type == "transit":
-                if origin_city:
-                    arguments["origin_city"] = origin_city
-                if destination_city:
-                    arguments["destination_city"] = destination_city
-            else:
-                # 其他路线类型也可以提供城市参数提高准确性
-                if origin_city:
-                    arguments["origin_city"] = origin_city
-                if destination_city:
-                    arguments["destination_city"] = destination_city
-            
-            # 调用MCP工具
-            result = self.mcp_tool.run({
-                "action": "call_tool",
-                "tool_name": tool_name,
-                "arguments": arguments
-            })
-            
-            print(f"路线规划结果: {result[:200]}...")
-            
-            # TODO: 解析实际的路线数据
-            return {}
+            # 公共交通必须提供城市参数,其他路线类型提供城市参数可以提高地址解析的准确性
+            if origin_city:
+                arguments["origin_city"] = origin_city
+            if destination_city:
+                arguments["destination_city"] = destination_city
+
+            route = parse_route(self._call_tool(tool_name, arguments))
+            if route is None:
+                return None
+
+            description = f"{type_name}约{route['distance'] / 1000:.1f}公里，预计{max(1, round(route['duration'] / 60))}分钟"
+            steps = route["steps"][:self._ROUTE_DESCRIPTION_STEPS]
+            if steps:
+                description += "：" + "；".join(steps)
+                if len(route["steps"]) > len(steps):
+                    description += "……"
+
+            route_info = RouteInfo(
+                distance=route["distance"],
+                duration=route["duration"],
+                route_type=route_type,
+                description=description
+            )
+            self._cache_set("route", key, route_info)
+            return route_info
             
         except Exception as e:
             print(f"❌ 路线规划失败: {str(e)}")
-            return {}
+            return None
     
     def geocode(self, address: str, city: Optional[str] = None) -> Optional[Location]:
         """
@@ -196,26 +504,80 @@ class AmapService:
         Returns:
             经纬度坐标
         """
+        key = self._cache_key(address, city)
+        cached = self._cache_get("geocode", key)
+        if cached is not None:
+            return cached
+
         try:
-            arguments = {"address": address}
-            if city:
-                arguments["city"] = city
+            # 持久化地理编码库中已收录的地址不再请求上游
+            store = get_geocode_store()
+            location = store.get(address, city) if store is not None else None
 
-            result = self.mcp_tool.run({
-                "action": "call_tool",
-                "tool_name": "maps_geo",
-                "arguments": arguments
-            })
+            if location is None:
+                arguments = {"address": address}
+                if city:
+                    arguments["city"] = city
 
-            print(f"地理编码结果: {result[:200]}...")
+                location = parse_geocode(self._call_tool("maps_geo", arguments))
+                if location is None:
+                    return None
+                if store is not None:
+                    store.put(address, city, location[0], location[1], source="geocode")
 
-            # TODO: 解析实际的坐标数据
-            return None
+            result = Location(longitude=location[0], latitude=location[1])
+            self._cache_set("geocode", key, result)
+            return result
 
         except Exception as e:
             print(f"❌ 地理编码失败: {str(e)}")
             return None
 
+    @staticmethod
+    def _remember_pois(pois: List[POIInfo], city: str):
+        """把POI名称、地址和坐标写入地理编码库,供之后的地址解析和坐标校验使用"""
+        store = get_geocode_store()
+        if store is not None and pois:
+            store.put_pois(
+                [(poi.name, poi.address, poi.location.longitude, poi.location.latitude) for poi in pois], city
+            )
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取各查询方法的缓存统计信息"""
+        return {name: cache.stats() for name, cache in self._caches.items() if cache is not None}
+
+    def _call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> str:
+        """
+        调用地图工具
+
+        Raises:
+            AmapToolError: 工具返回错误时
+        """
+        result = self.mcp_tool.run({
+            "action": "call_tool",
+            "tool_name": tool_name,
+            "arguments": arguments
+        })
+        error = get_tool_error(result)
+        if error:
+            raise AmapToolError(f"{tool_name} 调用失败: {error}")
+        return result
+
+    @staticmethod
+    def _cache_key(*parts: Optional[str]) -> str:
+        """规范化缓存键(去除首尾及多余空白、忽略大小写)"""
+        return "|".join(" ".join((part or "").split()).lower() for part in parts)
+
+    def _cache_get(self, name: str, key: str) -> Any:
+        cache = self._caches[name]
+        return cache.get(key) if cache is not None else None
+
+    def _cache_set(self, name: str, key: str, value: Any):
+        # 空结果可能是上游的临时问题,不缓存
+        cache = self._caches[name]
+        if cache is not None and value:
+            cache.set(key, value)
+
     def get_poi_detail(self, poi_id: str) -> Dict[str, Any]:
         """
         获取POI详情
@@ -267,3 +629,10 @@ def get_amap_service() -> AmapService:
     
     return _amap_service
 
+
+
+def get_amap_cache_stats() -> Dict[str, Any]:
+    """获取地图服务缓存统计信息(服务未创建时返回空字典)"""
+    if _amap_service is None:
+        return {}
+    return _amap_service.get_cache_stats()
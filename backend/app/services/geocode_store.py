@@ -0,0 +1,341 @@
+"""持久化地理编码库 - SQLite存储地址到坐标的映射,支持按网格反向查找附近的已知地点"""
+
+import os
+import re
+import math
+import time
+import sqlite3
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from ..config import get_settings
+
+# 地址规范化时去除的空白和标点
+_ADDRESS_NOISE_PATTERN = re.compile(r"[\s\-_·•,，.。;；:：、'\"“”‘’()（）\[\]【】<>《》]+")
+# 城市名称的行政区划后缀
+_CITY_SUFFIX_PATTERN = re.compile(r"(市|地区|自治州|盟)$")
+
+# 记录类型(主键前缀): 地址可用于解析和修正坐标,地点名称只用于核实(同名地点可能有多处)
+KIND_ADDRESS = "addr"
+KIND_NAME = "name"
+
+# 相对路径的基准目录(backend)
+_BACKEND_DIR = Path(__file__).parent.parent.parent
+
+# 地球平均半径（米）
+_EARTH_RADIUS = 6371000.0
+# 每纬度对应的距离（米）
+_METERS_PER_DEGREE = 111320.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS geocodes (
+    key TEXT PRIMARY KEY,
+    address TEXT NOT NULL,
+    city TEXT NOT NULL,
+    longitude REAL NOT NULL,
+    latitude REAL NOT NULL,
+    cell_x INTEGER NOT NULL,
+    cell_y INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_geocodes_cell ON geocodes (cell_x, cell_y);
+"""
+
+
+class GeocodeEntry(NamedTuple):
+    """已知地点"""
+    address: str
+    city: str
+    longitude: float
+    latitude: float
+    source: str
+    kind: str = KIND_ADDRESS  # 记录类型(KIND_ADDRESS 或 KIND_NAME)
+    distance: float = 0.0  # 反向查找时与查询点的距离（米）
+
+
+def normalize_city(city: Optional[str]) -> str:
+    """规范化城市名称(去除空白和"市"等后缀): "北京市" -> "北京" """
+    text = _ADDRESS_NOISE_PATTERN.sub("", unicodedata.normalize("NFKC", city or "")).lower()
+    return _CITY_SUFFIX_PATTERN.sub("", text)
+
+
+def normalize_address(address: str, city: Optional[str] = None) -> str:
+    """
+    规范化地址
+
+    全角转半角、忽略大小写、去除空白和标点,并去掉开头重复的城市名称,
+    使 "北京市 故宫博物院"、"故宫博物院" 在城市为北京时得到相同的结果。
+    """
+    text = _ADDRESS_NOISE_PATTERN.sub("", unicodedata.normalize("NFKC", address or "")).lower()
+    city_name = normalize_city(city)
+    if city_name:
+        for prefix in (city_name + "市", city_name):
+            if text.startswith(prefix) and len(text) > len(prefix):
+                text = text[len(prefix):]
+                break
+    return text
+
+
+def haversine(lng1: float, lat1: float, lng2: float, lat2: float) -> float:
+    """两点间的球面距离（米）"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * _EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GeocodeStore:
+    """
+    持久化地理编码库
+
+    - 以 "类型:规范化城市|规范化地址" 为主键保存坐标,重复地址本地解析,进程重启后仍然有效;
+      地址(addr)和地点名称(name)分开存放,按名称查不到地址记录,反之亦然
+    - 坐标按 grid_size 度划分网格并建立索引,反向查找时只扫描覆盖查询半径的网格
+    - 单个SQLite连接加锁访问,开启WAL以减少写入对读取的阻塞
+    """
+
+    def __init__(self, path: str, grid_size: float = 0.01):
+        """
+        初始化地理编码库(文件不存在时自动创建)
+
+        Args:
+            path: SQLite文件路径(":memory:"表示仅内存)
+            grid_size: 网格大小（度，0.01度约1公里）
+        """
+        self.path = path
+        self.grid_size = grid_size
+
+        if path != ":memory:":
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.nearby_queries = 0
+
+    def get(self, address: str, city: Optional[str] = None, kind: str = KIND_ADDRESS) -> Optional[Tuple[float, float]]:
+        """
+        查找地址(或地点名称)的坐标
+
+        Args:
+            address: 地址或地点名称
+            city: 城市
+            kind: 记录类型(默认只查地址记录)
+
+        Returns:
+            (经度, 纬度),未收录时返回None
+        """
+        key = self._key(address, city, kind)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT longitude, latitude FROM geocodes WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0], row[1]
+
+    def put(
+        self, address: str, city: Optional[str], longitude: float, latitude: float,
+        source: str = "geocode", kind: str = KIND_ADDRESS
+    ):
+        """
+        保存地址的坐标(已存在时覆盖)
+
+        Args:
+            address: 地址或地点名称
+            city: 城市
+            longitude: 经度
+            latitude: 纬度
+            source: 来源(geocode: 地理编码, poi: POI搜索结果)
+            kind: 记录类型(KIND_ADDRESS 或 KIND_NAME)
+        """
+        self.put_many([(address, city, longitude, latitude)], source, kind)
+
+    def put_many(
+        self, items: Iterable[Tuple[str, Optional[str], float, float]],
+        source: str = "geocode", kind: str = KIND_ADDRESS
+    ):
+        """批量保存 (地址, 城市, 经度, 纬度),在一个事务中写入"""
+        now = time.time()
+        self._write([
+            (
+                self._key(address, city, kind), address, city or "", longitude, latitude,
+                *self._cell(longitude, latitude), source, now
+            )
+            for address, city, longitude, latitude in items
+            if normalize_address(address, city)
+        ])
+
+    def put_pois(self, pois: Iterable[Tuple[str, str, float, float]], city: Optional[str]):
+        """
+        保存POI搜索结果: 名称写入名称记录,地址写入地址记录(在一个事务中写入)
+
+        Args:
+            pois: (名称, 地址, 经度, 纬度)
+            city: 城市
+        """
+        now = time.time()
+        rows = []
+        for name, address, longitude, latitude in pois:
+            cell = self._cell(longitude, latitude)
+            for kind, text in ((KIND_NAME, name), (KIND_ADDRESS, address)):
+                if text and normalize_address(text, city):
+                    rows.append((
+                        self._key(text, city, kind), text, city or "", longitude, latitude, *cell, "poi", now
+                    ))
+        self._write(rows)
+
+    def _write(self, rows: List[Tuple]):
+        """写入(已存在时覆盖)完整的记录行"""
+        if not rows:
+            return
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO geocodes (key, address, city, longitude, latitude, cell_x, cell_y, source, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET address = excluded.address, city = excluded.city, "
+                "longitude = excluded.longitude, latitude = excluded.latitude, cell_x = excluded.cell_x, "
+                "cell_y = excluded.cell_y, source = excluded.source, updated_at = excluded.updated_at",
+                rows
+            )
+            self.writes += len(rows)
+
+    def nearby(self, longitude: float, latitude: float, radius: float, limit: int = 10) -> List[GeocodeEntry]:
+        """
+        反向查找附近的已知地点
+
+        Args:
+            longitude: 经度
+            latitude: 纬度
+            radius: 查找半径（米）
+            limit: 最多返回的地点数
+
+        Returns:
+            按距离从近到远排列的已知地点
+        """
+        lat_span = radius / _METERS_PER_DEGREE
+        lng_span = radius / (_METERS_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+        min_x, min_y = self._cell(longitude - lng_span, latitude - lat_span)
+        max_x, max_y = self._cell(longitude + lng_span, latitude + lat_span)
+
+        with self._lock:
+            self.nearby_queries += 1
+            rows = self._conn.execute(
+                "SELECT key, address, city, longitude, latitude, source FROM geocodes "
+                "WHERE cell_x BETWEEN ? AND ? AND cell_y BETWEEN ? AND ? "
+                "AND longitude BETWEEN ? AND ? AND latitude BETWEEN ? AND ?",
+                (
+                    min_x, max_x, min_y, max_y,
+                    longitude - lng_span, longitude + lng_span, latitude - lat_span, latitude + lat_span
+                )
+            ).fetchall()
+
+        entries = []
+        for key, address, city, lng, lat, source in rows:
+            distance = haversine(longitude, latitude, lng, lat)
+            if distance <= radius:
+                entries.append(GeocodeEntry(address, city, lng, lat, source, key.split(":", 1)[0], distance))
+        entries.sort(key=lambda entry: entry.distance)
+        return entries[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM geocodes").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                "path": self.path,
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "writes": self.writes,
+                "nearby_queries": self.nearby_queries,
+            }
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def _migrate(self):
+        """
+        迁移没有类型前缀的旧记录: 地理编码结果归为地址记录,
+        POI记录无法区分名称和地址,直接删除(之后的POI搜索会重新写入)
+        """
+        with self._conn:
+            self._conn.execute(
+                "DELETE FROM geocodes WHERE source = 'poi' AND key NOT LIKE ? AND key NOT LIKE ?",
+                (f"{KIND_ADDRESS}:%", f"{KIND_NAME}:%")
+            )
+            self._conn.execute(
+                "UPDATE OR REPLACE geocodes SET key = ? || key WHERE key NOT LIKE ? AND key NOT LIKE ?",
+                (f"{KIND_ADDRESS}:", f"{KIND_ADDRESS}:%", f"{KIND_NAME}:%")
+            )
+
+    @staticmethod
+    def _key(address: str, city: Optional[str], kind: str = KIND_ADDRESS) -> str:
+        return f"{kind}:{normalize_city(city)}|{normalize_address(address, city)}"
+
+    def _cell(self, longitude: float, latitude: float) -> Tuple[int, int]:
+        return math.floor(longitude / self.grid_size), math.floor(latitude / self.grid_size)
+
+
+# 全局地理编码库实例
+_geocode_store: Optional[GeocodeStore] = None
+_geocode_store_lock = threading.Lock()
+
+
+def get_geocode_store() -> Optional[GeocodeStore]:
+    """
+    获取持久化地理编码库(单例模式)
+
+    路径由 perf_geocode_store_path 控制(相对路径基于backend目录,与启动时的工作目录无关),
+    为空时禁用并返回None。
+    """
+    global _geocode_store
+
+    path = get_settings().perf_geocode_store_path
+    if not path:
+        return None
+    if path != ":memory:" and not os.path.isabs(path):
+        path = str(_BACKEND_DIR / path)
+
+    if _geocode_store is None:
+        with _geocode_store_lock:
+            if _geocode_store is None:
+                _geocode_store = GeocodeStore(path, grid_size=get_settings().perf_geocode_grid_size)
+                print(f"✅ 地理编码库已加载: {path} ({_geocode_store.stats()['entries']} 条)")
+    return _geocode_store
+
+
+def get_geocode_store_stats() -> Dict[str, Any]:
+    """获取地理编码库统计信息(未创建时返回空字典)"""
+    if _geocode_store is None:
+        return {}
+    return _geocode_store.stats()
+
+
+def shutdown_geocode_store():
+    """关闭地理编码库(应用关闭时调用)"""
+    global _geocode_store
+
+    with _geocode_store_lock:
+        if _geocode_store is not None:
+            _geocode_store.close()
+            _geocode_store = None
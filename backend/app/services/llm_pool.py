@@ -0,0 +1,210 @@
+"""LLM多端点池 - 在多个端点/密钥之间负载均衡并自动故障转移"""
+
+import time
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+from hello_agents import HelloAgentsLLM
+from ..utils.retry_handler import get_error_status
+
+# 连接类错误(无状态码)
+_CONNECTION_ERROR_MARKERS = ("connection error", "timed out", "timeout", "connection refused", "connection reset")
+
+
+def is_failover_error(error: BaseException) -> bool:
+    """是否应切换到其他端点重试(429、5xx、连接错误、超时)"""
+    status = get_error_status(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    message = str(error).lower()
+    return any(marker in message for marker in _CONNECTION_ERROR_MARKERS)
+
+
+class LLMEndpoint:
+    """池中的单个LLM端点"""
+
+    def __init__(self, name: str, llm: HelloAgentsLLM, weight: float = 1.0):
+        """
+        初始化端点
+
+        Args:
+            name: 端点名称(用于日志和统计)
+            llm: 该端点的LLM实例
+            weight: 权重(越大分到的请求越多)
+        """
+        self.name = name
+        self.llm = llm
+        self.weight = max(weight, 0.01)
+        self.outstanding = 0
+        self.ejected_until = 0.0
+
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+
+    def available(self, now: float) -> bool:
+        """是否在轮转中(未被摘除)"""
+        return now >= self.ejected_until
+
+    def stats(self, now: float) -> Dict[str, Any]:
+        """获取端点统计信息"""
+        return {
+            "name": self.name,
+            "weight": self.weight,
+            "outstanding": self.outstanding,
+            "available": self.available(now),
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+        }
+
+
+class LLMPool:
+    """
+    LLM多端点池
+
+    - 负载均衡: 选择 (进行中请求数+1)/权重 最小的端点(加权最少连接),相同时按权重轮转
+    - 摘除: 端点返回429、5xx或连接错误后,在冷却时间内移出轮转
+    - 故障转移: 失败的请求透明地换到下一个可用端点重试,所有端点都被摘除时仍尝试最早恢复的端点
+    - 流式调用只在尚未输出任何内容时故障转移
+
+    对外提供与HelloAgentsLLM相同的 invoke/think/stream_invoke 接口。
+    """
+
+    def __init__(self, endpoints: List[LLMEndpoint], cooldown: float = 30.0):
+        """
+        初始化端点池
+
+        Args:
+            endpoints: 端点列表(至少一个)
+            cooldown: 端点被摘除后的冷却时间（秒）
+        """
+        if not endpoints:
+            raise ValueError("LLM端点池至少需要一个端点")
+        self.endpoints = endpoints
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self.failovers = 0
+
+    @classmethod
+    def from_config(cls, config: str, cooldown: float = 30.0, timeout: Optional[int] = None) -> "LLMPool":
+        """
+        从配置字符串创建端点池
+
+        格式: 多个端点用分号分隔,每个端点为 base_url|api_key|权重|模型,权重和模型可省略。
+        例如: https://a.example.com/v1|sk-a|2;https://b.example.com/v1|sk-b|1|qwen-plus
+
+        Args:
+            config: 端点配置字符串
+            cooldown: 冷却时间（秒）
+            timeout: LLM请求超时（秒）
+
+        Returns:
+            端点池实例
+        """
+        endpoints = []
+        for index, entry in enumerate(item.strip() for item in config.split(";")):
+            if not entry:
+                continue
+            parts = [part.strip() for part in entry.split("|")]
+            if len(parts) < 2:
+                raise ValueError(f"LLM端点配置格式错误: {entry}")
+            base_url, api_key = parts[0], parts[1]
+            weight = float(parts[2]) if len(parts) > 2 and parts[2] else 1.0
+            model = parts[3] if len(parts) > 3 and parts[3] else None
+
+            llm = HelloAgentsLLM(model=model, api_key=api_key, base_url=base_url, provider="custom", timeout=timeout)
+            # 由端点池负责切换和重试,关闭OpenAI客户端自带的重试
+            llm._client = llm._client.with_options(max_retries=0)
+            endpoints.append(LLMEndpoint(f"{index}:{base_url}", llm, weight))
+        return cls(endpoints, cooldown=cooldown)
+
+    def __getattr__(self, name: str) -> Any:
+        # model、provider等属性使用第一个端点的配置
+        return getattr(self.endpoints[0].llm, name)
+
+    def invoke(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """非流式调用,失败时切换端点"""
+        tried = set()
+        while True:
+            endpoint = self._acquire(tried)
+            try:
+                result = endpoint.llm.invoke(messages, **kwargs)
+            except Exception as e:
+                if not self._handle_failure(endpoint, e, tried):
+                    raise
+                continue
+            finally:
+                self._release(endpoint)
+            return result
+
+    def stream_invoke(self, messages: List[Dict[str, str]], **kwargs) -> Iterator[str]:
+        """流式调用,尚未输出内容时失败则切换端点"""
+        tried = set()
+        while True:
+            endpoint = self._acquire(tried)
+            started = False
+            try:
+                for chunk in endpoint.llm.stream_invoke(messages, **kwargs):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                if started or not self._handle_failure(endpoint, e, tried):
+                    raise
+                continue
+            finally:
+                self._release(endpoint)
+            return
+
+    def think(self, messages: List[Dict[str, str]], temperature: Optional[float] = None) -> Iterator[str]:
+        """流式调用(与HelloAgentsLLM.think接口一致)"""
+        return self.stream_invoke(messages, temperature=temperature)
+
+    def _acquire(self, tried: set) -> LLMEndpoint:
+        """选择端点并计入进行中请求"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.name not in tried] or list(self.endpoints)
+            available = [e for e in candidates if e.available(now)]
+            if available:
+                # 进行中请求数相同时按已分配请求数/权重轮转
+                endpoint = min(available, key=lambda e: ((e.outstanding + 1) / e.weight, e.requests / e.weight))
+            else:
+                endpoint = min(candidates, key=lambda e: e.ejected_until)
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def _release(self, endpoint: LLMEndpoint):
+        with self._lock:
+            endpoint.outstanding -= 1
+
+    def _handle_failure(self, endpoint: LLMEndpoint, error: Exception, tried: set) -> bool:
+        """
+        记录端点失败
+
+        Returns:
+            是否应切换到其他端点重试
+        """
+        with self._lock:
+            endpoint.failures += 1
+            if not is_failover_error(error):
+                return False
+
+            endpoint.ejected_until = time.monotonic() + self.cooldown
+            endpoint.ejections += 1
+            tried.add(endpoint.name)
+            if len(tried) >= len(self.endpoints):
+                return False
+            self.failovers += 1
+
+        print(f"⚠️  LLM端点 {endpoint.name} 不可用({error})，{self.cooldown:g}秒内移出轮转，切换到其他端点")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """获取端点池统计信息"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "failovers": self.failovers,
+                "endpoints": [endpoint.stats(now) for endpoint in self.endpoints],
+            }
@@ -1,10 +1,233 @@
 """LLM服务模块"""
 
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, Iterator, List, Optional
 from hello_agents import HelloAgentsLLM
 from ..config import get_settings
+from ..utils.rate_limiter import UpstreamRateLimiter, get_rate_limiter
+from ..utils.concurrency_limiter import AdaptiveConcurrencyLimiter, get_concurrency_limiter
+from ..utils.token_counter import estimate_messages_tokens, estimate_tokens
+from ..utils.latency import LatencyWindow
+from .llm_pool import LLMPool
 
 # 全局LLM实例
 _llm_instance = None
+_llm_lock = threading.Lock()
+
+
+class ConcurrencyLimitedLLM:
+    """
+    自适应并发控制LLM包装器
+
+    每次调用(流式调用直到输出结束)占用一个LLM并发名额,
+    名额上限按调用结果自动调整: 正常时逐步增加,遇到429/5xx时减半。
+    """
+
+    def __init__(self, llm: HelloAgentsLLM, limiter: AdaptiveConcurrencyLimiter):
+        """
+        初始化包装器
+
+        Args:
+            llm: 底层LLM实例
+            limiter: 并发限制器
+        """
+        self.llm = llm
+        self.limiter = limiter
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.llm, name)
+
+    def invoke(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """非流式调用LLM"""
+        with self.limiter.slot():
+            return self.llm.invoke(messages, **kwargs)
+
+    def stream_invoke(self, messages: List[Dict[str, str]], **kwargs) -> Iterator[str]:
+        """流式调用LLM"""
+        with self.limiter.slot():
+            yield from self.llm.stream_invoke(messages, **kwargs)
+
+    def think(self, messages: List[Dict[str, str]], temperature: Optional[float] = None) -> Iterator[str]:
+        """流式调用(与HelloAgentsLLM.think接口一致)"""
+        return self.stream_invoke(messages, temperature=temperature)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取并发控制统计信息"""
+        return self.limiter.stats()
+
+
+class ThrottledLLM:
+    """
+    限流LLM包装器
+
+    每次调用前按请求数和预计输入token数向LLM限流器申请配额,配额不足时排队等待,
+    调用完成后再扣除输出token数,使请求速率保持在上游配额以内。
+    """
+
+    def __init__(self, llm: HelloAgentsLLM, limiter: UpstreamRateLimiter):
+        """
+        初始化包装器
+
+        Args:
+            llm: 底层LLM实例
+            limiter: LLM限流器
+        """
+        self.llm = llm
+        self.limiter = limiter
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.llm, name)
+
+    def invoke(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """非流式调用LLM"""
+        self.limiter.acquire(tokens=estimate_messages_tokens(messages))
+        result = self.llm.invoke(messages, **kwargs)
+        self.limiter.consume_tokens(estimate_tokens(result or ""))
+        return result
+
+    def stream_invoke(self, messages: List[Dict[str, str]], **kwargs) -> Iterator[str]:
+        """流式调用LLM"""
+        self.limiter.acquire(tokens=estimate_messages_tokens(messages))
+        output_tokens = 0
+        try:
+            for chunk in self.llm.stream_invoke(messages, **kwargs):
+                output_tokens += estimate_tokens(chunk)
+                yield chunk
+        finally:
+            self.limiter.consume_tokens(output_tokens)
+
+    def think(self, messages: List[Dict[str, str]], temperature: Optional[float] = None) -> Iterator[str]:
+        """流式调用(与HelloAgentsLLM.think接口一致)"""
+        return self.stream_invoke(messages, temperature=temperature)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取限流统计信息"""
+        return self.limiter.stats()
+
+
+class HedgedLLM:
+    """
+    对冲请求LLM包装器
+
+    非流式调用超过最近耗时的指定百分位仍未返回时,再发出一个相同的请求,
+    先成功返回的结果生效。对冲请求数受全局预算(占总调用数的比例)限制,避免成倍增加调用量。
+    耗时样本只取主请求(无论是否胜出),对冲请求的耗时不计入,避免触发阈值不断降低。
+    可能对冲的主请求在有界的主请求线程池中执行,线程池占满或不可能对冲(样本不足、预算用尽)时
+    直接在调用线程上执行且不对冲。流式调用不做对冲,直接转发给底层LLM。
+    """
+
+    def __init__(
+        self,
+        llm: HelloAgentsLLM,
+        percentile: float = 95.0,
+        budget: float = 0.1,
+        min_samples: int = 20,
+        max_workers: int = 64
+    ):
+        """
+        初始化包装器
+
+        Args:
+            llm: 底层LLM实例
+            percentile: 触发对冲的耗时百分位
+            budget: 对冲请求占总调用数的比例上限
+            min_samples: 开始对冲前需要的最少耗时样本数
+            max_workers: 主请求线程池和对冲请求线程池各自的线程数
+        """
+        self.llm = llm
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self._latency = LatencyWindow()
+        self._primary_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-primary")
+        # 主请求线程池的空闲名额,没有名额时不提交(避免在线程池中排队)
+        self._primary_slots = threading.BoundedSemaphore(max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-hedge")
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.hedges_skipped = 0
+
+    def __getattr__(self, name: str) -> Any:
+        # 其他属性和方法(model、provider、think、stream_invoke等)直接使用底层LLM
+        return getattr(self.llm, name)
+
+    def invoke(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """非流式调用LLM,耗时过长时发出对冲请求"""
+        with self._lock:
+            self.calls += 1
+
+        hedge_delay = self._latency.percentile(self.percentile) if len(self._latency) >= self.min_samples else None
+        if hedge_delay is None or not self._hedge_affordable() or not self._primary_slots.acquire(blocking=False):
+            # 不可能对冲或主请求线程池已满时直接在调用线程上执行
+            return self._invoke_primary(messages, kwargs)
+
+        primary = self._primary_executor.submit(self._run_primary, messages, kwargs)
+        done, _ = wait([primary], timeout=hedge_delay)
+        if done or not self._acquire_hedge():
+            return primary.result()
+
+        hedge = self._executor.submit(self.llm.invoke, messages, **kwargs)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if future is hedge:
+                    with self._lock:
+                        self.hedges_won += 1
+                return result
+        raise error
+
+    def _run_primary(self, messages: List[Dict[str, str]], kwargs: Dict[str, Any]) -> str:
+        """在主请求线程池中执行主请求,结束后归还名额"""
+        try:
+            return self._invoke_primary(messages, kwargs)
+        finally:
+            self._primary_slots.release()
+
+    def _invoke_primary(self, messages: List[Dict[str, str]], kwargs: Dict[str, Any]) -> str:
+        """调用底层LLM并记录耗时(从请求实际开始时计算,落后于对冲请求时同样记录)"""
+        start = time.monotonic()
+        result = self.llm.invoke(messages, **kwargs)
+        self._latency.add(time.monotonic() - start)
+        return result
+
+    def _hedge_affordable(self) -> bool:
+        """对冲预算是否还允许一次对冲(不计入)"""
+        with self._lock:
+            return self.hedges_fired + 1 <= self.budget * self.calls
+
+    def _acquire_hedge(self) -> bool:
+        """检查对冲预算,允许时计入一次对冲"""
+        with self._lock:
+            if self.hedges_fired + 1 > self.budget * self.calls:
+                self.hedges_skipped += 1
+                return False
+            self.hedges_fired += 1
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        """获取对冲统计信息"""
+        with self._lock:
+            stats = {
+                "calls": self.calls,
+                "hedges_fired": self.hedges_fired,
+                "hedges_won": self.hedges_won,
+                "hedges_skipped": self.hedges_skipped,
+            }
+        stats["hedge_delay"] = self._latency.percentile(self.percentile) if len(self._latency) >= self.min_samples else None
+        stats["samples"] = len(self._latency)
+        return stats
 
 
 def get_llm() -> HelloAgentsLLM:
@@ -12,24 +235,86 @@ def get_llm() -> HelloAgentsLLM:
     获取LLM实例(单例模式)
     
     Returns:
-        HelloAgentsLLM实例
+        HelloAgentsLLM实例(配置多个端点时为LLMPool,按需再依次包装
+        并发控制ConcurrencyLimitedLLM、限流ThrottledLLM和对冲HedgedLLM)
     """
     global _llm_instance
     
     if _llm_instance is None:
-        settings = get_settings()
-        
-        # HelloAgentsLLM会自动从环境变量读取配置
-        # 包括OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_MODEL等
-        _llm_instance = HelloAgentsLLM()
-        
-        print(f"✅ LLM服务初始化成功")
-        print(f"   提供商: {_llm_instance.provider}")
-        print(f"   模型: {_llm_instance.model}")
+        with _llm_lock:
+            if _llm_instance is None:
+                settings = get_settings()
+
+                if settings.llm_endpoints:
+                    # 配置了多个端点时使用端点池(负载均衡 + 故障转移)
+                    llm = LLMPool.from_config(
+                        settings.llm_endpoints,
+                        cooldown=settings.perf_llm_eject_cooldown,
+                        timeout=settings.perf_llm_timeout
+                    )
+                else:
+                    # HelloAgentsLLM会自动从环境变量读取配置
+                    # 包括OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_MODEL等
+                    llm = HelloAgentsLLM(timeout=settings.perf_llm_timeout)
+
+                # 自适应并发控制
+                if settings.perf_adaptive_concurrency:
+                    llm = ConcurrencyLimitedLLM(llm, get_concurrency_limiter("llm"))
+
+                # 主动限流(对冲请求同样计入配额)
+                limiter = get_rate_limiter("llm")
+                if limiter.enabled:
+                    llm = ThrottledLLM(llm, limiter)
+
+                if settings.perf_llm_hedge_enabled:
+                    llm = HedgedLLM(
+                        llm,
+                        percentile=settings.perf_llm_hedge_percentile,
+                        budget=settings.perf_llm_hedge_budget,
+                        min_samples=settings.perf_llm_hedge_min_samples,
+                        max_workers=settings.perf_max_concurrent_plans
+                    )
+
+                print(f"✅ LLM服务初始化成功")
+                print(f"   提供商: {llm.provider}")
+                print(f"   模型: {llm.model}")
+                if settings.llm_endpoints:
+                    print(f"   端点池: {len(settings.llm_endpoints.strip(';').split(';'))} 个端点")
+                if settings.perf_llm_hedge_enabled:
+                    print(f"   对冲请求: P{settings.perf_llm_hedge_percentile:g} 触发, 预算 {settings.perf_llm_hedge_budget:.0%}")
+                _llm_instance = llm
     
     return _llm_instance
 
 
+# 各层包装器在性能指标中的名称
+_LLM_LAYER_NAMES = (
+    (HedgedLLM, "hedge"),
+    (ThrottledLLM, "throttle"),
+    (ConcurrencyLimitedLLM, "concurrency"),
+    (LLMPool, "pool"),
+)
+
+
+def get_llm_metrics() -> Dict[str, Any]:
+    """
+    获取LLM层的性能指标
+
+    沿包装链(对冲 -> 限流 -> 并发控制 -> 端点池)逐层收集统计信息,
+    未初始化或未启用任何包装时返回空字典。
+    """
+    metrics = {}
+    llm = _llm_instance
+    while llm is not None:
+        for layer, name in _LLM_LAYER_NAMES:
+            if isinstance(llm, layer):
+                metrics[name] = llm.stats()
+                break
+        # 只取包装器自身的llm属性,避免__getattr__转发到底层LLM
+        llm = vars(llm).get("llm") if isinstance(llm, (HedgedLLM, ThrottledLLM, ConcurrencyLimitedLLM)) else None
+    return metrics
+
+
 def reset_llm():
     """重置LLM实例(用于测试或重新配置)"""
     global _llm_instance
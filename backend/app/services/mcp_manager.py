@@ -0,0 +1,342 @@
+"""MCP连接池管理 - 进程内共享的常驻MCP服务器连接池"""
+
+import time
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional
+from hello_agents.protocols.mcp.client import MCPClient
+from ..utils.latency import ToolLatencyStats
+
+# 启动单个MCP服务器的超时时间（秒，uvx首次运行需要下载依赖）
+_CONNECT_TIMEOUT = 60.0
+
+
+class MCPSession:
+    """连接池中的单个MCP服务器连接(对应一个服务器子进程)"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.client: Optional[MCPClient] = None
+        self.healthy = False
+        self.in_use = False
+        self.queued = False
+        self.restarting = False
+        self.task: Optional[asyncio.Task] = None
+        self.stop_event: Optional[asyncio.Event] = None
+        self.last_used = 0.0
+
+        self.calls = 0
+        self.failures = 0
+        self.restarts = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """获取连接统计信息"""
+        return {
+            "index": self.index,
+            "healthy": self.healthy,
+            "in_use": self.in_use,
+            "calls": self.calls,
+            "failures": self.failures,
+            "restarts": self.restarts,
+        }
+
+
+class MCPManager:
+    """
+    MCP连接池管理器
+
+    - 在后台事件循环中维持 pool_size 个常驻的MCP服务器连接,工具调用不再每次启动新的服务器进程
+    - 每个调用独占一个空闲连接,所有连接都忙时排队等待
+    - 连接出错(服务器进程退出等)后移出连接池并在后台重启;定期对空闲连接做健康检查
+    - 记录每个工具的调用次数、错误数和耗时分布
+    """
+
+    def __init__(
+        self,
+        server_command: List[str],
+        env: Optional[Dict[str, str]] = None,
+        pool_size: int = 2,
+        call_timeout: float = 30.0,
+        health_interval: float = 30.0,
+        name: str = "mcp"
+    ):
+        """
+        初始化连接池(不会立即启动服务器,调用 start() 后生效)
+
+        Args:
+            server_command: MCP服务器启动命令
+            env: 传递给服务器进程的环境变量
+            pool_size: 连接数(服务器进程数)
+            call_timeout: 单次工具调用的超时时间（秒，包含排队等待）
+            health_interval: 健康检查间隔（秒，0表示不检查）
+            name: 名称(用于日志和线程名)
+        """
+        self.server_command = server_command
+        self.env = env or {}
+        self.pool_size = max(1, pool_size)
+        self.call_timeout = call_timeout
+        self.health_interval = health_interval
+        self.name = name
+
+        self._sessions = [MCPSession(index) for index in range(self.pool_size)]
+        self._tools: List[Dict[str, Any]] = []
+        self._tool_stats: Dict[str, ToolLatencyStats] = {}
+        self._stats_lock = threading.Lock()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._idle: Optional[asyncio.Queue] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._start_lock = threading.Lock()
+        self._started = False
+
+    # ============ 生命周期 ============
+
+    def start(self):
+        """启动后台事件循环、连接所有服务器并获取工具列表(重复调用无副作用)"""
+        with self._start_lock:
+            if self._started:
+                return
+
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(
+                target=self._loop.run_forever, name=f"{self.name}-loop", daemon=True
+            )
+            self._thread.start()
+
+            start = time.perf_counter()
+            try:
+                self._submit(self._start_sessions()).result()
+            except Exception:
+                self._stop_loop()
+                raise
+            self._started = True
+
+        healthy = sum(session.healthy for session in self._sessions)
+        print(
+            f"✅ MCP连接池已启动: {healthy}/{self.pool_size} 个连接, "
+            f"{len(self._tools)} 个工具, 耗时 {time.perf_counter() - start:.2f} 秒"
+        )
+
+    def close(self):
+        """关闭所有连接并停止后台事件循环"""
+        with self._start_lock:
+            if not self._started:
+                return
+            try:
+                self._submit(self._close_sessions()).result(timeout=10)
+            except Exception as e:
+                print(f"⚠️  关闭MCP连接池失败: {e}")
+            self._stop_loop()
+            self._started = False
+
+    def _stop_loop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    # ============ 同步接口 ============
+
+    def list_tools(self) -> List[Dict[str, Any]]:
+        """获取服务器提供的工具列表(启动时获取并缓存)"""
+        self.start()
+        return list(self._tools)
+
+    def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
+        """
+        调用MCP工具
+
+        Args:
+            tool_name: 工具名称
+            arguments: 工具参数
+
+        Returns:
+            工具返回的内容
+
+        Raises:
+            TimeoutError: 排队或调用超时
+        """
+        self.start()
+        future = self._submit(self._call_tool(tool_name, arguments))
+        try:
+            return future.result(timeout=self.call_timeout)
+        except TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"MCP工具调用超时（{self.call_timeout:g}秒）: {tool_name}") from None
+
+    def stats(self) -> Dict[str, Any]:
+        """获取连接池和各工具的统计信息"""
+        with self._stats_lock:
+            tools = {name: stats.stats() for name, stats in self._tool_stats.items()}
+        return {
+            "pool_size": self.pool_size,
+            "healthy": sum(session.healthy for session in self._sessions),
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "sessions": [session.stats() for session in self._sessions],
+            "tools": tools,
+        }
+
+    # ============ 后台事件循环中的实现 ============
+
+    async def _start_sessions(self):
+        self._idle = asyncio.Queue()
+        await asyncio.gather(*(self._connect(session) for session in self._sessions))
+
+        healthy = [session for session in self._sessions if session.healthy]
+        if not healthy:
+            raise RuntimeError(f"MCP服务器启动失败: {' '.join(self.server_command)}")
+        self._tools = await healthy[0].client.list_tools()
+
+        if self.health_interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def _close_sessions(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+        for session in self._sessions:
+            await self._disconnect(session)
+
+    async def _connect(self, session: MCPSession) -> bool:
+        """启动服务器进程并建立连接,成功后放入空闲队列"""
+        ready = asyncio.Event()
+        session.stop_event = asyncio.Event()
+        session.task = asyncio.create_task(self._run_session(session, ready))
+        waiter = asyncio.create_task(ready.wait())
+        await asyncio.wait([waiter, session.task], timeout=_CONNECT_TIMEOUT, return_when=asyncio.FIRST_COMPLETED)
+        waiter.cancel()
+        if not session.healthy:
+            session.task.cancel()
+            print(f"⚠️  MCP连接 #{session.index} 启动失败")
+            return False
+        if not session.queued:
+            session.queued = True
+            self._idle.put_nowait(session)
+        return True
+
+    async def _run_session(self, session: MCPSession, ready: asyncio.Event):
+        """
+        连接的生命周期任务
+
+        连接的建立和关闭在同一个任务中完成,连接期间等待停止信号。
+        """
+        try:
+            async with MCPClient(self.server_command, env=self.env) as client:
+                session.client = client
+                session.healthy = True
+                ready.set()
+                await session.stop_event.wait()
+        except Exception as e:
+            print(f"⚠️  MCP连接 #{session.index} 已断开: {e}")
+        finally:
+            session.healthy = False
+            session.client = None
+
+    async def _disconnect(self, session: MCPSession):
+        """关闭连接(服务器进程随之退出)"""
+        session.healthy = False
+        if session.stop_event is not None:
+            session.stop_event.set()
+        if session.task is not None:
+            try:
+                await asyncio.wait_for(session.task, timeout=5)
+            except (asyncio.TimeoutError, Exception):
+                session.task.cancel()
+            session.task = None
+
+    async def _restart(self, session: MCPSession) -> bool:
+        """重启出错的连接(同一连接同时只会有一个重启)"""
+        if session.restarting:
+            return False
+        session.restarting = True
+        try:
+            await self._disconnect(session)
+            session.restarts += 1
+            print(f"🔄 重启MCP连接 #{session.index}...")
+            return await self._connect(session)
+        finally:
+            session.restarting = False
+
+    async def _acquire(self) -> MCPSession:
+        """取出一个健康的空闲连接,没有健康连接时先尝试重启"""
+        while True:
+            if not any(session.healthy for session in self._sessions):
+                candidates = [s for s in self._sessions if not s.in_use and not s.restarting]
+                if not candidates or not await self._restart(candidates[0]):
+                    await asyncio.sleep(1)
+                    continue
+
+            session = await self._idle.get()
+            session.queued = False
+            # 队列中已失效的连接直接丢弃,重启成功后会重新放入
+            if session.healthy:
+                session.in_use = True
+                return session
+
+    def _release(self, session: MCPSession):
+        session.in_use = False
+        session.last_used = time.monotonic()
+        if session.healthy:
+            session.queued = True
+            self._idle.put_nowait(session)
+        else:
+            asyncio.create_task(self._restart(session))
+
+    async def _call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
+        """
+        在空闲连接上调用工具
+
+        连接级错误(服务器进程退出、连接中断)时重启该连接并在其他连接上重试一次;
+        工具本身返回的错误直接抛出。
+        """
+        for attempt in range(2):
+            session = await self._acquire()
+            start = time.perf_counter()
+            try:
+                result = await session.client.call_tool(tool_name, arguments)
+                session.calls += 1
+                self._record(tool_name, time.perf_counter() - start)
+                return result
+            except Exception:
+                session.failures += 1
+                self._record(tool_name, time.perf_counter() - start, error=True)
+                alive = session.client is not None and await self._ping(session)
+                if alive or attempt > 0:
+                    raise
+                session.healthy = False
+                print(f"⚠️  MCP连接 #{session.index} 调用 {tool_name} 时断开，切换连接重试")
+            finally:
+                self._release(session)
+
+    async def _ping(self, session: MCPSession) -> bool:
+        try:
+            return await asyncio.wait_for(session.client.ping(), timeout=5)
+        except Exception:
+            return False
+
+    async def _health_loop(self):
+        """定期检查空闲连接,重启失效的连接"""
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for session in self._sessions:
+                if session.in_use or session.restarting:
+                    continue
+                if session.healthy and session.client is not None and await self._ping(session):
+                    continue
+                # 检查期间被取用的连接不重启
+                if session.in_use:
+                    continue
+                session.healthy = False
+                await self._restart(session)
+
+    def _record(self, tool_name: str, seconds: float, error: bool = False):
+        with self._stats_lock:
+            stats = self._tool_stats.get(tool_name)
+            if stats is None:
+                stats = self._tool_stats[tool_name] = ToolLatencyStats()
+            stats.record(seconds, error)
@@ -0,0 +1,252 @@
+"""旅行规划任务服务 - 异步提交规划任务,结果在服务端保存一段时间供客户端轮询"""
+
+import uuid
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from ..config import get_settings
+from ..models.schemas import TripRequest, TripPlan, TripJobInfo
+from ..utils.cache import TTLCache
+from ..utils.plan_scheduler import PRIORITY_ANONYMOUS, PRIORITY_USER, PlanJob, get_plan_scheduler
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+
+class TripJob:
+    """单个旅行规划任务"""
+
+    def __init__(self, request: TripRequest, user_id: Optional[str] = None):
+        self.job_id = uuid.uuid4().hex
+        self.request = request
+        self.user_id = user_id
+        self.status = JOB_QUEUED
+        self.created_at = datetime.now().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.result: Optional[TripPlan] = None
+        self.error: Optional[str] = None
+        self.plan_id: Optional[str] = None
+        self.scheduled: Optional[PlanJob] = None
+        self.saving = False  # 正在保存结果到数据库(此后不能再取消)
+
+    @property
+    def finished(self) -> bool:
+        """是否已结束(成功、失败或取消)"""
+        return self.status in (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+
+class TripJobService:
+    """
+    旅行规划任务服务
+
+    - 任务提交到规划调度器执行,与HTTP连接解耦: 客户端超时或断线不会浪费已完成的规划
+    - 进行中的任务常驻内存,结束后的任务按 ttl 保存,超过 max_size 时淘汰最久未访问的任务
+    - 已登录用户的任务只能由本人查询和取消,成功后自动保存到数据库
+    """
+
+    def __init__(self, ttl: float = 3600, max_size: int = 1000):
+        """
+        初始化任务服务
+
+        Args:
+            ttl: 任务结束后结果的保存时间（秒）
+            max_size: 保存的已结束任务数上限
+        """
+        self._active: Dict[str, TripJob] = {}
+        self._finished = TTLCache(name="trip_jobs", ttl=ttl, max_size=max_size)
+        self._lock = threading.Lock()
+
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.cancelled = 0
+
+    def submit(self, request: TripRequest, user_id: Optional[str] = None) -> TripJob:
+        """
+        提交规划任务(已登录用户优先调度)
+
+        Args:
+            request: 旅行请求
+            user_id: 用户ID（已登录时）
+
+        Returns:
+            任务对象
+
+        Raises:
+            SchedulerFullError: 规划队列已满
+        """
+        job = TripJob(request, user_id)
+        with self._lock:
+            self._active[job.job_id] = job
+        try:
+            job.scheduled = get_plan_scheduler().submit(
+                self._run, job,
+                priority=PRIORITY_USER if user_id else PRIORITY_ANONYMOUS
+            )
+        except Exception:
+            with self._lock:
+                del self._active[job.job_id]
+            raise
+
+        with self._lock:
+            self.submitted += 1
+        print(f"📮 旅行规划任务已提交: {job.job_id} ({request.city} {request.travel_days}天)")
+        return job
+
+    def get(self, job_id: str, user_id: Optional[str] = None) -> Optional[TripJob]:
+        """
+        获取任务
+
+        Args:
+            job_id: 任务ID
+            user_id: 当前用户ID（任务属于已登录用户时必须一致）
+
+        Returns:
+            任务对象,不存在、已过期或无权访问时返回None
+        """
+        with self._lock:
+            job = self._active.get(job_id)
+        if job is None:
+            job = self._finished.get(job_id)
+        if job is None or (job.user_id and job.user_id != user_id):
+            return None
+        return job
+
+    def cancel(self, job_id: str, user_id: Optional[str] = None) -> Optional[TripJob]:
+        """
+        取消任务
+
+        排队中的任务直接移出队列;执行中的任务无法中断线程,只丢弃其结果(不再保存到数据库)。
+        已开始保存结果的任务不能再取消,原样返回。
+
+        Returns:
+            任务对象,不存在或无权访问时返回None
+        """
+        job = self.get(job_id, user_id)
+        if job is None:
+            return None
+
+        with self._lock:
+            if job.finished or job.saving:
+                return job
+            if job.status == JOB_QUEUED and job.scheduled is not None:
+                get_plan_scheduler().cancel(job.scheduled)
+            self._finish(job, JOB_CANCELLED)
+            self.cancelled += 1
+        print(f"🛑 旅行规划任务已取消: {job.job_id}")
+        return job
+
+    def describe(self, job: TripJob) -> TripJobInfo:
+        """转换为接口返回的任务状态"""
+        queue_position = None
+        if job.status == JOB_QUEUED and job.scheduled is not None:
+            queue_position = get_plan_scheduler().position(job.scheduled)
+        return TripJobInfo(
+            job_id=job.job_id,
+            status=job.status,
+            queue_position=queue_position,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+            error=job.error,
+            plan_id=job.plan_id,
+            result=job.result
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """获取任务统计信息"""
+        with self._lock:
+            return {
+                "active": len(self._active),
+                "submitted": self.submitted,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "stored": self._finished.stats(),
+            }
+
+    def _finish(self, job: TripJob, status: str):
+        """标记任务结束并移入结果存储(需持有锁)"""
+        job.status = status
+        job.finished_at = datetime.now().isoformat()
+        self._active.pop(job.job_id, None)
+        self._finished.set(job.job_id, job)
+
+    def _run(self, job: TripJob):
+        """在规划调度器的工作线程中执行任务"""
+        from ..agents.trip_planner_agent import get_trip_planner_agent
+        from .database import save_trip_plan
+
+        with self._lock:
+            if job.finished:
+                return
+            job.status = JOB_RUNNING
+            job.started_at = datetime.now().isoformat()
+
+        try:
+            trip_plan = get_trip_planner_agent().plan_trip(job.request)
+        except Exception as e:
+            print(f"❌ 旅行规划任务失败: {job.job_id} {e}")
+            with self._lock:
+                if not job.finished:
+                    job.error = str(e)
+                    self._finish(job, JOB_FAILED)
+                    self.failed += 1
+            return
+
+        with self._lock:
+            # 执行期间已被取消的任务丢弃结果;开始保存后不再接受取消,避免已取消的任务写入数据库
+            if job.finished:
+                return
+            job.saving = bool(job.user_id)
+
+        plan_id = None
+        if job.user_id:
+            try:
+                plan_id = save_trip_plan(job.user_id, job.request.model_dump(), trip_plan.model_dump())
+                if plan_id:
+                    print(f"💾 旅行规划已保存到数据库: {plan_id}")
+            except Exception as e:
+                print(f"⚠️  保存旅行规划到数据库失败: {e}")
+
+        with self._lock:
+            if job.finished:
+                return
+            job.result = trip_plan
+            job.plan_id = plan_id
+            self._finish(job, JOB_SUCCEEDED)
+            self.succeeded += 1
+        print(f"✅ 旅行规划任务完成: {job.job_id}")
+
+
+# 全局任务服务实例
+_trip_job_service: Optional[TripJobService] = None
+_trip_job_service_lock = threading.Lock()
+
+
+def get_trip_job_service() -> TripJobService:
+    """获取旅行规划任务服务实例(单例模式)"""
+    global _trip_job_service
+
+    if _trip_job_service is None:
+        with _trip_job_service_lock:
+            if _trip_job_service is None:
+                settings = get_settings()
+                _trip_job_service = TripJobService(
+                    ttl=settings.perf_job_result_ttl,
+                    max_size=settings.perf_job_max_results
+                )
+    return _trip_job_service
+
+
+def get_trip_job_stats() -> Dict[str, Any]:
+    """获取任务统计信息(服务未创建时返回空字典)"""
+    if _trip_job_service is None:
+        return {}
+    return _trip_job_service.stats()
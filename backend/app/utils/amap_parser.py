@@ -0,0 +1,322 @@
+"""高德地图工具结果解析工具"""
+
+import re
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# 预编译的解析模式
+# MCP工具结果前缀: 工具 'maps_text_search' 执行结果:
+_TOOL_RESULT_PREFIX = re.compile(r"^\s*工具\s*'[^']*'\s*执行结果[:：]\s*")
+# Agent格式化文本中的POI: 1. **名称**\n   - 地址：xxx
+_POI_MARKDOWN_PATTERN = re.compile(r"\d+\.\s*\*\*([^*]+)\*\*\s*-\s*地址[：:]\s*([^\n]+)")
+# Agent格式化文本中的天气: - **2025年11月10日（星期一）**\n  - 白天：多云，气温 0°C，西风 1-3 级
+_WEATHER_DATE_PATTERN = re.compile(r"\*\*(\d{4}年\d{1,2}月\d{1,2}日).*?\*\*")
+_WEATHER_PERIOD_PATTERNS = {
+    period: re.compile(period_name + r"[：:]\s*([^，,]+).*?气温\s*(-?\d+)°C.*?([东南西北]+风.*?\d+-?\d*\s*级)")
+    for period, period_name in (("day", "白天"), ("night", "夜间"))
+}
+# 高德坐标: "经度,纬度"
+_LOCATION_PATTERN = re.compile(r"^\s*(-?\d{1,3}(?:\.\d+)?)\s*,\s*(-?\d{1,2}(?:\.\d+)?)\s*$")
+# 路径规划步骤说明中的HTML标签(公交换乘说明中偶尔出现)
+_HTML_TAG_PATTERN = re.compile(r"<[^>]+>")
+
+# 高德天气预报字段 -> WeatherInfo字段
+_WEATHER_FIELDS = {
+    "date": "date",
+    "dayweather": "day_weather",
+    "nightweather": "night_weather",
+    "daytemp": "day_temp",
+    "nighttemp": "night_temp",
+    "daywind": "wind_direction",
+    "daypower": "wind_power",
+}
+
+
+class AmapToolError(RuntimeError):
+    """高德地图工具返回错误"""
+
+
+def extract_tool_payload(result: Any) -> Optional[Any]:
+    """
+    从工具结果中提取JSON数据
+
+    Args:
+        result: 工具返回结果(字符串或已解析的对象)
+
+    Returns:
+        解析后的dict/list,无法解析时返回None
+    """
+    if isinstance(result, (dict, list)):
+        return result
+    if not isinstance(result, str) or not result:
+        return None
+
+    text = _TOOL_RESULT_PREFIX.sub("", result, count=1).strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    start = text.find("{")
+    end = text.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    try:
+        return json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+
+
+def get_tool_error(result: Any) -> Optional[str]:
+    """
+    检查工具结果是否为错误
+
+    Args:
+        result: 工具返回结果
+
+    Returns:
+        错误信息,没有错误时返回None
+    """
+    if isinstance(result, str):
+        stripped = result.strip()
+        if stripped.startswith(("MCP 操作失败", "异步操作失败", "错误：")):
+            return stripped
+
+    payload = extract_tool_payload(result)
+    if isinstance(payload, dict) and payload.get("error"):
+        return str(payload["error"])
+    return None
+
+
+def parse_pois(result: Any) -> List[Dict[str, Any]]:
+    """
+    解析POI列表
+
+    同时支持工具返回的JSON数据和Agent输出的格式化文本。
+
+    Args:
+        result: 工具结果或Agent响应
+
+    Returns:
+        POI字典列表(id/name/address/type/location/tel/rating/cost),location为"经度,纬度"字符串或None
+    """
+    payload = extract_tool_payload(result)
+    if isinstance(payload, dict) and isinstance(payload.get("pois"), list):
+        pois = []
+        for poi in payload["pois"]:
+            if not isinstance(poi, dict) or not poi.get("name"):
+                continue
+            # 评分和人均消费仅在高德Web服务格式的biz_ext中提供
+            biz_ext = poi.get("biz_ext") if isinstance(poi.get("biz_ext"), dict) else {}
+            pois.append({
+                "id": poi.get("id") or "",
+                "name": str(poi.get("name")).strip(),
+                "address": _as_text(poi.get("address")),
+                "type": _as_text(poi.get("type") or poi.get("typecode")),
+                "location": _as_text(poi.get("location")) or None,
+                "tel": _as_text(poi.get("tel")) or None,
+                "rating": _as_text(biz_ext.get("rating")) or None,
+                "cost": _as_text(biz_ext.get("cost")) or None,
+            })
+        return pois
+
+    if not isinstance(result, str):
+        return []
+
+    return [
+        {
+            "id": "",
+            "name": name.strip(),
+            "address": address.strip(),
+            "type": "",
+            "location": None,
+            "tel": None,
+            "rating": None,
+            "cost": None,
+        }
+        for name, address in _POI_MARKDOWN_PATTERN.findall(result)
+    ]
+
+
+def parse_weather_forecasts(result: Any) -> List[Dict[str, Any]]:
+    """
+    解析天气预报列表
+
+    Args:
+        result: 工具结果
+
+    Returns:
+        预报字典列表(高德原始字段: date/dayweather/nightweather/daytemp/...)
+    """
+    payload = extract_tool_payload(result)
+    if not isinstance(payload, dict):
+        return []
+
+    forecasts = payload.get("forecasts")
+    # 高德Web服务原始格式: forecasts[0].casts
+    if isinstance(forecasts, list) and forecasts and isinstance(forecasts[0], dict) and "casts" in forecasts[0]:
+        forecasts = forecasts[0]["casts"]
+    if not isinstance(forecasts, list):
+        return []
+
+    return [cast for cast in forecasts if isinstance(cast, dict) and cast.get("date")]
+
+
+def parse_weather_markdown(result: Any) -> List[Dict[str, str]]:
+    """
+    解析Agent输出的格式化天气文本(工具结果不是JSON时使用)
+
+    Args:
+        result: Agent响应
+
+    Returns:
+        [{"date": "2025年11月10日", "day": "多云 0°C 西风 1-3 级", "night": ...}],未匹配的时段为空字符串
+    """
+    if not isinstance(result, str):
+        return []
+
+    lines = result.split("\n")
+    days = []
+    for i, line in enumerate(lines):
+        date_match = _WEATHER_DATE_PATTERN.search(line)
+        if not date_match:
+            continue
+        day = {"date": date_match.group(1), "day": "", "night": ""}
+        # 日期行之后的两行分别是白天和夜间
+        for offset, period in ((1, "day"), (2, "night")):
+            if i + offset < len(lines):
+                match = _WEATHER_PERIOD_PATTERNS[period].search(lines[i + offset])
+                if match:
+                    day[period] = f"{match.group(1).strip()} {match.group(2)}°C {match.group(3).strip()}"
+        days.append(day)
+    return days
+
+
+def parse_location(value: Any) -> Optional[Tuple[float, float]]:
+    """
+    解析高德坐标
+
+    Args:
+        value: "经度,纬度"字符串
+
+    Returns:
+        (经度, 纬度),格式错误或超出范围时返回None
+    """
+    match = _LOCATION_PATTERN.match(value) if isinstance(value, str) else None
+    if match is None:
+        return None
+    longitude, latitude = float(match.group(1)), float(match.group(2))
+    if not (-180 <= longitude <= 180 and -90 <= latitude <= 90):
+        return None
+    return longitude, latitude
+
+
+def weather_fields(cast: Dict[str, Any]) -> Dict[str, Any]:
+    """将高德天气预报转换为 WeatherInfo 的字段"""
+    return {target: _as_text(cast.get(source)) for source, target in _WEATHER_FIELDS.items()}
+
+
+def parse_geocode(result: Any) -> Optional[Tuple[float, float]]:
+    """
+    解析地理编码结果中第一个匹配地址的坐标
+
+    支持MCP服务器格式(return)和高德Web服务原始格式(geocodes)。
+
+    Args:
+        result: 工具结果
+
+    Returns:
+        (经度, 纬度),没有结果时返回None
+    """
+    payload = extract_tool_payload(result)
+    if not isinstance(payload, dict):
+        return None
+
+    for key in ("return", "geocodes", "results"):
+        geocodes = payload.get(key)
+        if isinstance(geocodes, list):
+            for geocode in geocodes:
+                location = parse_location(geocode.get("location")) if isinstance(geocode, dict) else None
+                if location is not None:
+                    return location
+    return None
+
+
+def parse_route(result: Any) -> Optional[Dict[str, Any]]:
+    """
+    解析路径规划结果中的第一条方案
+
+    步行/驾车取 paths[0],公交取 transits[0];路线数据可以嵌套在 route 等字段中。
+
+    Args:
+        result: 工具结果
+
+    Returns:
+        {"distance": 米, "duration": 秒, "steps": [步骤说明]},没有方案时返回None
+    """
+    route = _find_route(extract_tool_payload(result))
+    if route is None:
+        return None
+
+    paths = route.get("paths")
+    if isinstance(paths, list) and paths and isinstance(paths[0], dict):
+        path = paths[0]
+        steps = [
+            _HTML_TAG_PATTERN.sub("", _as_text(step.get("instruction")))
+            for step in path.get("steps") or [] if isinstance(step, dict)
+        ]
+        return {
+            "distance": _as_number(path.get("distance")),
+            "duration": int(_as_number(path.get("duration"))),
+            "steps": [step for step in steps if step],
+        }
+
+    transits = route.get("transits")
+    if isinstance(transits, list) and transits and isinstance(transits[0], dict):
+        transit = transits[0]
+        steps = []
+        for segment in transit.get("segments") or []:
+            if not isinstance(segment, dict):
+                continue
+            walking = segment.get("walking") if isinstance(segment.get("walking"), dict) else {}
+            if _as_number(walking.get("distance")) > 0:
+                steps.append(f"步行{int(_as_number(walking['distance']))}米")
+            bus = segment.get("bus") if isinstance(segment.get("bus"), dict) else {}
+            for line in bus.get("buslines") or []:
+                if isinstance(line, dict) and _as_text(line.get("name")):
+                    steps.append(f"乘坐{_as_text(line['name'])}")
+                    break
+        return {
+            "distance": _as_number(transit.get("distance") or route.get("distance")),
+            "duration": int(_as_number(transit.get("duration"))),
+            "steps": steps,
+        }
+    return None
+
+
+def _find_route(payload: Any, depth: int = 0) -> Optional[Dict[str, Any]]:
+    """查找包含 paths 或 transits 的路线数据"""
+    if not isinstance(payload, dict) or depth > 3:
+        return None
+    if "paths" in payload or "transits" in payload:
+        return payload
+    for value in payload.values():
+        route = _find_route(value, depth + 1)
+        if route is not None:
+            return route
+    return None
+
+
+def _as_number(value: Any) -> float:
+    """高德数值字段为字符串,无法解析时按0处理"""
+    try:
+        return float(_as_text(value) or 0)
+    except ValueError:
+        return 0.0
+
+
+def _as_text(value: Any) -> str:
+    """高德接口对空字段会返回[],统一转换为字符串"""
+    if value is None or isinstance(value, list):
+        return ""
+    return str(value).strip()
@@ -0,0 +1,103 @@
+"""阶段检查点工具 - 重试时跳过同一请求中已完成的阶段"""
+
+import threading
+from typing import Any, Callable, Dict, Optional
+
+# 每个阶段统计的指标
+_STAGE_COUNTERS = ("runs", "failures", "retries", "resumed", "rate_limit_retries")
+
+
+class StageMetrics:
+    """
+    各阶段执行与重试统计(进程级,跨请求累计)
+
+    - runs: 实际执行次数
+    - failures: 执行失败次数
+    - retries: 同一请求中失败后重新执行的次数
+    - resumed: 重试时直接复用检查点结果的次数
+    - rate_limit_retries: 阶段内部因速率限制退避重试的次数
+    """
+
+    def __init__(self):
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, counter: str, count: int = 1):
+        """
+        累加阶段计数
+
+        Args:
+            stage: 阶段名称
+            counter: 指标名称
+            count: 增量
+        """
+        with self._lock:
+            counters = self._counters.setdefault(stage, dict.fromkeys(_STAGE_COUNTERS, 0))
+            counters[counter] += count
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """获取各阶段统计信息"""
+        with self._lock:
+            return {stage: dict(counters) for stage, counters in self._counters.items()}
+
+
+class StageCheckpoint:
+    """
+    单次规划请求内的阶段检查点
+
+    阶段成功后保存其结果,整体重试时已完成的阶段直接返回保存的结果,
+    只有失败或尚未执行的阶段会重新执行。检查点随请求结束而丢弃。
+    """
+
+    def __init__(self, metrics: Optional[StageMetrics] = None):
+        """
+        初始化检查点
+
+        Args:
+            metrics: 阶段统计(可选)
+        """
+        self._results: Dict[str, Any] = {}
+        self._failed = set()
+        self._lock = threading.Lock()
+        self._metrics = metrics
+
+    def run(self, key: str, fn: Callable[[], Any], stage: Optional[str] = None) -> Any:
+        """
+        执行阶段,已有检查点时直接返回
+
+        Args:
+            key: 检查点键(同一请求内唯一)
+            fn: 阶段执行函数
+            stage: 统计使用的阶段名称(默认与key相同)
+
+        Returns:
+            阶段结果
+        """
+        stage = stage or key
+        with self._lock:
+            if key in self._results:
+                self._record(stage, "resumed")
+                return self._results[key]
+            self._record(stage, "runs")
+            if key in self._failed:
+                self._record(stage, "retries")
+
+        try:
+            result = fn()
+        except Exception:
+            with self._lock:
+                self._failed.add(key)
+            self._record(stage, "failures")
+            raise
+
+        with self._lock:
+            self._results[key] = result
+        return result
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._results
+
+    def _record(self, stage: str, counter: str):
+        if self._metrics is not None:
+            self._metrics.record(stage, counter)
@@ -0,0 +1,216 @@
+"""自适应并发控制工具 - 按AIMD(加性增、乘性减)调整上游调用的并发上限"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from ..config import get_settings
+from .retry_handler import get_error_status
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD自适应并发限制器
+
+    - 调用成功且耗时正常: 上限加性增长(每完成约"上限"个调用增加1)
+    - 调用被限流(429/5xx)或耗时超过基线的指定倍数: 上限乘性下降
+    - 同一轮拥塞只下降一次: 两次下降之间至少间隔一个基线耗时
+
+    超出上限的调用排队等待,当前上限、进行中调用数和排队数可通过 stats() 查看。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        backoff: float = 0.5,
+        latency_factor: float = 0.0
+    ):
+        """
+        初始化限制器
+
+        Args:
+            name: 名称(用于统计信息)
+            initial_limit: 初始并发上限
+            min_limit: 并发上限的下限
+            max_limit: 并发上限的上限
+            backoff: 拥塞时上限的乘数
+            latency_factor: 耗时超过基线的多少倍视为拥塞(0表示只按错误判断)
+        """
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_factor = latency_factor
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._in_flight = 0
+        self._waiting = 0
+        self._baseline: Optional[float] = None
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+        self.increases = 0
+        self.decreases = 0
+        self.total_wait = 0.0
+
+    @property
+    def limit(self) -> int:
+        """当前并发上限"""
+        return int(self._limit)
+
+    def acquire(self) -> float:
+        """
+        占用一个并发名额,超出上限时排队
+
+        Returns:
+            排队等待的秒数
+        """
+        start = time.monotonic()
+        with self._condition:
+            self._waiting += 1
+            try:
+                while self._in_flight >= int(self._limit):
+                    self._condition.wait()
+            finally:
+                self._waiting -= 1
+            self._in_flight += 1
+            waited = time.monotonic() - start
+            self.total_wait += waited
+            return waited
+
+    def release(self, latency: float, overloaded: bool = False):
+        """
+        释放名额并根据本次调用结果调整上限
+
+        Args:
+            latency: 本次调用耗时（秒）
+            overloaded: 上游是否返回了限流/过载错误
+        """
+        now = time.monotonic()
+        with self._condition:
+            self._in_flight -= 1
+
+            spike = (
+                self.latency_factor > 0
+                and self._baseline is not None
+                and latency > self._baseline * self.latency_factor
+            )
+            if overloaded or spike:
+                if now - self._last_decrease >= (self._baseline or 0):
+                    self._limit = max(self.min_limit, self._limit * self.backoff)
+                    self._last_decrease = now
+                    self.decreases += 1
+            else:
+                # 基线取正常调用耗时的指数移动平均
+                self._baseline = latency if self._baseline is None else self._baseline * 0.9 + latency * 0.1
+                if self._limit < self.max_limit:
+                    previous = int(self._limit)
+                    self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+                    if int(self._limit) > previous:
+                        self.increases += 1
+
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self) -> Iterator["_SlotResult"]:
+        """
+        占用名额的上下文管理器
+
+        调用方可以通过 result.overloaded = True 标记上游过载;抛出异常时由 is_overload 判断。
+        """
+        result = _SlotResult()
+        self.acquire()
+        start = time.monotonic()
+        try:
+            yield result
+        except Exception as e:
+            result.overloaded = result.overloaded or result.is_overload(e)
+            raise
+        finally:
+            self.release(time.monotonic() - start, result.overloaded)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取并发控制统计信息"""
+        with self._condition:
+            return {
+                "name": self.name,
+                "limit": int(self._limit),
+                "in_flight": self._in_flight,
+                "queue_depth": self._waiting,
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "baseline_latency": round(self._baseline, 3) if self._baseline is not None else None,
+                "increases": self.increases,
+                "decreases": self.decreases,
+                "total_wait": round(self.total_wait, 3),
+            }
+
+
+class _SlotResult:
+    """单次调用的结果标记"""
+
+    def __init__(self):
+        self.overloaded = False
+
+    @staticmethod
+    def is_overload(error: BaseException) -> bool:
+        """异常是否表示上游过载(429、5xx)"""
+        status = get_error_status(error)
+        if status is not None:
+            return status == 429 or status >= 500
+        message = str(error).lower()
+        return "rate limit" in message or "too many requests" in message
+
+
+# 全局并发限制器实例(按上游名称)
+_concurrency_limiters: Dict[str, AdaptiveConcurrencyLimiter] = {}
+_concurrency_limiters_lock = threading.Lock()
+
+
+def get_concurrency_limiter(upstream: str) -> AdaptiveConcurrencyLimiter:
+    """
+    获取上游服务的自适应并发限制器(单例模式)
+
+    Args:
+        upstream: 上游名称,"llm" 或 "amap"
+
+    Returns:
+        限制器实例
+    """
+    limiter = _concurrency_limiters.get(upstream)
+    if limiter is not None:
+        return limiter
+
+    with _concurrency_limiters_lock:
+        if upstream not in _concurrency_limiters:
+            settings = get_settings()
+            if upstream == "llm":
+                # LLM调用耗时随输出长度变化很大,只按429/5xx调整
+                max_limit = settings.perf_llm_max_concurrency
+                latency_factor = 0.0
+            elif upstream == "amap":
+                max_limit = settings.perf_amap_max_concurrency
+                latency_factor = settings.perf_concurrency_latency_factor
+            else:
+                raise ValueError(f"未知的上游服务: {upstream}")
+            _concurrency_limiters[upstream] = AdaptiveConcurrencyLimiter(
+                upstream,
+                initial_limit=max(1, max_limit // 4),
+                max_limit=max_limit,
+                latency_factor=latency_factor
+            )
+        return _concurrency_limiters[upstream]
+
+
+def get_concurrency_stats() -> Dict[str, Any]:
+    """获取所有并发限制器的统计信息"""
+    return {name: limiter.stats() for name, limiter in _concurrency_limiters.items()}
+
+
+def reset_concurrency_limiters():
+    """重置所有并发限制器(用于测试或重新配置)"""
+    with _concurrency_limiters_lock:
+        _concurrency_limiters.clear()
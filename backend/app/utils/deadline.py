@@ -0,0 +1,132 @@
+"""截止时间工具 - 为规划阶段设置超时并在到期后放弃等待"""
+
+import time
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional
+
+# 超时后仍在运行(无法取消)的任务统计(按阶段)
+_abandoned: Dict[str, Dict[str, int]] = {}
+_abandoned_lock = threading.Lock()
+
+
+class StageTimeoutError(TimeoutError):
+    """阶段执行超过截止时间"""
+
+    def __init__(self, stage: str, timeout: float):
+        super().__init__(f"{stage} 阶段超时（{timeout:.0f}秒）")
+        self.stage = stage
+        self.timeout = timeout
+
+
+class Deadline:
+    """
+    截止时间
+
+    同一截止时间可以在多个阶段/窗口之间共享,各自只等待剩余的时间。
+    """
+
+    def __init__(self, seconds: float):
+        """
+        初始化截止时间
+
+        Args:
+            seconds: 距离截止的秒数(小于等于0表示不限时)
+        """
+        self.seconds = seconds
+        self._expires_at = time.monotonic() + seconds if seconds > 0 else None
+
+    def remaining(self) -> Optional[float]:
+        """剩余秒数(不限时返回None,已到期返回0)"""
+        if self._expires_at is None:
+            return None
+        return max(0.0, self._expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        """是否已到期"""
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+
+def wait_for(future: Future, deadline: Deadline, stage: str) -> Any:
+    """
+    在截止时间内等待Future结果,到期后取消并抛出StageTimeoutError
+
+    注意: 已经开始执行的线程无法被强制终止,取消只会让调用方停止等待;
+    这类任务会继续占用线程池中的线程,计入 get_abandoned_stats 的统计。
+
+    Args:
+        future: 待等待的Future
+        deadline: 截止时间
+        stage: 阶段名称(用于错误信息)
+
+    Returns:
+        Future的结果
+    """
+    try:
+        return future.result(timeout=deadline.remaining())
+    except FutureTimeoutError:
+        if not future.cancel():
+            _record_abandoned(future, stage)
+        raise StageTimeoutError(stage, deadline.seconds) from None
+
+
+def _record_abandoned(future: Future, stage: str):
+    """记录超时后仍在运行的任务,任务结束时从运行中数量扣除"""
+    with _abandoned_lock:
+        stats = _abandoned.setdefault(stage, {"abandoned": 0, "running": 0})
+        stats["abandoned"] += 1
+        stats["running"] += 1
+        running = stats["running"]
+    print(f"⚠️  {stage} 阶段超时后仍在运行，继续占用线程（当前 {running} 个）")
+
+    def release(_):
+        with _abandoned_lock:
+            stats["running"] -= 1
+
+    future.add_done_callback(release)
+
+
+def get_abandoned_stats() -> Dict[str, Dict[str, int]]:
+    """
+    获取超时后仍在运行的任务统计
+
+    Returns:
+        {阶段: {"abandoned": 累计次数, "running": 仍在占用线程的数量}}
+    """
+    with _abandoned_lock:
+        return {stage: dict(stats) for stage, stats in _abandoned.items()}
+
+
+def call_with_deadline(
+    fn: Callable[[], Any],
+    deadline: Deadline,
+    stage: str,
+    executor: Optional[Executor] = None
+) -> Any:
+    """
+    在独立线程中执行函数并受截止时间约束
+
+    Args:
+        fn: 无参函数
+        deadline: 截止时间
+        stage: 阶段名称
+        executor: 执行函数的线程池(默认为本次调用创建一个单线程线程池)
+
+    Returns:
+        函数返回值
+    """
+    if deadline.remaining() is None:
+        return fn()
+    if deadline.expired:
+        raise StageTimeoutError(stage, deadline.seconds)
+
+    if executor is not None:
+        return wait_for(executor.submit(fn), deadline, stage)
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"deadline-{stage}")
+    try:
+        return wait_for(executor.submit(fn), deadline, stage)
+    finally:
+        executor.shutdown(wait=False)
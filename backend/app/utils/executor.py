@@ -0,0 +1,140 @@
+"""阻塞任务执行工具 - 在有界线程池中运行同步代码,避免阻塞事件循环"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Any, Dict, Optional
+
+from ..config import get_settings
+
+# 全局阻塞任务线程池
+_blocking_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# 鉴权和数据库读写线程池(与地图查询等阻塞任务分开,避免被长耗时任务占满)
+_db_executor: Optional[ThreadPoolExecutor] = None
+
+# 规划内部使用的共享线程池(按名称)
+_shared_executors: Dict[str, ThreadPoolExecutor] = {}
+
+
+def get_blocking_executor() -> ThreadPoolExecutor:
+    """
+    获取阻塞任务线程池(单例模式)
+
+    用于地图查询、规划系统初始化等阻塞调用(规划任务由规划调度器执行,
+    鉴权和数据库读写使用 get_db_executor),线程池大小由 perf_max_concurrent_plans 控制。
+    """
+    global _blocking_executor
+
+    if _blocking_executor is None:
+        with _executor_lock:
+            if _blocking_executor is None:
+                settings = get_settings()
+                _blocking_executor = ThreadPoolExecutor(
+                    max_workers=settings.perf_max_concurrent_plans,
+                    thread_name_prefix="trip-planner"
+                )
+
+    return _blocking_executor
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """
+    在有界线程池中执行同步函数并等待结果
+
+    Args:
+        func: 同步函数
+        *args: 位置参数
+        **kwargs: 关键字参数
+
+    Returns:
+        函数返回值
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_blocking_executor(),
+        functools.partial(func, *args, **kwargs)
+    )
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """
+    获取鉴权和数据库读写线程池(单例模式)
+
+    线程池大小由 perf_db_workers 控制。
+    """
+    global _db_executor
+
+    if _db_executor is None:
+        with _executor_lock:
+            if _db_executor is None:
+                _db_executor = ThreadPoolExecutor(
+                    max_workers=max(1, get_settings().perf_db_workers),
+                    thread_name_prefix="trip-db"
+                )
+
+    return _db_executor
+
+
+async def run_db(func: Callable, *args, **kwargs) -> Any:
+    """
+    在鉴权和数据库线程池中执行同步函数并等待结果
+
+    Args:
+        func: 同步函数(鉴权、数据库读写)
+        *args: 位置参数
+        **kwargs: 关键字参数
+
+    Returns:
+        函数返回值
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_db_executor(),
+        functools.partial(func, *args, **kwargs)
+    )
+
+
+def get_shared_executor(name: str, max_workers: int) -> ThreadPoolExecutor:
+    """
+    获取进程内共享的有界线程池(按名称单例)
+
+    规划内部的并行步骤使用共享线程池,不再为每次规划创建新的线程池。
+    提交到某个线程池的任务不能再向同一线程池提交并等待子任务,否则线程池占满时会死锁。
+
+    Args:
+        name: 线程池名称
+        max_workers: 最大线程数(仅首次创建时生效)
+
+    Returns:
+        线程池实例
+    """
+    executor = _shared_executors.get(name)
+    if executor is not None:
+        return executor
+
+    with _executor_lock:
+        if name not in _shared_executors:
+            _shared_executors[name] = ThreadPoolExecutor(
+                max_workers=max(1, max_workers),
+                thread_name_prefix=f"trip-{name}"
+            )
+        return _shared_executors[name]
+
+
+def shutdown_blocking_executor():
+    """关闭阻塞任务线程池、鉴权和数据库线程池以及共享线程池(应用关闭时调用)"""
+    global _blocking_executor, _db_executor
+
+    with _executor_lock:
+        if _blocking_executor is not None:
+            _blocking_executor.shutdown(wait=False, cancel_futures=True)
+            _blocking_executor = None
+        if _db_executor is not None:
+            _db_executor.shutdown(wait=False, cancel_futures=True)
+            _db_executor = None
+        for executor in _shared_executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _shared_executors.clear()
@@ -0,0 +1,217 @@
+"""JSON容错解析工具 - 修复LLM输出中常见的格式问题并尽量保留已完成的内容"""
+
+import json
+from typing import Any, List, Optional, Tuple
+
+# 单次修复时最多尝试的截断位置数
+_MAX_CUT_ATTEMPTS = 200
+
+_CLOSERS = {"{": "}", "[": "]"}
+_LITERALS = {"true": "true", "false": "false", "null": "null", "True": "true", "False": "false", "None": "null"}
+_QUOTE_PAIRS = {'"': '"', "'": "'", "“": "”"}
+# 字符串结束后允许出现的字符(双引号后面不是这些字符时视为字符串内未转义的引号)
+_STRING_FOLLOWERS = ",:}]"
+
+
+def extract_json_text(text: str) -> Optional[str]:
+    """
+    从响应文本中提取第一个JSON对象
+
+    优先从 ```json 代码块之后开始查找,通过括号配对(忽略字符串内的括号)确定结束位置;
+    对象未闭合(输出被截断)时返回从起点到文本末尾的内容。
+
+    Args:
+        text: LLM响应文本
+
+    Returns:
+        JSON对象文本,未找到 "{" 时返回None
+    """
+    if not text:
+        return None
+
+    fence = text.find("```json")
+    start = text.find("{", fence + 7 if fence != -1 else 0)
+    if start == -1:
+        start = text.find("{")
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    escape = False
+    for pos in range(start, len(text)):
+        ch = text[pos]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:pos + 1]
+    return text[start:]
+
+
+def _normalize(text: str) -> Tuple[List[str], List[Tuple[int, List[str]]], List[str], bool]:
+    """
+    逐字符规范化JSON文本
+
+    去除注释和尾随逗号,统一引号,转义字符串中的换行和未转义的双引号,为未加引号的键补引号,
+    并记录每个逗号处的位置和括号栈(作为截断修复的候选位置)。
+
+    Returns:
+        (输出片段列表, 截断候选[(位置, 括号栈)], 结束时的括号栈, 结束时是否仍在字符串中)
+    """
+    out: List[str] = []
+    cuts: List[Tuple[int, List[str]]] = []
+    stack: List[str] = []
+    closing_quote: Optional[str] = None
+    i = 0
+    n = len(text)
+
+    while i < n:
+        ch = text[i]
+
+        if closing_quote is not None:
+            if ch == "\\" and i + 1 < n:
+                out.append(text[i:i + 2])
+                i += 2
+                continue
+            if ch == '"' and closing_quote == '"' and not _ends_string(text, i + 1):
+                # 如 "称为"紫禁城"的宫殿": 引号后面不是逗号、冒号或括号,属于字符串内容
+                out.append('\\"')
+            elif ch == closing_quote or (closing_quote == "”" and ch == "“"):
+                out.append('"')
+                closing_quote = None
+            elif ch == '"':
+                out.append('\\"')
+            elif ch == "\n":
+                out.append("\\n")
+            elif ch == "\t":
+                out.append("\\t")
+            elif ch != "\r":
+                out.append(ch)
+            i += 1
+            continue
+
+        if ch in _QUOTE_PAIRS:
+            closing_quote = _QUOTE_PAIRS[ch]
+            out.append('"')
+        elif ch == "/" and text.startswith("//", i):
+            end = text.find("\n", i)
+            i = n if end == -1 else end
+            continue
+        elif ch == "/" and text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+            continue
+        elif ch in "{[":
+            stack.append(ch)
+            out.append(ch)
+        elif ch in "}]":
+            _strip_trailing(out, ",")
+            if stack:
+                out.append(_CLOSERS[stack.pop()])
+        elif ch == ",":
+            _strip_trailing(out, ",")
+            cuts.append((len(out), list(stack)))
+            out.append(ch)
+        elif ch.isalpha() or ch == "_":
+            end = i
+            while end < n and (text[end].isalnum() or text[end] == "_"):
+                end += 1
+            word = text[i:end]
+            rest = text[end:end + 20].lstrip()
+            if stack and stack[-1] == "{" and rest.startswith(":"):
+                out.append(f'"{word}"')
+            else:
+                out.append(_LITERALS.get(word, word))
+            i = end
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    return out, cuts, stack, closing_quote is not None
+
+
+def _ends_string(text: str, pos: int) -> bool:
+    """双引号之后的下一个非空白字符是否表示字符串已结束(或文本已结束)"""
+    while pos < len(text) and text[pos].isspace():
+        pos += 1
+    return pos >= len(text) or text[pos] in _STRING_FOLLOWERS
+
+
+def _strip_trailing(out: List[str], chars: str):
+    """去除输出末尾的空白和指定字符"""
+    while out and (out[-1].isspace() or out[-1] in chars):
+        out.pop()
+
+
+def _close(out: List[str], stack: List[str]) -> str:
+    """去除末尾的不完整片段并按括号栈补全闭合符号"""
+    out = list(out)
+    _strip_trailing(out, ",:")
+    # 以键结尾(值缺失)时去掉该键
+    if out and stack and stack[-1] == "{" and out[-1].endswith('"'):
+        text = "".join(out)
+        key_start = text.rfind('"', 0, len(text) - 1)
+        prefix = text[:key_start].rstrip()
+        if prefix.endswith(("{", ",")):
+            out = [prefix.rstrip(",")]
+    return "".join(out) + "".join(_CLOSERS[ch] for ch in reversed(stack))
+
+
+def repair_json(text: str) -> Optional[Any]:
+    """
+    修复并解析不规范或被截断的JSON
+
+    依次尝试: 规范化后补全闭合符号; 回退到最近的逗号位置(丢弃末尾不完整的元素)后补全。
+
+    Args:
+        text: JSON文本
+
+    Returns:
+        解析结果,无法修复时返回None
+    """
+    out, cuts, stack, in_string = _normalize(text)
+    if in_string:
+        out.append('"')
+
+    try:
+        return json.loads(_close(out, stack))
+    except ValueError:
+        pass
+
+    for position, cut_stack in reversed(cuts[-_MAX_CUT_ATTEMPTS:]):
+        try:
+            return json.loads(_close(out[:position], cut_stack))
+        except ValueError:
+            continue
+    return None
+
+
+def loads_tolerant(text: str) -> Optional[Any]:
+    """
+    从LLM响应中容错解析JSON对象
+
+    Args:
+        text: LLM响应文本
+
+    Returns:
+        解析结果,无法解析时返回None
+    """
+    json_text = extract_json_text(text)
+    if json_text is None:
+        return None
+    try:
+        return json.loads(json_text)
+    except ValueError:
+        return repair_json(json_text)
@@ -0,0 +1,113 @@
+"""增量JSON解析工具 - 在LLM流式输出过程中提取已完成的数组元素"""
+
+import json
+from typing import Any, List, Optional
+
+
+class IncrementalArrayParser:
+    """
+    增量数组元素解析器
+
+    持续接收流式文本片段,跟踪JSON的字符串/括号状态,
+    每当指定键(如 "days")对应数组中的一个对象闭合时,立即解析并返回该对象。
+    代码块标记等JSON之外的文本会被忽略。
+    """
+
+    def __init__(self, key: str):
+        """
+        初始化解析器
+
+        Args:
+            key: 目标数组对应的键名
+        """
+        self.key = key
+        self._buffer = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._pending_key: Optional[str] = None
+        self._array_depth: Optional[int] = None
+        self._item_start: Optional[int] = None
+        self._finished = False
+        self.errors = 0
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        输入新的文本片段
+
+        Args:
+            chunk: 流式输出的文本片段
+
+        Returns:
+            本次新完成的数组元素列表
+        """
+        self._buffer += chunk
+        items = []
+
+        while self._pos < len(self._buffer):
+            ch = self._buffer[self._pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = self._buffer[self._string_start + 1:self._pos]
+            elif ch == '"':
+                self._in_string = True
+                self._string_start = self._pos
+            elif ch == ":":
+                if self._stack and self._stack[-1] == "{":
+                    self._pending_key = self._last_string
+            elif ch == ",":
+                self._pending_key = None
+            elif ch in "{[":
+                if (
+                    ch == "["
+                    and not self._finished
+                    and self._array_depth is None
+                    and self._pending_key == self.key
+                ):
+                    self._array_depth = len(self._stack) + 1
+                self._stack.append(ch)
+                if (
+                    ch == "{"
+                    and self._array_depth is not None
+                    and len(self._stack) == self._array_depth + 1
+                ):
+                    self._item_start = self._pos
+                self._pending_key = None
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if self._array_depth is not None:
+                    if ch == "}" and self._item_start is not None and len(self._stack) == self._array_depth:
+                        item = self._parse_item(self._buffer[self._item_start:self._pos + 1])
+                        if item is not None:
+                            items.append(item)
+                        self._item_start = None
+                    elif ch == "]" and len(self._stack) == self._array_depth - 1:
+                        self._array_depth = None
+                        self._finished = True
+
+            self._pos += 1
+
+        return items
+
+    def _parse_item(self, text: str) -> Optional[Any]:
+        """解析单个数组元素,失败时计数并返回None"""
+        try:
+            return json.loads(text)
+        except ValueError:
+            self.errors += 1
+            return None
+
+    @property
+    def text(self) -> str:
+        """已接收的完整文本"""
+        return self._buffer
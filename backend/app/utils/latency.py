@@ -0,0 +1,71 @@
+"""耗时统计工具 - 滑动窗口耗时百分位和按工具汇总的调用统计"""
+
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+
+class LatencyWindow:
+    """最近若干次调用耗时的滑动窗口"""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        """记录一次耗时"""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        计算耗时百分位
+
+        Args:
+            p: 百分位(0-100)
+
+        Returns:
+            耗时(秒),没有样本时返回None
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, int(round(p / 100 * len(samples))) - 1))
+        return samples[index]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+
+class ToolLatencyStats:
+    """单个工具的调用统计(调用次数、错误数和耗时分布)"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.window = LatencyWindow()
+
+    def record(self, seconds: float, error: bool = False):
+        """记录一次调用"""
+        self.calls += 1
+        self.errors += int(error)
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.window.add(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        p50 = self.window.percentile(50)
+        p95 = self.window.percentile(95)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg": round(self.total / self.calls, 3) if self.calls else 0.0,
+            "p50": round(p50, 3) if p50 is not None else None,
+            "p95": round(p95, 3) if p95 is not None else None,
+            "max": round(self.max, 3),
+        }
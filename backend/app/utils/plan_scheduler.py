@@ -0,0 +1,279 @@
+"""规划任务调度工具 - 固定工作线程 + 有界优先级队列,队列满时快速拒绝"""
+
+import math
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from ..config import get_settings
+
+# 优先级(数值越小越先执行)
+PRIORITY_USER = 0  # 已登录用户
+PRIORITY_ANONYMOUS = 1  # 匿名用户
+
+_LANE_NAMES = {PRIORITY_USER: "user", PRIORITY_ANONYMOUS: "anonymous"}
+
+# 还没有完成过任务时,估算排队时间使用的单个任务耗时（秒）
+_DEFAULT_JOB_SECONDS = 30.0
+
+
+class SchedulerFullError(Exception):
+    """规划队列已满"""
+
+    def __init__(self, lane: str, retry_after: int):
+        super().__init__(f"规划队列已满（{lane}），请{retry_after}秒后重试")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class PlanJob:
+    """已提交的规划任务"""
+
+    def __init__(self, fn: Callable[[], Any], priority: int):
+        self.fn = fn
+        self.priority = priority
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+
+    @property
+    def started(self) -> bool:
+        """是否已开始执行"""
+        return self.started_at is not None
+
+
+class PlanScheduler:
+    """
+    规划任务调度器
+
+    - 固定数量的工作线程执行规划任务,不再为每个请求创建线程
+    - 每个优先级一个有界队列,工作线程总是先取高优先级队列中的任务
+    - 队列满时提交立即失败(SchedulerFullError),附带按平均耗时估算的重试等待时间
+    """
+
+    def __init__(self, workers: int = 16, queue_size: int = 32, name: str = "plan-scheduler"):
+        """
+        初始化调度器
+
+        Args:
+            workers: 工作线程数
+            queue_size: 每个优先级队列的排队上限
+            name: 名称(用于线程名)
+        """
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self._lanes: Dict[int, Deque[PlanJob]] = {priority: deque() for priority in sorted(_LANE_NAMES)}
+        self._condition = threading.Condition()
+        self._running = 0
+        self._shutdown = False
+        self._avg_run: Optional[float] = None
+
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.total_wait = 0.0
+
+        self._threads: List[threading.Thread] = []
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"{name}-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn: Callable, *args, priority: int = PRIORITY_ANONYMOUS, **kwargs) -> PlanJob:
+        """
+        提交规划任务
+
+        Args:
+            fn: 任务函数
+            *args: 位置参数
+            priority: 优先级(PRIORITY_USER / PRIORITY_ANONYMOUS)
+            **kwargs: 关键字参数
+
+        Returns:
+            任务对象,通过 job.future 获取结果
+
+        Raises:
+            SchedulerFullError: 对应优先级的队列已满
+        """
+        if priority not in self._lanes:
+            raise ValueError(f"未知的优先级: {priority}")
+
+        job = PlanJob(lambda: fn(*args, **kwargs), priority)
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("规划调度器已关闭")
+            lane = self._lanes[priority]
+            if len(lane) >= self.queue_size and self._running >= self.workers:
+                self.rejected += 1
+                raise SchedulerFullError(
+                    _LANE_NAMES[priority], self._estimate_wait(self._queued_ahead(priority) + len(lane))
+                )
+            lane.append(job)
+            self.submitted += 1
+            self._condition.notify()
+        return job
+
+    def position(self, job: PlanJob) -> Optional[int]:
+        """
+        任务在队列中的位置
+
+        Returns:
+            排在它前面的任务数(0表示下一个执行),已开始或已结束时返回None
+        """
+        with self._condition:
+            if job.started or job.future.done():
+                return None
+            lane = self._lanes[job.priority]
+            try:
+                index = lane.index(job)
+            except ValueError:
+                return None
+            return self._queued_ahead(job.priority) + index
+
+    def estimate_wait(self, position: int) -> int:
+        """估算排在指定位置的任务需要等待的秒数"""
+        with self._condition:
+            return self._estimate_wait(position)
+
+    def cancel(self, job: PlanJob) -> bool:
+        """
+        取消尚未开始执行的任务
+
+        Returns:
+            是否取消成功(已开始执行的任务无法取消)
+        """
+        with self._condition:
+            lane = self._lanes[job.priority]
+            if job.started or job not in lane:
+                return False
+            lane.remove(job)
+            self.cancelled += 1
+        return job.future.cancel()
+
+    def shutdown(self):
+        """关闭调度器,取消所有排队中的任务"""
+        with self._condition:
+            self._shutdown = True
+            pending = [job for lane in self._lanes.values() for job in lane]
+            for lane in self._lanes.values():
+                lane.clear()
+            self._condition.notify_all()
+        for job in pending:
+            job.future.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取调度统计信息"""
+        with self._condition:
+            started = self.completed + self.failed
+            return {
+                "workers": self.workers,
+                "running": self._running,
+                "queue_size": self.queue_size,
+                "queued": {_LANE_NAMES[priority]: len(lane) for priority, lane in self._lanes.items()},
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "avg_wait": round(self.total_wait / started, 3) if started else 0.0,
+                "avg_run": round(self._avg_run, 3) if self._avg_run is not None else None,
+            }
+
+    def _queued_ahead(self, priority: int) -> int:
+        """更高优先级队列中的任务数(需持有锁)"""
+        return sum(len(lane) for p, lane in self._lanes.items() if p < priority)
+
+    def _estimate_wait(self, position: int) -> int:
+        """按平均执行耗时估算等待秒数(需持有锁)"""
+        avg_run = self._avg_run if self._avg_run is not None else _DEFAULT_JOB_SECONDS
+        return max(1, math.ceil(avg_run * (position // self.workers + 1)))
+
+    def _next_job(self) -> Optional[PlanJob]:
+        """取出下一个任务,没有任务时阻塞;调度器关闭时返回None"""
+        with self._condition:
+            while True:
+                if self._shutdown:
+                    return None
+                for lane in self._lanes.values():
+                    if lane:
+                        job = lane.popleft()
+                        job.started_at = time.monotonic()
+                        self._running += 1
+                        self.total_wait += job.started_at - job.enqueued_at
+                        return job
+                self._condition.wait()
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+
+            # 排队期间直接通过 future.cancel() 取消的任务
+            if not job.future.set_running_or_notify_cancel():
+                with self._condition:
+                    self._running -= 1
+                    self.cancelled += 1
+                continue
+
+            failed = False
+            try:
+                job.future.set_result(job.fn())
+            except BaseException as e:
+                failed = True
+                job.future.set_exception(e)
+            finally:
+                elapsed = time.monotonic() - job.started_at
+                with self._condition:
+                    self._running -= 1
+                    if failed:
+                        self.failed += 1
+                    else:
+                        self.completed += 1
+                    # 平均耗时取指数移动平均,用于估算排队时间
+                    self._avg_run = elapsed if self._avg_run is None else self._avg_run * 0.8 + elapsed * 0.2
+
+
+# 全局规划调度器实例
+_plan_scheduler: Optional[PlanScheduler] = None
+_plan_scheduler_lock = threading.Lock()
+
+
+def get_plan_scheduler() -> PlanScheduler:
+    """
+    获取规划任务调度器(单例模式)
+
+    工作线程数由 perf_max_concurrent_plans 控制,每个优先级的排队上限由 perf_plan_queue_size 控制。
+    """
+    global _plan_scheduler
+
+    if _plan_scheduler is None:
+        with _plan_scheduler_lock:
+            if _plan_scheduler is None:
+                settings = get_settings()
+                _plan_scheduler = PlanScheduler(
+                    workers=settings.perf_max_concurrent_plans,
+                    queue_size=settings.perf_plan_queue_size
+                )
+    return _plan_scheduler
+
+
+def get_plan_scheduler_stats() -> Dict[str, Any]:
+    """获取规划调度统计信息(调度器未创建时返回空字典)"""
+    if _plan_scheduler is None:
+        return {}
+    return _plan_scheduler.stats()
+
+
+def shutdown_plan_scheduler():
+    """关闭规划调度器(应用关闭时调用)"""
+    global _plan_scheduler
+
+    with _plan_scheduler_lock:
+        if _plan_scheduler is not None:
+            _plan_scheduler.shutdown()
+            _plan_scheduler = None
@@ -0,0 +1,171 @@
+"""提示词压缩工具 - 将阶段输出整理为紧凑摘要并控制token预算"""
+
+import re
+from typing import Any, Dict, List, Tuple
+
+from .amap_parser import parse_pois, parse_weather_forecasts, extract_tool_payload
+from .token_counter import estimate_tokens
+
+# 各部分预算占比(未用完的预算会分给其他部分)
+_SECTION_SHARES = (("attractions", 0.5), ("hotels", 0.3), ("weather", 0.2))
+
+# 文本清理模式
+_TOOL_RESULT_PREFIX = re.compile(r"^\s*工具\s*'[^']*'\s*执行结果[:：]\s*", re.MULTILINE)
+_MARKDOWN_NOISE = re.compile(r"\*\*|__|`+|^#+\s*|^>\s*", re.MULTILINE)
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+_INLINE_SPACES = re.compile(r"[ \t]+")
+
+POI_DIGEST_HEADER = "格式: 名称 | 地址 | 坐标(经度,纬度) | 类别 | 参考价格"
+
+
+def compact_pois(text: str) -> List[str]:
+    """
+    将POI结果压缩为摘要行(按信息完整度排序)
+
+    Args:
+        text: 景点或酒店阶段的输出
+
+    Returns:
+        摘要行列表,无法解析时返回空列表
+    """
+    pois = parse_pois(text)
+    if not pois:
+        return []
+
+    def completeness(poi: Dict[str, Any]) -> Tuple[int, float]:
+        filled = sum(1 for field in ("address", "location", "type", "cost") if poi.get(field))
+        try:
+            rating = float(poi.get("rating") or 0)
+        except ValueError:
+            rating = 0.0
+        return filled, rating
+
+    ranked = sorted(pois, key=completeness, reverse=True)
+    lines = []
+    for poi in ranked:
+        fields = [
+            poi["name"],
+            poi.get("address") or "",
+            poi.get("location") or "",
+            poi.get("type") or "",
+            f"{poi['cost']}元" if poi.get("cost") else "",
+        ]
+        while fields and not fields[-1]:
+            fields.pop()
+        lines.append(" | ".join(fields))
+    return lines
+
+
+def compact_weather(text: str) -> List[str]:
+    """
+    将天气结果压缩为每天一行
+
+    Args:
+        text: 天气阶段的输出
+
+    Returns:
+        摘要行列表,无法解析时返回空列表
+    """
+    lines = []
+    for cast in parse_weather_forecasts(text):
+        lines.append(
+            f"{cast.get('date')} 白天{cast.get('dayweather', '')}{cast.get('daytemp', '')}°C "
+            f"夜间{cast.get('nightweather', '')}{cast.get('nighttemp', '')}°C "
+            f"{cast.get('daywind', '')}风{cast.get('daypower', '')}级"
+        )
+    return lines
+
+
+def clean_text(text: str) -> List[str]:
+    """去除工具结果前缀和Markdown格式符号,按行返回"""
+    if not text:
+        return []
+    if isinstance(extract_tool_payload(text), dict) and text.lstrip().startswith("{"):
+        return [text.strip()]
+    text = _TOOL_RESULT_PREFIX.sub("", text)
+    text = _MARKDOWN_NOISE.sub("", text)
+    text = _INLINE_SPACES.sub(" ", text)
+    text = _BLANK_LINES.sub("\n", text)
+    return [line.strip() for line in text.split("\n") if line.strip()]
+
+
+def _count_tokens(lines: List[str]) -> int:
+    """估算多行文本的token数(含换行)"""
+    return sum(estimate_tokens(line) + 1 for line in lines)
+
+
+def _truncate_lines(lines: List[str], budget: int) -> List[str]:
+    """按顺序保留不超过预算的行"""
+    kept = []
+    used = 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    return kept
+
+
+def compact_stage_outputs(
+    attractions: str,
+    weather: str,
+    hotels: str,
+    token_budget: int
+) -> Tuple[Dict[str, str], Dict[str, int]]:
+    """
+    压缩景点、天气、酒店阶段的输出并限制总token数
+
+    能解析的结果转换为结构化摘要行,否则清理格式后保留原文;
+    各部分按占比分配预算,超出部分按排序截断。
+
+    Args:
+        attractions: 景点阶段输出
+        weather: 天气阶段输出
+        hotels: 酒店阶段输出
+        token_budget: 三部分合计的token预算
+
+    Returns:
+        (压缩后的各部分文本, token统计 {"before": ..., "after": ...})
+    """
+    raw = {"attractions": attractions or "", "weather": weather or "", "hotels": hotels or ""}
+
+    sections: Dict[str, List[str]] = {}
+    headers: Dict[str, str] = {}
+    for name in ("attractions", "hotels"):
+        lines = compact_pois(raw[name])
+        cleaned = clean_text(raw[name])
+        # 结果很少时摘要表头反而更长,保留清理后的原文
+        if lines and _count_tokens([POI_DIGEST_HEADER] + lines) < _count_tokens(cleaned):
+            headers[name] = POI_DIGEST_HEADER
+            sections[name] = lines
+        else:
+            sections[name] = cleaned
+    sections["weather"] = compact_weather(raw["weather"]) or clean_text(raw["weather"])
+
+    # 按占比分配预算,未用完的部分依次分给其他部分
+    needs = {
+        name: _count_tokens(lines) + estimate_tokens(headers.get(name, ""))
+        for name, lines in sections.items()
+    }
+    budgets = {name: min(needs[name], int(token_budget * share)) for name, share in _SECTION_SHARES}
+    leftover = token_budget - sum(budgets.values())
+    for name, _ in _SECTION_SHARES:
+        extra = min(leftover, needs[name] - budgets[name])
+        budgets[name] += extra
+        leftover -= extra
+
+    compacted = {}
+    for name, lines in sections.items():
+        header = headers.get(name)
+        budget = budgets[name] - (estimate_tokens(header) if header else 0)
+        kept = _truncate_lines(lines, budget)
+        if header and kept:
+            kept = [header] + kept
+        compacted[name] = "\n".join(kept)
+
+    stats = {
+        "before": sum(estimate_tokens(text) for text in raw.values()),
+        "after": sum(estimate_tokens(text) for text in compacted.values()),
+    }
+    return compacted, stats
@@ -0,0 +1,226 @@
+"""客户端限流工具 - 令牌桶限速,在达到上游配额之前主动排队"""
+
+import time
+import threading
+from typing import Any, Dict, Optional
+
+from ..config import get_settings
+
+
+class TokenBucket:
+    """
+    令牌桶
+
+    按固定速率补充令牌,容量决定允许的突发量。申请的令牌不足时预约未来的令牌并等待,
+    因此大于容量的申请(如一次大的LLM请求的token数)也能被满足,只是等待更久。
+    """
+
+    def __init__(self, name: str, rate: float, capacity: Optional[float] = None):
+        """
+        初始化令牌桶
+
+        Args:
+            name: 名称(用于统计信息)
+            rate: 每秒补充的令牌数
+            capacity: 桶容量(默认等于每秒速率,最小为1)
+        """
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.acquired = 0
+        self.waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """
+        预约令牌(不等待)
+
+        Args:
+            amount: 令牌数
+
+        Returns:
+            需要等待的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= amount
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+            self.acquired += 1
+            if wait > 0:
+                self.waits += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            return wait
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """
+        申请令牌,不足时阻塞等待
+
+        Args:
+            amount: 令牌数
+
+        Returns:
+            实际等待的秒数
+        """
+        wait = self.reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def consume(self, amount: float):
+        """
+        事后扣除令牌(不等待),用于调用完成后才知道用量的情况,如LLM输出的token数
+
+        Args:
+            amount: 令牌数
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= amount
+
+    def stats(self) -> Dict[str, Any]:
+        """获取限流统计信息"""
+        with self._lock:
+            return {
+                "name": self.name,
+                "rate_per_second": self.rate,
+                "capacity": self.capacity,
+                "acquired": self.acquired,
+                "waits": self.waits,
+                "total_wait": round(self.total_wait, 3),
+                "avg_wait": round(self.total_wait / self.acquired, 3) if self.acquired else 0.0,
+                "max_wait": round(self.max_wait, 3),
+            }
+
+
+class UpstreamRateLimiter:
+    """
+    单个上游服务的限流器
+
+    同时按请求数和token数(可选)限速,两个令牌桶都满足后才放行。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_second: float = 0,
+        tokens_per_second: float = 0,
+        request_burst: Optional[float] = None,
+        token_burst: Optional[float] = None
+    ):
+        """
+        初始化限流器
+
+        Args:
+            name: 上游名称
+            requests_per_second: 每秒请求数上限(0表示不限)
+            tokens_per_second: 每秒token数上限(0表示不限)
+            request_burst: 请求突发量
+            token_burst: token突发量
+        """
+        self.name = name
+        self.requests = (
+            TokenBucket(f"{name}.requests", requests_per_second, request_burst)
+            if requests_per_second > 0 else None
+        )
+        self.tokens = (
+            TokenBucket(f"{name}.tokens", tokens_per_second, token_burst)
+            if tokens_per_second > 0 else None
+        )
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        申请一次请求配额
+
+        Args:
+            tokens: 本次请求预计消耗的token数
+
+        Returns:
+            等待的秒数
+        """
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None and tokens > 0:
+            wait = max(wait, self.tokens.reserve(tokens))
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def consume_tokens(self, tokens: int):
+        """事后扣除token配额(不等待)"""
+        if self.tokens is not None and tokens > 0:
+            self.tokens.consume(tokens)
+
+    @property
+    def enabled(self) -> bool:
+        """是否配置了任一限制"""
+        return self.requests is not None or self.tokens is not None
+
+    def stats(self) -> Dict[str, Any]:
+        """获取限流统计信息"""
+        stats = {}
+        if self.requests is not None:
+            stats["requests"] = self.requests.stats()
+        if self.tokens is not None:
+            stats["tokens"] = self.tokens.stats()
+        return stats
+
+
+# 全局限流器实例(按上游名称)
+_rate_limiters: Dict[str, UpstreamRateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(upstream: str) -> UpstreamRateLimiter:
+    """
+    获取上游服务的限流器(单例模式)
+
+    Args:
+        upstream: 上游名称,"llm" 或 "amap"
+
+    Returns:
+        限流器实例
+    """
+    limiter = _rate_limiters.get(upstream)
+    if limiter is not None:
+        return limiter
+
+    with _rate_limiters_lock:
+        if upstream not in _rate_limiters:
+            settings = get_settings()
+            if upstream == "llm":
+                # 按分钟配额换算为每秒速率,突发量为1秒的配额
+                _rate_limiters[upstream] = UpstreamRateLimiter(
+                    "llm",
+                    requests_per_second=settings.perf_llm_rpm / 60,
+                    tokens_per_second=settings.perf_llm_tpm / 60,
+                    token_burst=settings.perf_llm_tpm / 60 if settings.perf_llm_tpm else None
+                )
+            elif upstream == "amap":
+                _rate_limiters[upstream] = UpstreamRateLimiter("amap", requests_per_second=settings.perf_amap_qps)
+            else:
+                raise ValueError(f"未知的上游服务: {upstream}")
+        return _rate_limiters[upstream]
+
+
+def get_rate_limiter_stats() -> Dict[str, Any]:
+    """获取所有已启用限流器的统计信息"""
+    return {name: limiter.stats() for name, limiter in _rate_limiters.items() if limiter.enabled}
+
+
+def reset_rate_limiters():
+    """重置所有限流器(用于测试或重新配置)"""
+    with _rate_limiters_lock:
+        _rate_limiters.clear()
@@ -1,70 +1,318 @@
 """重试处理工具"""
 
+import re
 import time
+import random
+import threading
 import functools
-from typing import Callable, Any
+from email.utils import parsedate_to_datetime
+from typing import Callable, Any, Dict, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 异常信息中的HTTP状态码: "Error code: 429 - {...}"
+_STATUS_CODE_PATTERN = re.compile(r"Error code:\s*(\d{3})")
+# 异常信息中的重试等待时间: "Retry-After: 20" / "retry after 20 seconds"
+_RETRY_AFTER_PATTERN = re.compile(r"retry[-_ ]after['\"]?\s*[:=]?\s*(\d+(?:\.\d+)?)", re.IGNORECASE)
+# 无法取得状态码时识别速率限制的关键字
+_RATE_LIMIT_MARKERS = ("429", "rate limit", "request limit exceeded", "too many requests")
+
+
+def _iter_error_chain(error: BaseException):
+    """依次返回异常及其 __cause__/__context__ 链上的异常"""
+    current = error
+    seen = set()
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        yield current
+        current = current.__cause__ or current.__context__
+
+
+def get_error_status(error: BaseException) -> Optional[int]:
+    """
+    获取异常对应的HTTP状态码
+
+    HelloAgentsLLM会把OpenAI客户端的异常包装为HelloAgentsException,
+    因此依次检查异常链(__cause__/__context__)上的status_code属性,最后从异常信息中提取。
+
+    Args:
+        error: 异常
+
+    Returns:
+        状态码,无法确定时返回None
+    """
+    for current in _iter_error_chain(error):
+        status = getattr(current, "status_code", None)
+        if isinstance(status, int):
+            return status
+
+    match = _STATUS_CODE_PATTERN.search(str(error))
+    return int(match.group(1)) if match else None
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """是否为速率限制错误(优先按状态码判断,其次按异常信息)"""
+    status = get_error_status(error)
+    if status is not None:
+        return status == 429
+    message = str(error).lower()
+    return any(marker in message for marker in _RATE_LIMIT_MARKERS)
+
+
+def get_retry_after(error: BaseException) -> Optional[float]:
+    """
+    获取服务端建议的重试等待时间
+
+    依次检查异常链上响应头的 retry-after-ms / retry-after(秒数或HTTP日期)、
+    retry_after 属性,最后从异常信息中提取。
+
+    Args:
+        error: 异常
+
+    Returns:
+        等待秒数,没有提供时返回None
+    """
+    for current in _iter_error_chain(error):
+        headers = getattr(getattr(current, "response", None), "headers", None)
+        if headers:
+            milliseconds = headers.get("retry-after-ms")
+            if milliseconds:
+                try:
+                    return max(0.0, float(milliseconds) / 1000)
+                except ValueError:
+                    pass
+            value = headers.get("retry-after")
+            if value:
+                try:
+                    return max(0.0, float(value))
+                except ValueError:
+                    try:
+                        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+                    except (TypeError, ValueError):
+                        pass
+
+        retry_after = getattr(current, "retry_after", None)
+        if isinstance(retry_after, (int, float)):
+            return max(0.0, float(retry_after))
+
+    match = _RETRY_AFTER_PATTERN.search(str(error))
+    return float(match.group(1)) if match else None
+
+
+class RetryBudget:
+    """
+    进程级重试预算
+
+    每次首次调用存入 ratio 个令牌,并按 min_per_second 的速率持续补充;
+    每次重试消耗1个令牌,令牌不足时不再重试。
+    上游整体故障时重试量被限制在正常流量的一定比例内,避免形成重试风暴。
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, capacity: float = 10.0):
+        """
+        初始化重试预算
+
+        Args:
+            ratio: 每次首次调用存入的令牌数(即重试占调用量的比例上限)
+            min_per_second: 每秒补充的令牌数(保证低流量时也能重试)
+            capacity: 令牌上限
+        """
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self._balance = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._balance = min(self.capacity, self._balance + (now - self._updated_at) * self.min_per_second)
+        self._updated_at = now
+
+    def deposit(self):
+        """记录一次首次调用"""
+        with self._lock:
+            self._refill()
+            self._balance = min(self.capacity, self._balance + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        """申请一次重试,预算不足时返回False"""
+        with self._lock:
+            self._refill()
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+    @property
+    def balance(self) -> float:
+        """当前剩余令牌数"""
+        with self._lock:
+            self._refill()
+            return self._balance
+
+
+class RetryMetrics:
+    """各重试点的统计信息"""
+
+    _COUNTERS = (
+        "calls", "retries", "recovered", "exhausted",
+        "budget_rejected", "retry_after_honored",
+    )
+
+    def __init__(self):
+        self._counters: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, counter: str, value: float = 1):
+        """累加指定重试点的计数"""
+        with self._lock:
+            counters = self._counters.setdefault(name, {**dict.fromkeys(self._COUNTERS, 0), "total_delay": 0.0})
+            counters[counter] += value
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """获取统计信息"""
+        with self._lock:
+            return {
+                name: {key: round(value, 3) if isinstance(value, float) else value for key, value in counters.items()}
+                for name, counters in self._counters.items()
+            }
+
+
+_retry_budget: Optional[RetryBudget] = None
+_retry_budget_lock = threading.Lock()
+_retry_metrics = RetryMetrics()
+
+
+def get_retry_budget() -> RetryBudget:
+    """获取进程级重试预算(单例模式)"""
+    global _retry_budget
+
+    if _retry_budget is None:
+        with _retry_budget_lock:
+            if _retry_budget is None:
+                from ..config import get_settings
+
+                settings = get_settings()
+                _retry_budget = RetryBudget(
+                    ratio=settings.perf_retry_budget_ratio,
+                    min_per_second=settings.perf_retry_budget_min_per_second,
+                    capacity=max(10.0, settings.perf_retry_budget_min_per_second * 10)
+                )
+    return _retry_budget
+
+
+def get_retry_metrics() -> Dict[str, Any]:
+    """获取重试统计信息和重试预算余额"""
+    return {
+        "budget_balance": round(get_retry_budget().balance, 2),
+        "sites": _retry_metrics.stats(),
+    }
+
+
+def _plan_retry(
+    name: str,
+    error: Exception,
+    attempt: int,
+    max_retries: int,
+    previous_delay: float,
+    initial_delay: float,
+    backoff_factor: float,
+    max_delay: float
+) -> Optional[Tuple[float, bool]]:
+    """
+    判断是否重试并计算等待时间
+
+    等待时间优先使用服务端的Retry-After(加少量随机抖动),
+    否则使用去相关抖动: random(初始延迟, 上次延迟 × 倍增因子),不超过最大延迟。
+
+    Returns:
+        (等待秒数, 是否来自Retry-After),不重试时返回None
+    """
+    if not is_rate_limit_error(error):
+        return None
+    if attempt >= max_retries:
+        _retry_metrics.record(name, "exhausted")
+        return None
+    if not get_retry_budget().try_withdraw():
+        _retry_metrics.record(name, "budget_rejected")
+        logger.warning(f"⚠️  重试预算已用尽，放弃重试: {name}")
+        print(f"⚠️  重试预算已用尽，放弃重试: {name}")
+        return None
+
+    retry_after = get_retry_after(error)
+    if retry_after is not None:
+        delay = min(max_delay, retry_after) + random.uniform(0, min(1.0, initial_delay * 0.5))
+        _retry_metrics.record(name, "retry_after_honored")
+    else:
+        delay = min(max_delay, random.uniform(initial_delay, max(initial_delay, previous_delay * backoff_factor)))
+
+    _retry_metrics.record(name, "retries")
+    _retry_metrics.record(name, "total_delay", delay)
+    return delay, retry_after is not None
+
+
+def _log_retry(attempt: int, max_retries: int, delay: float, from_header: bool):
+    message = (
+        f"⚠️  遇到速率限制 (尝试 {attempt + 1}/{max_retries + 1})，"
+        f"{delay:.1f}秒后重试{'（服务端 Retry-After）' if from_header else ''}..."
+    )
+    logger.warning(message)
+    print(message)
+
 
 def retry_on_rate_limit(
     max_retries: int = 3,
     initial_delay: float = 2.0,
     backoff_factor: float = 2.0,
-    max_delay: float = 60.0
+    max_delay: float = 60.0,
+    on_retry: Optional[Callable[[int, Exception, float], None]] = None,
+    name: Optional[str] = None
 ):
     """
     装饰器：在遇到速率限制时自动重试
-    
+
+    使用去相关抖动退避,优先遵循服务端的 Retry-After,重试受进程级重试预算限制。
+
     Args:
         max_retries: 最大重试次数
         initial_delay: 初始延迟时间（秒）
         backoff_factor: 延迟时间的倍增因子
         max_delay: 最大延迟时间（秒）
+        on_retry: 每次重试前的回调，参数为(已失败的尝试次数, 异常, 延迟秒数)
+        name: 统计信息中的重试点名称（默认使用函数名）
     """
     def decorator(func: Callable) -> Callable:
+        site = name or func.__qualname__
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs) -> Any:
             delay = initial_delay
-            last_exception = None
-            
+            _retry_metrics.record(site, "calls")
+            get_retry_budget().deposit()
+
             for attempt in range(max_retries + 1):
                 try:
-                    return func(*args, **kwargs)
+                    result = func(*args, **kwargs)
+                    if attempt > 0:
+                        _retry_metrics.record(site, "recovered")
+                    return result
                 except Exception as e:
-                    error_str = str(e)
-                    last_exception = e
-                    
-                    # 检查是否是速率限制错误
-                    is_rate_limit = (
-                        "429" in error_str or
-                        "rate limit" in error_str.lower() or
-                        "request limit exceeded" in error_str.lower() or
-                        "too many requests" in error_str.lower()
+                    plan = _plan_retry(
+                        site, e, attempt, max_retries, delay, initial_delay, backoff_factor, max_delay
                     )
-                    
-                    if not is_rate_limit or attempt >= max_retries:
-                        # 不是速率限制错误，或已达到最大重试次数
+                    if plan is None:
+                        # 不是速率限制错误、已达到最大重试次数或重试预算不足
                         raise
-                    
-                    # 计算延迟时间
-                    current_delay = min(delay, max_delay)
-                    logger.warning(
-                        f"⚠️  遇到速率限制 (尝试 {attempt + 1}/{max_retries + 1})，"
-                        f"{current_delay:.1f}秒后重试..."
-                    )
-                    print(
-                        f"⚠️  遇到速率限制 (尝试 {attempt + 1}/{max_retries + 1})，"
-                        f"{current_delay:.1f}秒后重试..."
-                    )
-                    
-                    time.sleep(current_delay)
-                    delay *= backoff_factor
-            
-            # 所有重试都失败
-            raise last_exception
-        
+                    delay, from_header = plan
+
+                    _log_retry(attempt, max_retries, delay, from_header)
+                    if on_retry is not None:
+                        on_retry(attempt + 1, e, delay)
+
+                    time.sleep(delay)
+
         return wrapper
     return decorator
 
@@ -73,60 +321,54 @@ def async_retry_on_rate_limit(
     max_retries: int = 3,
     initial_delay: float = 2.0,
     backoff_factor: float = 2.0,
-    max_delay: float = 60.0
+    max_delay: float = 60.0,
+    on_retry: Optional[Callable[[int, Exception, float], None]] = None,
+    name: Optional[str] = None
 ):
     """
     异步装饰器：在遇到速率限制时自动重试
-    
+
+    使用去相关抖动退避,优先遵循服务端的 Retry-After,重试受进程级重试预算限制。
+
     Args:
         max_retries: 最大重试次数
         initial_delay: 初始延迟时间（秒）
         backoff_factor: 延迟时间的倍增因子
         max_delay: 最大延迟时间（秒）
+        on_retry: 每次重试前的回调，参数为(已失败的尝试次数, 异常, 延迟秒数)
+        name: 统计信息中的重试点名称（默认使用函数名）
     """
     def decorator(func: Callable) -> Callable:
+        site = name or func.__qualname__
+
         @functools.wraps(func)
         async def wrapper(*args, **kwargs) -> Any:
             import asyncio
-            
+
             delay = initial_delay
-            last_exception = None
-            
+            _retry_metrics.record(site, "calls")
+            get_retry_budget().deposit()
+
             for attempt in range(max_retries + 1):
                 try:
-                    return await func(*args, **kwargs)
+                    result = await func(*args, **kwargs)
+                    if attempt > 0:
+                        _retry_metrics.record(site, "recovered")
+                    return result
                 except Exception as e:
-                    error_str = str(e)
-                    last_exception = e
-                    
-                    # 检查是否是速率限制错误
-                    is_rate_limit = (
-                        "429" in error_str or
-                        "rate limit" in error_str.lower() or
-                        "request limit exceeded" in error_str.lower() or
-                        "too many requests" in error_str.lower()
+                    plan = _plan_retry(
+                        site, e, attempt, max_retries, delay, initial_delay, backoff_factor, max_delay
                     )
-                    
-                    if not is_rate_limit or attempt >= max_retries:
-                        # 不是速率限制错误，或已达到最大重试次数
+                    if plan is None:
+                        # 不是速率限制错误、已达到最大重试次数或重试预算不足
                         raise
-                    
-                    # 计算延迟时间
-                    current_delay = min(delay, max_delay)
-                    logger.warning(
-                        f"⚠️  遇到速率限制 (尝试 {attempt + 1}/{max_retries + 1})，"
-                        f"{current_delay:.1f}秒后重试..."
-                    )
-                    print(
-                        f"⚠️  遇到速率限制 (尝试 {attempt + 1}/{max_retries + 1})，"
-                        f"{current_delay:.1f}秒后重试..."
-                    )
-                    
-                    await asyncio.sleep(current_delay)
-                    delay *= backoff_factor
-            
-            # 所有重试都失败
-            raise last_exception
-        
+                    delay, from_header = plan
+
+                    _log_retry(attempt, max_retries, delay, from_header)
+                    if on_retry is not None:
+                        on_retry(attempt + 1, e, delay)
+
+                    await asyncio.sleep(delay)
+
         return wrapper
     return decorator
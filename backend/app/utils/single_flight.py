@@ -0,0 +1,74 @@
+"""请求合并工具 - 相同键的并发调用只执行一次"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """
+    单飞(single-flight)调用合并器
+
+    同一时刻针对相同键的多个调用只会真正执行一次,
+    其余调用者等待正在执行的调用并共享其结果(或异常)。
+    """
+
+    def __init__(self, name: str):
+        """
+        初始化合并器
+
+        Args:
+            name: 名称(用于统计信息)
+        """
+        self.name = name
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        执行调用,若相同键的调用正在进行则等待其结果
+
+        Args:
+            key: 合并键
+            fn: 实际执行的无参函数
+
+        Returns:
+            (结果, 是否共享了其他调用的结果)
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                future = Future()
+                self._inflight[key] = future
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取合并统计信息"""
+        with self._lock:
+            return {
+                "name": self.name,
+                "in_flight": len(self._inflight),
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+            }
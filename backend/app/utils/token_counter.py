@@ -0,0 +1,40 @@
+"""Token估算工具 - 不依赖分词器的近似计数"""
+
+import math
+import re
+from typing import Dict, List
+
+# 中日韩字符(含全角标点)大致每个字符对应一个token
+_CJK_PATTERN = re.compile(r"[　-〿぀-ヿ㐀-䶿一-鿿가-힯＀-￯]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的token数量
+
+    中日韩字符按每字1个token计算,其余字符按每4个字符1个token计算。
+
+    Args:
+        text: 文本
+
+    Returns:
+        估算的token数
+    """
+    if not text:
+        return 0
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    other_count = len(text) - cjk_count
+    return cjk_count + math.ceil(other_count / 4)
+
+
+def estimate_messages_tokens(messages: List[Dict[str, str]]) -> int:
+    """
+    估算对话消息列表的token数量(每条消息额外计4个token的格式开销)
+
+    Args:
+        messages: 消息列表
+
+    Returns:
+        估算的token数
+    """
+    return sum(estimate_tokens(message.get("content") or "") + 4 for message in messages)
@@ -0,0 +1,229 @@
+"""高德HTTP后端测试脚本(使用本地桩服务器,无需真实API密钥)
+
+用法:
+    python test_amap_http.py            # 桩服务器上的功能测试和HTTP后端基准
+    python test_amap_http.py --compare  # 使用 .env 中的 AMAP_API_KEY,对比真实高德接口上MCP与HTTP后端的延迟和吞吐
+"""
+
+import sys
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from app.services.amap_http_client import AmapHttpClient, AmapApiError
+from app.services.amap_service import HttpAmapTool
+from app.utils.amap_parser import get_tool_error, parse_pois, parse_weather_forecasts
+
+# 桩服务器每个请求的模拟处理耗时（秒）
+_STUB_LATENCY = 0.005
+
+_STUB_RESPONSES = {
+    "/v3/place/text": {
+        "status": "1", "info": "OK", "infocode": "10000", "count": "1",
+        "pois": [{
+            "id": "B000A8UIN8", "name": "故宫博物院", "address": "景山前街4号", "type": "风景名胜;世界遗产",
+            "typecode": "110201", "location": "116.397029,39.917839", "tel": [], "pcode": "110000",
+            "biz_ext": {"rating": "4.9", "cost": "60.00"},
+        }],
+    },
+    "/v3/weather/weatherInfo": {
+        "status": "1", "info": "OK", "infocode": "10000",
+        "forecasts": [{"city": "北京市", "adcode": "110000", "casts": [
+            {"date": "2025-06-01", "week": "7", "dayweather": "晴", "nightweather": "多云", "daytemp": "30",
+             "nighttemp": "18", "daywind": "南", "nightwind": "南", "daypower": "1-3", "nightpower": "1-3"},
+        ]}],
+    },
+    "/v3/geocode/geo": {
+        "status": "1", "info": "OK", "infocode": "10000", "count": "1",
+        "geocodes": [{"country": "中国", "province": "北京市", "city": "北京市", "district": "东城区",
+                      "adcode": "110101", "location": "116.397029,39.917839", "level": "兴趣点"}],
+    },
+    "/v3/direction/walking": {
+        "status": "1", "info": "OK", "infocode": "10000",
+        "route": {"origin": "116.397029,39.917839", "destination": "116.397029,39.917839",
+                  "paths": [{"distance": "1200", "duration": "960", "steps": []}]},
+    },
+}
+
+
+def _start_stub_server():
+    """
+    启动高德Web服务桩服务器
+
+    key为 bad-key 时返回 INVALID_USER_KEY 错误。
+
+    Returns:
+        (服务器实例, 状态字典: hits为收到的请求数, connections为建立的TCP连接数)
+    """
+    state = {"hits": 0, "connections": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # 支持keep-alive
+        disable_nagle_algorithm = True  # 响应头和响应体分开写出,避免Nagle算法带来的40ms延迟
+
+        def setup(self):
+            super().setup()
+            with lock:
+                state["connections"] += 1
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            with lock:
+                state["hits"] += 1
+            time.sleep(_STUB_LATENCY)
+
+            if query.get("key") == ["bad-key"]:
+                body = {"status": "0", "info": "INVALID_USER_KEY", "infocode": "10001"}
+            else:
+                body = _STUB_RESPONSES.get(url.path, {"status": "0", "info": "UNKNOWN_PATH", "infocode": "20000"})
+
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def _create_client(server, api_key: str = "test-key", max_connections: int = 8) -> AmapHttpClient:
+    return AmapHttpClient(api_key, base_url=f"http://127.0.0.1:{server.server_address[1]}", timeout=5, max_connections=max_connections)
+
+
+def test_tools():
+    """测试工具结果与MCP工具格式兼容"""
+    print("\n📊 测试1: 工具调用与结果解析")
+    server, state = _start_stub_server()
+    tool = HttpAmapTool(_create_client(server), description="高德地图服务")
+
+    names = [t.name for t in tool.get_expanded_tools()]
+    print(f"   展开工具: {len(names)} 个")
+    assert "amap_maps_text_search" in names and "amap_maps_weather" in names
+
+    result = tool.run({"action": "call_tool", "tool_name": "maps_text_search", "arguments": {"keywords": "故宫", "city": "北京"}})
+    pois = parse_pois(result)
+    print(f"   POI: {pois[0]['name']} {pois[0]['location']} 评分{pois[0]['rating']}")
+    assert result.startswith("工具 'maps_text_search' 执行结果:")
+    assert pois[0]["rating"] == "4.9" and pois[0]["tel"] is None
+
+    result = tool.run({"action": "call_tool", "tool_name": "maps_weather", "arguments": {"city": "北京"}})
+    casts = parse_weather_forecasts(result)
+    assert casts[0]["dayweather"] == "晴"
+
+    # 按地址规划路线: 两次地理编码 + 一次路径规划
+    hits = state["hits"]
+    result = tool.run({"action": "call_tool", "tool_name": "maps_direction_walking_by_address",
+                       "arguments": {"origin_address": "故宫", "destination_address": "天安门", "origin_city": "北京"}})
+    assert state["hits"] - hits == 3
+    assert get_tool_error(result) is None
+    print("✅ 通过")
+
+
+def test_errors():
+    """测试高德错误转换为工具错误"""
+    print("\n📊 测试2: 错误处理")
+    server, _ = _start_stub_server()
+    tool = HttpAmapTool(_create_client(server, api_key="bad-key"))
+
+    result = tool.run({"action": "call_tool", "tool_name": "maps_weather", "arguments": {"city": "北京"}})
+    print(f"   {result}")
+    assert "INVALID_USER_KEY" in (get_tool_error(result) or "")
+
+    client = _create_client(server, api_key="bad-key")
+    try:
+        client.call_tool("maps_weather", {"city": "北京"})
+        raise AssertionError("应抛出 AmapApiError")
+    except AmapApiError as e:
+        assert e.infocode == "10001"
+    assert client.stats()["tools"]["maps_weather"]["errors"] == 1
+    print("✅ 通过")
+
+
+def test_keep_alive():
+    """测试并发调用复用长连接"""
+    print("\n📊 测试3: 连接复用")
+    server, state = _start_stub_server()
+    client = _create_client(server, max_connections=4)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: client.call_tool("maps_weather", {"city": "北京"}), range(100)))
+    client.close()
+    print(f"   100次调用 {state['connections']} 个连接")
+    assert state["connections"] <= 4
+    print("✅ 通过")
+
+
+def _benchmark_sync(label: str, call, total: int, concurrency: int):
+    """串行测延迟,并发测吞吐"""
+    latencies = []
+    for _ in range(min(total, 50)):
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda _: call(), range(total)))
+    elapsed = time.perf_counter() - start
+
+    p50 = latencies[len(latencies) // 2] * 1000
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+    print(f"   {label:<12} p50 {p50:7.1f}ms  p95 {p95:7.1f}ms  吞吐 {total / elapsed:7.1f} 次/秒 (并发{concurrency})")
+
+
+def benchmark_stub():
+    """桩服务器上的HTTP后端基准"""
+    print("\n📊 基准: HTTP后端(本地桩服务器)")
+    server, _ = _start_stub_server()
+    client = _create_client(server, max_connections=16)
+    tool = HttpAmapTool(client)
+    call = lambda: tool.run({"action": "call_tool", "tool_name": "maps_text_search", "arguments": {"keywords": "故宫", "city": "北京"}})
+    _benchmark_sync("HTTP", call, total=500, concurrency=16)
+    client.close()
+
+
+def benchmark_compare():
+    """真实高德接口上对比MCP连接池、每次启动进程的MCP和HTTP后端"""
+    from app.config import get_settings
+    from app.services.amap_service import ThrottledMCPTool, PooledMCPTool, AMAP_MCP_SERVER_COMMAND, get_amap_mcp_manager
+
+    settings = get_settings()
+    assert settings.amap_api_key, "请在.env中设置AMAP_API_KEY"
+    print("\n📊 基准: MCP与HTTP后端(真实高德接口)")
+
+    parameters = {"action": "call_tool", "tool_name": "maps_weather", "arguments": {"city": "北京"}}
+    http_tool = HttpAmapTool(AmapHttpClient(settings.amap_api_key, base_url=settings.amap_api_base_url))
+    pooled_tool = PooledMCPTool(get_amap_mcp_manager())
+    spawn_tool = ThrottledMCPTool(
+        name="amap", server_command=AMAP_MCP_SERVER_COMMAND, env={"AMAP_MAPS_API_KEY": settings.amap_api_key}
+    )
+
+    _benchmark_sync("HTTP", lambda: http_tool.run(parameters), total=50, concurrency=4)
+    _benchmark_sync("MCP连接池", lambda: pooled_tool.run(parameters), total=50, concurrency=4)
+    _benchmark_sync("MCP(每次启动)", lambda: spawn_tool.run(parameters), total=10, concurrency=4)
+    get_amap_mcp_manager().close()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 高德HTTP后端测试")
+    print("=" * 60)
+    if "--compare" in sys.argv:
+        benchmark_compare()
+    else:
+        test_tools()
+        test_errors()
+        test_keep_alive()
+        benchmark_stub()
+    print("\n✅ 所有测试通过")
@@ -0,0 +1,169 @@
+"""持久化地理编码库测试脚本(使用临时SQLite文件)"""
+
+import os
+import time
+import random
+import sqlite3
+import tempfile
+from types import SimpleNamespace
+from app.agents.trip_planner_agent import MultiAgentTripPlanner
+from app.config import get_settings
+from app.models.schemas import Attraction, DayPlan, Location, TripPlan
+from app.services import geocode_store
+from app.services.geocode_store import KIND_NAME, GeocodeStore, haversine, normalize_address
+
+
+def test_normalize():
+    """测试地址规范化"""
+    print("\n📊 测试1: 地址规范化")
+    assert normalize_address("北京市 故宫博物院", "北京") == normalize_address("故宫博物院", "北京市")
+    assert normalize_address("（故宫）博物院", "北京") == normalize_address("故宫博物院", None)
+    assert normalize_address("ＡＢＣ大厦", None) == "abc大厦"
+    # 地址只有城市名称时保留原文
+    assert normalize_address("北京", "北京") == "北京"
+    print("✅ 通过")
+
+
+def test_persistence():
+    """测试保存、覆盖和重启后读取"""
+    print("\n📊 测试2: 持久化")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "geo", "geocode.sqlite3")
+        store = GeocodeStore(path)
+        store.put("故宫博物院", "北京市", 116.397029, 39.917839)
+        store.put_many([("天安门广场", "北京", 116.397755, 39.903179), ("颐和园", "北京", 116.27, 39.99)], source="poi")
+        store.put("颐和园", "北京", 116.275179, 39.999617)
+        assert store.get(" 北京市故宫博物院 ", "北京") == (116.397029, 39.917839)
+        assert store.get("故宫博物院", "上海") is None
+        # POI的名称和地址分别写入名称记录和地址记录,按地址查不到名称记录
+        store.put_pois([("天坛公园", "天坛内东里7号", 116.410829, 39.881913), ("景山公园", "景山公园", 116.39, 39.92)], "北京")
+        assert store.get("北京市天坛内东里7号", "北京") == (116.410829, 39.881913)
+        assert store.get("天坛公园", "北京") is None
+        assert store.get("天坛公园", "北京", KIND_NAME) == (116.410829, 39.881913)
+        store.close()
+
+        store = GeocodeStore(path)
+        stats = store.stats()
+        print(f"   重新打开后: {stats['entries']} 条")
+        assert stats["entries"] == 7
+        assert store.get("颐和园", "北京") == (116.275179, 39.999617)
+        store.close()
+    print("✅ 通过")
+
+
+def test_nearby():
+    """测试网格反向查找与暴力扫描结果一致"""
+    print("\n📊 测试3: 反向查找")
+    store = GeocodeStore(":memory:", grid_size=0.01)
+    rng = random.Random(7)
+    points = [(f"地点{i}", 116.2 + rng.random() * 0.4, 39.8 + rng.random() * 0.2) for i in range(5000)]
+    store.put_many([(name, "北京", lng, lat) for name, lng, lat in points])
+
+    for _ in range(20):
+        lng, lat = 116.2 + rng.random() * 0.4, 39.8 + rng.random() * 0.2
+        radius = rng.choice([100, 500, 2000])
+        expected = sorted(
+            (haversine(lng, lat, p_lng, p_lat), name) for name, p_lng, p_lat in points
+            if haversine(lng, lat, p_lng, p_lat) <= radius
+        )
+        found = store.nearby(lng, lat, radius, limit=len(points))
+        assert [entry.address for entry in found] == [name for _, name in expected]
+    print("✅ 通过")
+
+
+def test_migration():
+    """测试旧版本(主键没有类型前缀)的记录迁移"""
+    print("\n📊 测试4: 旧记录迁移")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "geocode.sqlite3")
+        GeocodeStore(path).close()
+        conn = sqlite3.connect(path)
+        conn.executemany(
+            "INSERT INTO geocodes VALUES (?, ?, '北京', 116.4, 39.9, 0, 0, ?, 0)",
+            [("北京|故宫博物院", "故宫博物院", "geocode"), ("北京|肯德基", "肯德基", "poi")]
+        )
+        conn.commit()
+        conn.close()
+
+        store = GeocodeStore(path)
+        print(f"   迁移后: {store.stats()['entries']} 条")
+        assert store.get("故宫博物院", "北京") == (116.4, 39.9)
+        assert store.stats()["entries"] == 1
+        store.close()
+    print("✅ 通过")
+
+
+def test_check_locations():
+    """测试行程坐标校验: 只按地址记录修正,连锁店名称写在地址字段时不修正"""
+    print("\n📊 测试5: 行程坐标校验")
+    settings = get_settings()
+    original_path = settings.perf_geocode_store_path
+    settings.perf_geocode_store_path = ":memory:"
+    geocode_store.shutdown_geocode_store()
+    try:
+        store = geocode_store.get_geocode_store()
+        store.put_pois([
+            ("故宫博物院", "景山前街4号", 116.397029, 39.917839),
+            ("肯德基(王府井店)", "王府井大街88号", 116.410, 39.914),
+        ], "北京")
+        store.put("肯德基", "北京", 116.380, 39.950, source="poi", kind=KIND_NAME)
+
+        def attraction(name: str, address: str, longitude: float, latitude: float) -> Attraction:
+            return Attraction(
+                name=name, address=address, location=Location(longitude=longitude, latitude=latitude),
+                visit_duration=60, description=""
+            )
+
+        attractions = [
+            attraction("故宫", "北京市景山前街4号", 116.41, 39.93),  # 地址匹配,偏差约1.7公里: 修正
+            attraction("肯德基", "肯德基", 116.40, 39.94),  # 连锁店名称写在地址字段: 不修正
+            attraction("天坛", "景山前街4号", 117.5, 40.5),  # 地址匹配但偏差过大: 不修正
+        ]
+        plan = TripPlan(
+            city="北京", start_date="2025-06-01", end_date="2025-06-01", overall_suggestions="",
+            days=[DayPlan(
+                date="2025-06-01", day_index=0, description="", transportation="", accommodation="",
+                attractions=attractions
+            )]
+        )
+        planner = SimpleNamespace(settings=settings, _log=lambda stream_id, message: print(f"   {message}"))
+        MultiAgentTripPlanner._check_locations(planner, plan, "北京市")
+
+        locations = [(a.location.longitude, a.location.latitude) for a in plan.days[0].attractions]
+        assert locations == [(116.397029, 39.917839), (116.40, 39.94), (117.5, 40.5)]
+    finally:
+        geocode_store.shutdown_geocode_store()
+        settings.perf_geocode_store_path = original_path
+    print("✅ 通过")
+
+
+def benchmark():
+    """本地查找耗时"""
+    print("\n📊 基准: 本地查找")
+    store = GeocodeStore(":memory:")
+    rng = random.Random(7)
+    store.put_many([(f"地点{i}", "北京", 116.2 + rng.random() * 0.4, 39.8 + rng.random() * 0.2) for i in range(10000)])
+
+    start = time.perf_counter()
+    for i in range(10000):
+        store.get(f"地点{i}", "北京")
+    get_us = (time.perf_counter() - start) / 10000 * 1e6
+
+    start = time.perf_counter()
+    for i in range(1000):
+        store.nearby(116.2 + rng.random() * 0.4, 39.8 + rng.random() * 0.2, 500, limit=1)
+    nearby_us = (time.perf_counter() - start) / 1000 * 1e6
+    print(f"   按地址查找: {get_us:.1f}μs/次, 500米内反向查找: {nearby_us:.1f}μs/次 (10000条)")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 地理编码库测试")
+    print("=" * 60)
+    test_normalize()
+    test_persistence()
+    test_nearby()
+    test_migration()
+    test_check_locations()
+    benchmark()
+    print("\n✅ 所有测试通过")
@@ -0,0 +1,46 @@
+"""JSON容错解析测试脚本"""
+
+from app.utils.json_repair import loads_tolerant
+
+
+def test_format_errors():
+    """测试尾随逗号、注释、单引号和未加引号的键"""
+    print("\n📊 测试1: 格式错误")
+    assert loads_tolerant('```json\n{"days": [1, 2,], "city": "北京",}\n```') == {"days": [1, 2], "city": "北京"}
+    assert loads_tolerant("{'city': '北京', // 城市\n days: [True, None]}") == {"city": "北京", "days": [True, None]}
+    print("✅ 通过")
+
+
+def test_inner_quotes():
+    """测试字符串中未转义的双引号"""
+    print("\n📊 测试2: 字符串内的双引号")
+    text = '{"description": "称为"紫禁城"的宫殿", "tags": ["他说"好"", "b"], "price": 60}'
+    result = loads_tolerant(text)
+    print(f"   {result}")
+    assert result == {"description": '称为"紫禁城"的宫殿', "tags": ['他说"好"', "b"], "price": 60}
+    # 引号后面是冒号、逗号或括号时正常结束字符串
+    assert loads_tolerant('{"a": "x" , "b" :"y"\n}') == {"a": "x", "b": "y"}
+    print("✅ 通过")
+
+
+def test_truncation():
+    """测试输出被截断时保留已完成的内容"""
+    print("\n📊 测试3: 截断")
+    assert loads_tolerant('{"city": "北京", "days": [{"day": 1}, {"day": 2, "desc": "故宫') == {
+        "city": "北京", "days": [{"day": 1}, {"day": 2, "desc": "故宫"}]
+    }
+    assert loads_tolerant('{"city": "北京", "days": [{"day": 1}, {"day": 2, "desc":') == {
+        "city": "北京", "days": [{"day": 1}, {"day": 2}]
+    }
+    assert loads_tolerant('{"description": "称为"紫禁') == {"description": '称为"紫禁'}
+    print("✅ 通过")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 JSON容错解析测试")
+    print("=" * 60)
+    test_format_errors()
+    test_inner_quotes()
+    test_truncation()
+    print("\n✅ 所有测试通过")
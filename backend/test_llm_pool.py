@@ -0,0 +1,183 @@
+"""LLM端点池测试脚本(使用本地桩服务器,无需真实API密钥)"""
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from app.config import get_settings
+from app.services.llm_pool import LLMPool
+from app.services.llm_service import get_llm, get_llm_metrics, reset_llm
+from app.utils.concurrency_limiter import reset_concurrency_limiters
+from app.utils.rate_limiter import reset_rate_limiters
+
+
+def _start_stub_server(name: str, status: int = 200):
+    """
+    启动一个OpenAI兼容的桩服务器
+
+    Args:
+        name: 服务器名称(作为回复内容返回)
+        status: 返回的HTTP状态码
+
+    Returns:
+        (服务器实例, 状态字典: status可修改, hits为收到的请求数)
+    """
+    state = {"status": status, "hits": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with lock:
+                state["hits"] += 1
+
+            if state["status"] != 200:
+                body = {"error": {"message": f"{name} unavailable", "type": "rate_limit_error"}}
+            else:
+                body = {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion",
+                    "created": 0,
+                    "model": "stub",
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": name},
+                        "finish_reason": "stop"
+                    }],
+                }
+
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(state["status"])
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def _create_pool(servers, weights, cooldown: float = 30.0) -> LLMPool:
+    """根据桩服务器创建端点池"""
+    config = ";".join(
+        f"http://127.0.0.1:{server.server_address[1]}/v1|sk-test|{weight}|stub-model"
+        for server, weight in zip(servers, weights)
+    )
+    return LLMPool.from_config(config, cooldown=cooldown, timeout=5)
+
+
+def _invoke(pool: LLMPool) -> str:
+    return pool.invoke([{"role": "user", "content": "hi"}])
+
+
+def test_load_balancing():
+    """测试按权重分配请求"""
+    print("\n📊 测试1: 加权负载均衡")
+    (a, a_state), (b, b_state) = _start_stub_server("a"), _start_stub_server("b")
+    pool = _create_pool([a, b], [3, 1])
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: _invoke(pool), range(80)))
+
+    print(f"   端点a: {a_state['hits']} 次, 端点b: {b_state['hits']} 次")
+    assert set(results) <= {"a", "b"}
+    assert a_state["hits"] > b_state["hits"] > 0
+    print("✅ 通过")
+
+
+def test_failover():
+    """测试429/5xx时摘除端点并透明切换"""
+    print("\n📊 测试2: 429/5xx 故障转移")
+    (a, a_state), (b, b_state) = _start_stub_server("a", status=429), _start_stub_server("b")
+    pool = _create_pool([a, b], [1, 1])
+
+    results = [_invoke(pool) for _ in range(10)]
+    stats = pool.stats()
+    print(f"   结果: {set(results)}, 端点a收到 {a_state['hits']} 次, 切换 {stats['failovers']} 次")
+    assert results == ["b"] * 10
+    # 端点a在冷却时间内只被尝试一次
+    assert a_state["hits"] == 1
+    assert stats["endpoints"][0]["ejections"] == 1
+
+    a_state["status"] = 503
+    b_state["status"] = 500
+    pool = _create_pool([a, b], [1, 1])
+    try:
+        _invoke(pool)
+        raise AssertionError("所有端点不可用时应抛出异常")
+    except Exception as e:
+        print(f"   所有端点不可用: {e}")
+    print("✅ 通过")
+
+
+def test_recovery():
+    """测试冷却时间后端点恢复轮转"""
+    print("\n📊 测试3: 冷却后恢复")
+    import time
+
+    (a, a_state), (b, b_state) = _start_stub_server("a", status=500), _start_stub_server("b")
+    pool = _create_pool([a, b], [1, 1], cooldown=0.5)
+
+    _invoke(pool)
+    a_state["status"] = 200
+    time.sleep(0.6)
+    results = {_invoke(pool) for _ in range(10)}
+    print(f"   恢复后结果: {results}")
+    assert results == {"a", "b"}
+    print("✅ 通过")
+
+
+def test_metrics():
+    """测试默认包装链(对冲 -> 限流 -> 并发控制 -> 端点池)的每一层都出现在性能指标中"""
+    print("\n📊 测试4: 包装链性能指标")
+    (a, _), (b, _) = _start_stub_server("a"), _start_stub_server("b")
+    settings = get_settings()
+    overrides = {
+        "llm_endpoints": ";".join(
+            f"http://127.0.0.1:{server.server_address[1]}/v1|sk-test|1|stub-model" for server in (a, b)
+        ),
+        "perf_adaptive_concurrency": True,
+        "perf_llm_rpm": 6000,
+        "perf_llm_hedge_enabled": True,
+    }
+    original = {name: getattr(settings, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    # 限流器和并发限制器按进程单例创建,前后都重置,避免与其他测试互相影响
+    reset_llm()
+    reset_rate_limiters()
+    reset_concurrency_limiters()
+
+    try:
+        llm = get_llm()
+        for _ in range(5):
+            llm.invoke([{"role": "user", "content": "hi"}])
+        metrics = get_llm_metrics()
+        print(f"   指标: {sorted(metrics)}")
+        assert sorted(metrics) == ["concurrency", "hedge", "pool", "throttle"]
+        assert metrics["hedge"]["calls"] == 5
+        assert metrics["throttle"]["requests"]["acquired"] == 5
+        assert metrics["concurrency"]["name"] == "llm"
+        assert sum(endpoint["requests"] for endpoint in metrics["pool"]["endpoints"]) == 5
+    finally:
+        for name, value in original.items():
+            setattr(settings, name, value)
+        reset_llm()
+        reset_rate_limiters()
+        reset_concurrency_limiters()
+    print("✅ 通过")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 LLM端点池测试")
+    print("=" * 60)
+    test_load_balancing()
+    test_failover()
+    test_recovery()
+    test_metrics()
+    print("\n✅ 所有测试通过")
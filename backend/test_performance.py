@@ -3,12 +3,12 @@
 import time
 from app.agents.trip_planner_agent import get_trip_planner_agent
 from app.models.schemas import TripRequest
+from app.utils.token_counter import estimate_messages_tokens, estimate_tokens
 
-def test_performance():
-    """测试旅行规划性能"""
-    
-    # 创建测试请求
-    request = TripRequest(
+
+def _create_request() -> TripRequest:
+    """创建测试请求"""
+    return TripRequest(
         city="南京",
         start_date="2025-11-09",
         end_date="2025-11-12",
@@ -18,6 +18,21 @@ def test_performance():
         preferences=["历史文化", "购物"],
         free_text_input=""
     )
+
+
+def _clear_caches(planner):
+    """清空规划器的所有缓存"""
+    for cache in (planner._cache or {}).values():
+        cache.clear()
+    if planner._plan_cache is not None:
+        planner._plan_cache.clear()
+
+
+def test_performance():
+    """测试旅行规划性能"""
+    
+    # 创建测试请求
+    request = _create_request()
     
     print("=" * 60)
     print("🧪 开始性能测试")
@@ -49,5 +64,66 @@ def test_performance():
     print(f"提速: {((elapsed1 - elapsed2) / elapsed1 * 100):.1f}%")
     print("=" * 60)
 
+
+def _run_with_llm_stats(planner, request, direct_tool_calls: bool) -> dict:
+    """在指定模式下执行一次无缓存规划,统计耗时、LLM调用次数和估算token数"""
+    stats = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+    llm = planner.llm
+    original_invoke = llm.invoke
+
+    def counting_invoke(messages, **kwargs):
+        response = original_invoke(messages, **kwargs)
+        stats["calls"] += 1
+        stats["input_tokens"] += estimate_messages_tokens(messages)
+        stats["output_tokens"] += estimate_tokens(response or "")
+        return response
+
+    original_mode = planner.settings.perf_direct_tool_calls
+    planner.settings.perf_direct_tool_calls = direct_tool_calls
+    llm.invoke = counting_invoke
+    _clear_caches(planner)
+    try:
+        start_time = time.time()
+        planner.plan_trip(request)
+        stats["elapsed"] = time.time() - start_time
+    finally:
+        del llm.invoke
+        planner.settings.perf_direct_tool_calls = original_mode
+
+    return stats
+
+
+def test_direct_tool_mode():
+    """对比Agent模式与直接工具调用模式的耗时和token消耗"""
+    request = _create_request()
+    planner = get_trip_planner_agent()
+
+    print("=" * 60)
+    print("🧪 Agent模式 vs 直接工具调用模式")
+    print("=" * 60)
+
+    agent_stats = _run_with_llm_stats(planner, request, direct_tool_calls=False)
+    direct_stats = _run_with_llm_stats(planner, request, direct_tool_calls=True)
+
+    print("\n" + "=" * 60)
+    print("📈 性能对比")
+    print("=" * 60)
+    for label, stats in (("Agent模式", agent_stats), ("直接工具模式", direct_stats)):
+        total_tokens = stats["input_tokens"] + stats["output_tokens"]
+        print(
+            f"{label}: 耗时 {stats['elapsed']:.2f}秒 | LLM调用 {stats['calls']} 次 | "
+            f"估算token {total_tokens} (输入 {stats['input_tokens']} / 输出 {stats['output_tokens']})"
+        )
+
+    agent_tokens = agent_stats["input_tokens"] + agent_stats["output_tokens"]
+    direct_tokens = direct_stats["input_tokens"] + direct_stats["output_tokens"]
+    if agent_stats["elapsed"] > 0:
+        print(f"耗时降低: {((agent_stats['elapsed'] - direct_stats['elapsed']) / agent_stats['elapsed'] * 100):.1f}%")
+    if agent_tokens > 0:
+        print(f"token节省: {((agent_tokens - direct_tokens) / agent_tokens * 100):.1f}%")
+    print("=" * 60)
+
+
 if __name__ == "__main__":
     test_performance()
+    test_direct_tool_mode()
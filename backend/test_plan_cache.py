@@ -0,0 +1,97 @@
+"""行程缓存快速路径测试脚本(规划队列已满时,相同请求仍直接返回缓存的计划)"""
+
+import json
+import asyncio
+import threading
+from fastapi.testclient import TestClient
+from app.agents import trip_planner_agent
+from app.agents.trip_planner_agent import MultiAgentTripPlanner
+from app.config import get_settings
+from app.models.schemas import TripRequest
+from app.utils import plan_scheduler
+from app.utils.cache import TTLCache
+from app.utils.plan_scheduler import PlanScheduler, SchedulerFullError
+
+
+def _create_request(city: str = "北京") -> TripRequest:
+    return TripRequest(
+        city=city, start_date="2025-06-01", end_date="2025-06-02", travel_days=2,
+        transportation="公共交通", accommodation="经济型酒店", preferences=["历史文化"]
+    )
+
+
+def _create_planner() -> MultiAgentTripPlanner:
+    """只带行程缓存的规划系统(不连接LLM和地图服务),缓存中预先放入北京的计划"""
+    planner = object.__new__(MultiAgentTripPlanner)
+    planner.settings = get_settings()
+    planner._plan_cache = TTLCache(name="plans", ttl=60, max_size=10)
+    request = _create_request()
+    planner._plan_cache.set(planner._fingerprint_request(request), planner._create_fallback_plan(request))
+    return planner
+
+
+def _fill_scheduler() -> threading.Event:
+    """用阻塞的任务占满唯一的工作线程和队列"""
+    release = threading.Event()
+    scheduler = PlanScheduler(workers=1, queue_size=1)
+    plan_scheduler._plan_scheduler = scheduler
+    scheduler.submit(release.wait)
+    scheduler.submit(release.wait)
+    scheduler.submit(release.wait, priority=plan_scheduler.PRIORITY_USER)
+    return release
+
+
+def test_plan_async():
+    """测试队列已满时,命中缓存的请求直接返回,未命中的请求被拒绝"""
+    print("\n📊 测试1: plan_trip_async")
+    planner = _create_planner()
+    release = _fill_scheduler()
+    try:
+        plan = asyncio.run(planner.plan_trip_async(_create_request(" 北京 ")))
+        print(f"   命中缓存: {plan.city} {len(plan.days)}天")
+        assert len(plan.days) == 2
+        try:
+            asyncio.run(planner.plan_trip_async(_create_request("上海")))
+            raise AssertionError("队列已满时未命中缓存的请求应被拒绝")
+        except SchedulerFullError as e:
+            print(f"   未命中缓存: {e}")
+    finally:
+        release.set()
+        plan_scheduler.shutdown_plan_scheduler()
+    print("✅ 通过")
+
+
+def test_plan_stream():
+    """测试队列已满时,流式接口命中缓存的请求直接返回结果"""
+    print("\n📊 测试2: /api/trip/plan-stream")
+    from app.api.main import app
+
+    trip_planner_agent._multi_agent_planner = _create_planner()
+    release = _fill_scheduler()
+    client = TestClient(app)
+    try:
+        response = client.post("/api/trip/plan-stream", json=_create_request().model_dump())
+        events = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+        messages = [event.get("message", "") for event in events]
+        assert response.status_code == 200
+        assert any("命中行程缓存" in message for message in messages)
+        assert events[-1]["type"] == "result" and len(events[-1]["data"]["days"]) == 2
+        print(f"   命中缓存: {len(events)} 个事件, 最后为 {events[-1]['type']}")
+
+        response = client.post("/api/trip/plan-stream", json=_create_request("上海").model_dump())
+        print(f"   未命中缓存: {response.status_code}")
+        assert response.status_code == 503
+    finally:
+        release.set()
+        plan_scheduler.shutdown_plan_scheduler()
+        trip_planner_agent._multi_agent_planner = None
+    print("✅ 通过")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 行程缓存快速路径测试")
+    print("=" * 60)
+    test_plan_async()
+    test_plan_stream()
+    print("\n✅ 所有测试通过")
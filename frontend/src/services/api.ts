@@ -1,5 +1,5 @@
 import axios from 'axios'
-import type { TripFormData, TripPlanResponse } from '@/types'
+import type { DayPlan, TripFormData, TripPlanResponse } from '@/types'
 import { supabase } from './auth'
 
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000'
@@ -61,7 +61,8 @@ export async function generateTripPlan(formData: TripFormData): Promise<TripPlan
  */
 export async function generateTripPlanWithLogs(
   formData: TripFormData,
-  onLog: (message: string) => void
+  onLog: (message: string) => void,
+  onDay?: (day: DayPlan) => void
 ): Promise<TripPlanResponse> {
   try {
     // 获取token
@@ -79,6 +80,12 @@ export async function generateTripPlanWithLogs(
       body: JSON.stringify(formData)
     })
 
+    // 规划队列已满
+    if (response.status === 503) {
+      const retryAfter = response.headers.get('Retry-After')
+      throw new Error(retryAfter ? `服务繁忙，请${retryAfter}秒后重试` : '服务繁忙，请稍后重试')
+    }
+
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`)
     }
@@ -105,6 +112,8 @@ export async function generateTripPlanWithLogs(
           
           if (data.type === 'log') {
             onLog(data.message)
+          } else if (data.type === 'day') {
+            onDay?.(data.data)
           } else if (data.type === 'result') {
             result = data.data
           } else if (data.type === 'error') {
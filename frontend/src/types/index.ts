@@ -74,6 +74,7 @@ export interface TripPlan {
   weather_info: WeatherInfo[]
   overall_suggestions: string
   budget?: Budget
+  timed_out_stages?: string[]
 }
 
 export interface TripFormData {